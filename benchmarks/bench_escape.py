@@ -0,0 +1,68 @@
+# Benchmark: escape_content_data mit normalen und pathologischen Eingaben
+#
+#   python benchmarks/bench_escape.py [--repeat N]
+#
+# "Schleife" ist die zeichenweise Implementierung bis 0.5.4, "Regex" die aktuelle aus multiconverter.tools.
+import argparse
+import timeit
+
+from multiconverter.tools import escape_content_data, escape_content_data_many
+
+
+def legacy_escape_content_data(text):
+    if text is None:
+        return text
+    result = []
+    in_tag = False
+    for i, char in enumerate(text):
+        if char == '<':
+            if i + 1 < len(text) and (text[i + 1].isalnum() or text[i + 1] in '!?/'):
+                in_tag = True
+                result.append(char)
+            else:
+                result.append('&lt;')
+        elif char == '>':
+            if in_tag:
+                in_tag = False
+                result.append(char)
+            else:
+                result.append('&gt;')
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+MEGABYTE = 1 << 20
+INPUTS = {
+    "Frage ohne Tags": "Welche Protokolle gehören zum TCP/IP-Modell? Wähle alle zutreffenden Antworten aus.",
+    "Frage mit HTML": "Was gibt <code>print(1 < 2)</code> aus? <b>Hinweis:</b> a > b ist falsch.",
+    "Java-Code 10 kB": ("for (int i = 0; i < n; i++) { List<Map<String, Integer>> m = x -> y; }\n" * 140),
+    "1 MB '<'": "<" * MEGABYTE,
+    "1 MB '>'": ">" * MEGABYTE,
+    "1 MB '<>'": "<>" * (MEGABYTE // 2),
+    "1 MB '<a>'": "<a>" * (MEGABYTE // 3),
+    "1 MB '<a' + '>'": "<a" * (MEGABYTE // 4) + ">" * (MEGABYTE // 2),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="escape_content_data mit normalen und pathologischen Eingaben")
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen pro Messung")
+    arguments = parser.parse_args()
+
+    print(f"{'Eingabe':24} {'Schleife':>12} {'Regex':>12} {'Faktor':>8}")
+    for label, text in INPUTS.items():
+        assert legacy_escape_content_data(text) == escape_content_data(text)
+        number = max(1, 200_000 // len(text))
+        legacy = min(timeit.repeat(lambda: legacy_escape_content_data(text), number=number, repeat=arguments.repeat))
+        current = min(timeit.repeat(lambda: escape_content_data(text), number=number, repeat=arguments.repeat))
+        print(f"{label:24} {legacy / number * 1e6:10.1f}µs {current / number * 1e6:10.1f}µs {legacy / current:7.1f}x")
+
+    options = [text for text in INPUTS.values() if len(text) < 1000] * 1000
+    single = min(timeit.repeat(lambda: [escape_content_data(text) for text in options], number=1, repeat=arguments.repeat))
+    many = min(timeit.repeat(lambda: escape_content_data_many(options), number=1, repeat=arguments.repeat))
+    print(f"{len(options)} Texte einzeln: {single * 1e3:.1f} ms, escape_content_data_many: {many * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Benchmark: Rendering-Kosten pro Item und Kaltstart der Templates
+#
+#   python benchmarks/bench_templates.py [--number N]
+#
+# "vorher": get_template() bei jedem Item mit auto_reload (stat der Template-Dateien) wie bis 0.5.4,
+# "nachher": aufgelöste Template-Objekte ohne auto_reload wie in QuestionHandlers.
+import argparse
+import tempfile
+import timeit
+
+import jinja2
+
+from multiconverter.converter5 import jinja_env, template_dir, _is_production_template
+from multiconverter.tools import include_min_xsd_file
+
+ITEM_TEMPLATE = "assessmentItem_choiceInteraction.xml.jinja"
+RESOURCE_TEMPLATE = "imsmanifest_resource.xml.jinja"
+
+item_context = {
+    'assessment_identifier': "item-00001",
+    'title': "MultipleChoice: Welche Aussage ist k...",
+    'cardinality': "single",
+    'max_choices': "1",
+    'question_html': "Welche Aussage ist korrekt?",
+    'choices': [("plus", "P(E) = 0"), ("minus", "P(E) = 1"), ("minus", "P(E) &lt; 0"), ("minus", "P(E) &gt; 1")],
+}
+manifest_context = {
+    'resource_identifier': "resource-item-00001",
+    'resource_href': "item-00001.xml",
+    'title': "MultipleChoice",
+    'interaction_type': "choiceInteraction",
+}
+
+
+def new_environment(**kwargs):
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dir), undefined=jinja2.StrictUndefined,
+                             autoescape=True, **kwargs)
+    env.globals['include_min_xsd_file'] = include_min_xsd_file
+    return env
+
+
+def compile_all(env):
+    for name in env.list_templates(filter_func=_is_production_template):
+        env.get_template(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendering-Kosten pro Item und Kaltstart der Templates")
+    parser.add_argument("--number", type=int, default=20000, help="Items pro Messung")
+    arguments = parser.parse_args()
+
+    legacy_env = new_environment(auto_reload=True)
+
+    def render_before():
+        legacy_env.get_template(ITEM_TEMPLATE).render(**item_context)
+        legacy_env.get_template(RESOURCE_TEMPLATE).render(**manifest_context)
+
+    item_template, resource_template = jinja_env.get_template(ITEM_TEMPLATE), jinja_env.get_template(RESOURCE_TEMPLATE)
+
+    def render_after():
+        item_template.render(**item_context)
+        resource_template.render(**manifest_context)
+
+    render_before(), render_after()  # Templates laden
+    for label, func in (("vorher", render_before), ("nachher", render_after)):
+        seconds = min(timeit.repeat(func, number=arguments.number, repeat=3))
+        print(f"Rendern pro Item {label:8}: {seconds / arguments.number * 1e6:8.2f} µs")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        compile_all(new_environment(bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir)))  # Cache füllen
+        cold = min(timeit.repeat(lambda: compile_all(new_environment()), number=1, repeat=5))
+        cached = min(timeit.repeat(lambda: compile_all(new_environment(
+            bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir))), number=1, repeat=5))
+    print(f"Kaltstart Templates übersetzen : {cold * 1e3:8.2f} ms")
+    print(f"Kaltstart aus Bytecode-Cache   : {cached * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Generator für synthetische, gültige llmquestions.xsd-Dokumente
+#
+#   python benchmarks/generator.py 1000 --gaps 3 --mappings 4 > questions.xml
+import argparse
+import random
+from xml.sax.saxutils import escape, quoteattr
+
+NAMESPACE = "https://github.com/Hananja/multiconverter"
+QUESTION_TYPES = ("multiple-choice-question", "fill-in-question", "map-question")
+
+WORDS = ("Protokoll", "Schicht", "Algorithmus", "Laufzeit", "Speicher", "Variable", "Schleife", "Rekursion",
+         "Ereignis", "Wahrscheinlichkeit", "Funktion", "Parameter", "Klasse", "Objekt", "Zeiger", "Liste")
+# Codeschnipsel wie in Informatikfragen, < und > stehen im Text
+SNIPPETS = ("if (a < b && c > d)", "List<Map<String, Integer>>", "x -> x * 2", "<b>fett</b>", "i <= n",
+            "for (int i = 0; i < n; i++)", "<code>print(1 > 0)</code>")
+
+
+def _sentence(rnd: random.Random, words: int = 8) -> str:
+    text = " ".join(rnd.choice(WORDS) for _ in range(words))
+    if rnd.random() < 0.3:
+        text += " " + rnd.choice(SNIPPETS)
+    return escape(text)
+
+
+def multiple_choice_question(rnd: random.Random, options: int = 4) -> str:
+    correct = rnd.randrange(options)
+    return ("<multiple-choice-question>"
+            f"<text>{_sentence(rnd, 12)}?</text><options>"
+            + "".join(f"<option correct={quoteattr(str(i == correct).lower())}>{_sentence(rnd, 4)}</option>"
+                      for i in range(options))
+            + "</options></multiple-choice-question>")
+
+
+def fill_in_question(rnd: random.Random, gaps: int = 2) -> str:
+    fills = "".join(f"{_sentence(rnd, 5)} <fill><alt>{rnd.choice(WORDS)}</alt><alt>{rnd.choice(WORDS)}</alt></fill>"
+                    for _ in range(gaps))
+    return (f"<fill-in-question><text>{_sentence(rnd, 6)}</text>"
+            f"<fill-in-text>{fills} {_sentence(rnd, 3)}.</fill-in-text></fill-in-question>")
+
+
+def map_question(rnd: random.Random, mappings: int = 3) -> str:
+    return (f"<map-question><text>{_sentence(rnd, 6)}</text><mappings>"
+            + "".join(f"<mapping><left>{_sentence(rnd, 2)}</left><right>{_sentence(rnd, 2)}</right></mapping>"
+                      for _ in range(max(2, mappings)))
+            + "</mappings></map-question>")
+
+
+def generate_questions(count: int, mix=(1, 1, 1), gaps: int = 2, mappings: int = 3, seed: int = 4711) -> str:
+    """
+        Dokument mit count Fragen, mix gewichtet multiple-choice, fill-in und map questions,
+        gaps Lücken pro Lückentext und mappings Zuordnungen pro Zuordnungsfrage
+    """
+    rnd = random.Random(seed)
+    generators = (multiple_choice_question, lambda r: fill_in_question(r, gaps), lambda r: map_question(r, mappings))
+    questions = (rnd.choices(generators, weights=mix)[0](rnd) for _ in range(count))
+    return (f'<?xml version="1.0" encoding="utf-8"?>\n<questions xmlns="{NAMESPACE}">\n'
+            + "\n".join(questions) + "\n</questions>\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetische llmquestions.xsd-Dokumente erzeugen")
+    parser.add_argument("count", type=int, help="Anzahl der Fragen")
+    parser.add_argument("--mix", type=float, nargs=3, default=(1, 1, 1), metavar=("MC", "FILL", "MAP"),
+                        help="Gewichte der Fragetypen")
+    parser.add_argument("--gaps", type=int, default=2, help="Lücken pro Lückentext")
+    parser.add_argument("--mappings", type=int, default=3, help="Zuordnungen pro Zuordnungsfrage (mindestens 2)")
+    parser.add_argument("--seed", type=int, default=4711)
+    arguments = parser.parse_args()
+    print(generate_questions(arguments.count, arguments.mix, arguments.gaps, arguments.mappings, arguments.seed), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Benchmark der Konvertierungsschritte mit Regressionsprüfung
+#
+#   python benchmarks/run_benchmarks.py [--sizes 10 1000 100000] [--output results.json]
+#   python benchmarks/run_benchmarks.py --save-baseline   # benchmarks/baseline.json neu schreiben
+#
+# Gemessen werden Parsen, XSD-Validierung, Rendern mit QuestionHandlers, ZIP-Erstellung (write_zip, inklusive
+# Manifest) und die Manifest-Erzeugung allein. Die Zeiten pro Frage werden mit der Baseline verglichen, ist ein
+# Schritt um mehr als --tolerance langsamer, endet der Lauf mit Exitcode 1.
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+from lxml import etree
+
+from multiconverter import __version__
+from multiconverter.converter5 import QuestionHandlers, xsd_path
+from multiconverter.xml_validator import get_validator, _document_parser
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from generator import generate_questions  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STAGES = ("parse", "validate", "render", "zip", "manifest")
+MIN_DIFFERENCE = 0.005  # s, kleinere Unterschiede sind Messrauschen
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def measure(count: int, repeat: int) -> dict:
+    """ Bestzeit jedes Schritts in Sekunden für ein Dokument mit count Fragen """
+    document = generate_questions(count).encode("utf-8")
+    validator = get_validator(xsd_path)
+    best = dict.fromkeys(STAGES, float("inf"))
+    for _ in range(repeat):
+        seconds, root = _timed(lambda: etree.fromstring(document, _document_parser()))
+        best["parse"] = min(best["parse"], seconds)
+        seconds, valid = _timed(lambda: validator.schema.validate(root))
+        if not valid:
+            raise ValueError(f"Generiertes Dokument ist ungültig: {validator.schema.error_log}")
+        best["validate"] = min(best["validate"], seconds)
+        handlers = QuestionHandlers()
+        best["render"] = min(best["render"], _timed(lambda: handlers.handle_document(root))[0])
+        best["zip"] = min(best["zip"], _timed(lambda: handlers.write_zip(io.BytesIO()))[0])
+        best["manifest"] = min(best["manifest"], _timed(handlers.generate_manifest)[0])
+    return {stage: {"seconds": seconds, "per_question_us": seconds / count * 1e6} for stage, seconds in best.items()}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """ Liste der Regressionen als Text """
+    regressions = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None:
+                continue
+            limit = reference["seconds"] * (1 + tolerance)
+            if result["seconds"] > limit and result["seconds"] - reference["seconds"] > MIN_DIFFERENCE:
+                regressions.append(f"{stage} ({size} Fragen): {result['per_question_us']:.1f} µs/Frage, "
+                                   f"Baseline {reference['per_question_us']:.1f} µs/Frage")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark der Konvertierungsschritte mit Regressionsprüfung")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000], help="Anzahl der Fragen")
+    parser.add_argument("--output", help="Ergebnisse als JSON speichern")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON-Datei der Baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Ergebnisse als neue Baseline speichern")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="erlaubte Verlangsamung (0.5 = 50 %%)")
+    arguments = parser.parse_args()
+
+    results = {}
+    for count in arguments.sizes:
+        results[str(count)] = stages = measure(count, repeat=max(1, min(20, 20000 // count)))
+        print(f"{count:>7} Fragen: " + "  ".join(f"{stage} {result['per_question_us']:8.1f} µs"
+                                                  for stage, result in stages.items()), flush=True)
+    report = {"version": __version__, "python": platform.python_version(), "machine": platform.machine(),
+              "results": results}
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if arguments.save_baseline:
+        with open(arguments.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        return
+
+    with open(arguments.baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f)["results"], arguments.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
 # src/mein_projekt/__init__.py
-from .converter5 import QuestionFragments, QuestionHandlers
+__version__ = "0.5.4-RC2"  # the only version, pyproject.toml reads it
+_exports = {  # name: module
+    "QuestionFragments": "converter5",
+    "QuestionHandlers": "converter5",
+    "Conversion": "api",
+    "Converter": "api",
+}
+__all__ = list(_exports)
 
-__version__ = "0.5.0"
-__all__ = ["QuestionFragments", "QuestionHandlers"]
+
+def __getattr__(name):
+    # converter5 loads Jinja2, lxml and the templates, import it only when it is used
+    if name in _exports:
+        from importlib import import_module
+        return getattr(import_module(f".{_exports[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Ehre und Herrlichkeit sei dem König der Ewigkeit,
 # dem unvergänglichen, unsichtbaren und einzigen Gott,
@@ -1,7 +1,7 @@
 # src/mein_projekt/__main__.py
 import sys
 
-from multiconverter.converter5 import main as converter_main
+from multiconverter.cli import main as converter_main
 
 def main():
     converter_main(sys.argv)
@@ -0,0 +1,195 @@
+# Asyncio API for embedding the conversion in async services, on top of api.Converter
+#
+#   result = await aio.validate(xml)                          # ValidationResult
+#   archive = await aio.convert(xml, timeout=30)              # QTI archive as bytes
+#   async for chunk in aio.iter_archive(xml):                 # QTI archive chunk by chunk
+#       ...
+#
+# xml may be bytes, str or a parsed tree as for Converter.validate. Parsing, validation, rendering and compression
+# run in a bounded thread pool, the event loop only waits.
+# At most max_workers requests are in the pool, further requests wait for a free slot without holding a thread.
+# A cancelled or timed out request stops before its next question; a request waiting for a slot never starts.
+# The chunks of iter_archive are produced as the archive is written, a slow consumer pauses the conversion.
+import asyncio
+import concurrent.futures
+import io
+import os
+import threading
+import weakref
+from typing import AsyncIterator, Optional
+
+from multiconverter.api import ConversionCancelled, Converter, Source
+from multiconverter.xml_validator import QuestionsValidationResult, ValidationResult
+
+CHUNK_SIZE = 64 * 1024
+_END = object()  # end of the chunks
+
+
+class ValidationError(ValueError):
+    """ The document is not valid, result holds the errors """
+    def __init__(self, result: ValidationResult):
+        super().__init__("; ".join(message for _, message in result.errors) or "Ungültiges Dokument")
+        self.result = result
+
+
+def _convert(converter: Converter, xml: Source, target, cancelled: threading.Event):
+    conversion = converter.convert_to(xml, target, cancel=cancelled)
+    if not conversion.converted:
+        validation = conversion.validation
+        if isinstance(validation, QuestionsValidationResult):
+            validation = validation.to_validation_result()
+        raise ValidationError(validation)
+
+
+class _ChunkWriter(io.RawIOBase):
+    """ Unseekable binary target of the archive, hands chunks of chunk_size bytes over to the event loop """
+    def __init__(self, loop, queue: asyncio.Queue, cancelled: threading.Event, chunk_size: int):
+        super().__init__()
+        self.loop = loop
+        self.queue = queue
+        self.cancelled = cancelled
+        self.chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= self.chunk_size:
+            self.put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def put(self, item):
+        """ Waits until the queue takes the item (back pressure), raises ConversionCancelled if the request is cancelled """
+        if self.cancelled.is_set():
+            raise ConversionCancelled()
+        put = self.queue.put(item)
+        try:
+            future = asyncio.run_coroutine_threadsafe(put, self.loop)
+        except RuntimeError:  # the event loop was closed meanwhile
+            put.close()
+            raise ConversionCancelled() from None
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except concurrent.futures.TimeoutError:
+                if self.cancelled.is_set():
+                    future.cancel()
+                    raise ConversionCancelled() from None
+
+    def finish(self):
+        if self._buffer:
+            self.put(bytes(self._buffer))
+            self._buffer.clear()
+        self.put(_END)
+
+
+def _ignore_result(future):
+    """ The result of a cancelled request is not needed, avoids warnings about unretrieved exceptions """
+    if not future.cancelled():
+        future.exception()
+
+
+class AsyncConverter:
+    """
+        Runs validations and conversions of converter (default: Converter()) for the event loop in a pool of
+        max_workers threads (default: CPUs)
+    """
+    def __init__(self, max_workers: Optional[int] = None, converter: Optional[Converter] = None):
+        self.converter = converter or Converter()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="aio")
+        self._semaphores = weakref.WeakKeyDictionary()  # per event loop, semaphores are bound to their loop
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_workers)
+        return semaphore
+
+    async def _run(self, function, *args, timeout: Optional[float] = None, cancelled: threading.Event = None):
+        async def run():
+            async with self._slots():
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+                except asyncio.CancelledError:
+                    if cancelled is not None:
+                        cancelled.set()  # the thread can't be interrupted, it stops before the next question
+                    raise
+        return await asyncio.wait_for(run(), timeout)
+
+    async def validate(self, xml: Source, timeout: Optional[float] = None) -> ValidationResult:
+        return await self._run(self.converter.validate, xml, timeout=timeout)
+
+    async def convert(self, xml: Source, timeout: Optional[float] = None) -> bytes:
+        """ QTI archive of the document, raises ValidationError if it is invalid """
+        def convert_to_bytes():
+            target = io.BytesIO()
+            _convert(self.converter, xml, target, cancelled)
+            return target.getvalue()
+        cancelled = threading.Event()
+        return await self._run(convert_to_bytes, timeout=timeout, cancelled=cancelled)
+
+    async def iter_archive(self, xml: Source, timeout: Optional[float] = None,
+                           chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+            Chunks of the QTI archive as it is written, raises ValidationError before the first chunk if the
+            document is invalid. timeout applies to the whole archive.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        queue = asyncio.Queue(maxsize=4)
+        cancelled = threading.Event()
+        writer = _ChunkWriter(loop, queue, cancelled, chunk_size)
+
+        def produce():
+            try:
+                _convert(self.converter, xml, writer, cancelled)
+            finally:
+                if not cancelled.is_set():
+                    writer.finish()
+
+        async with self._slots():
+            future = loop.run_in_executor(self._executor, produce)
+            try:
+                while True:
+                    remaining = None if deadline is None else max(deadline - loop.time(), 0)
+                    chunk = await asyncio.wait_for(queue.get(), remaining)
+                    if chunk is _END:
+                        break
+                    yield chunk
+                await future  # raises the errors of the conversion
+            finally:
+                if not future.done():
+                    cancelled.set()
+                    future.add_done_callback(_ignore_result)
+
+
+_default: Optional[AsyncConverter] = None
+
+
+def default_converter() -> AsyncConverter:
+    """ Shared converter with one thread per CPU """
+    global _default
+    if _default is None:
+        _default = AsyncConverter()
+    return _default
+
+
+async def validate(xml: Source, timeout: Optional[float] = None) -> ValidationResult:
+    return await default_converter().validate(xml, timeout)
+
+
+async def convert(xml: Source, timeout: Optional[float] = None) -> bytes:
+    return await default_converter().convert(xml, timeout)
+
+
+def iter_archive(xml: Source, timeout: Optional[float] = None,
+                 chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    return default_converter().iter_archive(xml, timeout, chunk_size)
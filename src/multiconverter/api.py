@@ -0,0 +1,138 @@
+# In-process conversion for embedding, without files, sys.exit or output on the console
+#
+#   converter = Converter()                              # reusable, thread-safe, one per process is enough
+#   conversion = converter.convert(xml)                  # xml: bytes, str, lxml element or element tree
+#   if conversion.converted:
+#       archive = conversion.archive                     # QTI archive as bytes
+#   else:
+#       errors = conversion.validation.errors            # [(Error, message)]
+#   converter.convert_to(xml, stream)                    # writes the archive to a binary file object
+#
+# The converter keeps the schema, the compiled templates and an optional render cache across conversions.
+# Every conversion renders with its own QuestionHandlers, so conversions in several threads don't share any
+# state but the identifier blocks: with unique_identifiers the identifiers of all archives of the converter
+# are distinct (e.g. for an item pool collecting several imports), otherwise every archive starts at item-00001.
+# Invalid documents are reported in the result, exceptions are left for errors of the target or of the caller.
+import io
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+
+from lxml import etree
+
+from multiconverter.converter5 import QuestionHandlers, document_questions, precompile_templates, xsd_path
+from multiconverter.xml_validator import QuestionsValidationResult, ValidationResult, get_validator
+
+Source = Union[bytes, bytearray, str, etree._Element, etree._ElementTree]
+
+
+class ConversionCancelled(Exception):
+    """ The conversion was cancelled (see the cancel argument of Converter.write_archive) """
+
+
+@dataclass
+class Conversion:
+    validation: Union[ValidationResult, QuestionsValidationResult]
+    converted: bool = False  # False if the document is invalid, nothing was written then
+    archive: Optional[bytes] = None  # set by Converter.convert
+    identifiers: List[str] = field(default_factory=list)  # of the converted questions in document order
+    skipped: List[int] = field(default_factory=list)  # indexes of the invalid questions left out (skip_invalid)
+
+
+class IdentifierBlocks:
+    """ Hands out blocks of consecutive identifier numbers, also to several threads """
+    def __init__(self, first_identifier: int = 1):
+        self._next = first_identifier
+        self._lock = threading.Lock()
+
+    def reserve(self, count: int) -> int:
+        """ First number of a block of count numbers """
+        with self._lock:
+            first = self._next
+            self._next += count
+        return first
+
+
+class Converter:
+    """
+        Validates and converts documents in memory. skip_invalid validates question by question and converts
+        the valid questions (see QuestionsValidationResult), otherwise a document with errors isn't converted.
+        render_cache (see render_cache.py) and the archive options compression, compress_threads and max_memory
+        are used for every conversion.
+    """
+    def __init__(self, skip_invalid: bool = False, unique_identifiers: bool = False, render_cache=None,
+                 compression="default", compress_threads: int = 1, max_memory: Optional[int] = None):
+        self.skip_invalid = skip_invalid
+        self.render_cache = render_cache
+        self.archive_options = dict(compression=compression, compress_threads=compress_threads,
+                                    max_memory=max_memory)
+        self.identifier_blocks = IdentifierBlocks() if unique_identifiers else None
+        self.validator = get_validator(xsd_path)
+        self._templates = precompile_templates()  # only read by the handlers
+
+    def validate(self, source: Source, filename: Optional[str] = None) -> Union[ValidationResult,
+                                                                              QuestionsValidationResult]:
+        """
+            Validates the document: bytes are decoded like a file, str is already decoded (an encoding in its XML
+            declaration is ignored), a parsed tree is used as it is. filename names the document in the result.
+            With skip_invalid a QuestionsValidationResult.
+        """
+        if isinstance(source, (etree._Element, etree._ElementTree)):
+            root = source.getroot() if isinstance(source, etree._ElementTree) else source
+            if self.skip_invalid:
+                return self.validator.validate_questions(root, filename or "xml_tree")
+            return self.validator.validate_tree(root, filename or "xml_tree")
+        encoding = None
+        if isinstance(source, str):
+            source, filename, encoding = source.encode("utf-8"), filename or "xml_string", "utf-8"
+        elif isinstance(source, bytearray):
+            source = bytes(source)
+        elif not isinstance(source, bytes):
+            raise TypeError(f"Nicht unterstützte Quelle: {type(source).__name__}")
+        filename = filename or "xml_bytes"
+        if self.skip_invalid:
+            return self.validator.validate_bytes_questions(source, filename, encoding)
+        return self.validator.validate_bytes(source, filename, encoding)
+
+    def write_archive(self, validation: Union[ValidationResult, QuestionsValidationResult], target,
+                      cancel: Optional[threading.Event] = None) -> Conversion:
+        """
+            Writes the QTI archive of a result of validate() to target (file path or writable binary file object),
+            if it can be converted. Raises ConversionCancelled before the next question once cancel is set.
+        """
+        if isinstance(validation, QuestionsValidationResult):
+            if validation.errors:
+                return Conversion(validation)
+            questions = validation.valid_questions
+            skipped = sorted(validation.question_errors)
+        else:
+            if not validation.is_valid:
+                return Conversion(validation)
+            questions = document_questions(validation.xml_content)
+            skipped = []
+        first_identifier = 1 if self.identifier_blocks is None else self.identifier_blocks.reserve(len(questions))
+        handlers = QuestionHandlers(first_identifier, self.render_cache, **self.archive_options)
+        handlers.templates = self._templates
+        try:
+            with handlers.stream_zip(target):
+                for question in questions:
+                    if cancel is not None and cancel.is_set():
+                        raise ConversionCancelled()
+                    handlers.handle_question(question)
+            return Conversion(validation, True, identifiers=list(handlers.items_map), skipped=skipped)
+        finally:
+            handlers.items_map.close()
+
+    def convert_to(self, source: Source, target, filename: Optional[str] = None,
+                   cancel: Optional[threading.Event] = None) -> Conversion:
+        """ Validates the document and writes its archive to target, nothing is written if it is invalid """
+        return self.write_archive(self.validate(source, filename), target, cancel)
+
+    def convert(self, source: Source, filename: Optional[str] = None,
+                cancel: Optional[threading.Event] = None) -> Conversion:
+        """ Validates the document and returns its archive in Conversion.archive """
+        target = io.BytesIO()
+        conversion = self.convert_to(source, target, filename, cancel)
+        if conversion.converted:
+            conversion.archive = target.getvalue()
+        return conversion
@@ -0,0 +1,158 @@
+# commandline tool to display help when called without parameters and process all given files otherwise from parameters
+#
+# This module only imports the standard library: the version, argument errors and the entry point stay cheap.
+# Jinja2, lxml and the schema are loaded by converter5 when the help is rendered or a conversion runs.
+import argparse
+import os
+import sys
+
+from multiconverter import __version__
+
+
+def die(message):
+    """ Print the message and let the process die afterward """
+    print(message)
+    sys.exit(1)
+
+
+def parse_size(text: str) -> int:
+    """ Bytes from a number with an optional suffix K, M or G (1024 based), e.g. 50M """
+    factor = 1
+    if text[-1:].upper() in ("K", "M", "G"):
+        factor = 1024 ** ("KMG".index(text[-1].upper()) + 1)
+        text = text[:-1]
+    size = int(text) * factor
+    if size < 1:
+        raise ValueError(f"Größe muss positiv sein: {text}")
+    return size
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        # no usage and exit code 2 from argparse, the caller dies with the message
+        raise argparse.ArgumentError(None, message)
+
+
+def _parse_arguments(argv):
+    parser = _ArgumentParser(prog="multiconverter", add_help=False, exit_on_error=False)
+    parser.add_argument("-h", "--help", action="store_true")  # render_help(), not the usage of argparse
+    parser.add_argument("--version", action="store_true")
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--cache-size", type=int, default=256)  # MB
+    parser.add_argument("--skip-invalid", action="store_true")
+    parser.add_argument("--max-memory", type=int)  # MB
+    parser.add_argument("--compression", default="default")  # checked in main(), see COMPRESSION_CHOICES
+    parser.add_argument("--compress-threads", type=int, default=1)
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--fail-fast", action="store_true")
+    parser.add_argument("--max-errors", type=int)  # over all files
+    parser.add_argument("--max-file-errors", type=int)
+    parser.add_argument("--error-summary", action="store_true")
+    parser.add_argument("--dedup", choices=["report", "drop"])
+    parser.add_argument("--dedup-index")
+    parser.add_argument("--dedup-threshold", type=float)
+    parser.add_argument("--max-items", type=int)  # per archive
+    parser.add_argument("--max-bytes", type=parse_size)
+    parser.add_argument("files", nargs="*")
+    try:
+        return parser.parse_intermixed_args(argv[1:])
+    except argparse.ArgumentError as e:
+        die(f"multiconverter: {e}")
+
+
+# the first argument selects a subcommand, so an archive with one of these names must be given as ./<name>
+SUBCOMMANDS = {  # name: module with main(argv)
+    "serve": "multiconverter.server",
+    "watch": "multiconverter.watch",
+    "bank": "multiconverter.question_bank",
+}
+
+
+def main(argv):
+    if len(argv) > 1 and argv[1] in SUBCOMMANDS:
+        from importlib import import_module
+        import_module(SUBCOMMANDS[argv[1]]).main(argv[1:])
+        return
+
+    arguments = _parse_arguments(argv)
+    if arguments is None:
+        return # never reached outside stubbed test mode
+    if arguments.version:
+        print(f"multiconverter {__version__}")
+        return
+    if arguments.help or len(arguments.files) < 2:
+        from multiconverter.converter5 import render_help
+        die(render_help())
+        return # never reached outside stubbed test mode
+
+    from multiconverter.converter5 import convert
+    from multiconverter.zip_writer import COMPRESSION_CHOICES  # not needed for the help and the version
+    if arguments.compression not in COMPRESSION_CHOICES:
+        die(f"multiconverter: --compression muss eins von {', '.join(COMPRESSION_CHOICES)} sein")
+        return # never reached outside stubbed test mode
+    output_filename = arguments.files[0]
+    input_filenames = arguments.files[1:]
+    # "-" writes the archive to stdout (e.g. for pipes)
+    target = sys.stdout.buffer if output_filename == '-' else output_filename
+    jobs = arguments.jobs if arguments.jobs > 0 else os.cpu_count()
+    render_cache = None
+    if arguments.cache or arguments.cache_dir:
+        from multiconverter.render_cache import RenderCache
+        render_cache = RenderCache(arguments.cache_dir, arguments.cache_size * 1024 * 1024)
+    max_memory = arguments.max_memory * 1024 * 1024 if arguments.max_memory is not None else None
+    compress_threads = arguments.compress_threads if arguments.compress_threads > 0 else os.cpu_count()
+    limits = None
+    if arguments.fail_fast or arguments.max_errors is not None or arguments.max_file_errors is not None:
+        if any(value is not None and value < 1 for value in (arguments.max_errors, arguments.max_file_errors)):
+            die("multiconverter: --max-errors und --max-file-errors müssen mindestens 1 sein")
+            return # never reached outside stubbed test mode
+        from multiconverter.xml_validator import ErrorLimits
+        limits = ErrorLimits(arguments.max_file_errors, arguments.max_errors, arguments.fail_fast)
+    if arguments.max_items is not None or arguments.max_bytes is not None:
+        if output_filename == '-':
+            die("multiconverter: --max-items und --max-bytes schreiben mehrere Archive, - ist nicht möglich")
+            return # never reached outside stubbed test mode
+        if arguments.max_items is not None and arguments.max_items < 1:
+            die("multiconverter: --max-items muss mindestens 1 sein")
+            return # never reached outside stubbed test mode
+    dedup = None
+    if arguments.dedup or arguments.dedup_index or arguments.dedup_threshold is not None:
+        from multiconverter.dedup import DEFAULT_THRESHOLD, DedupIndex
+        threshold = arguments.dedup_threshold if arguments.dedup_threshold is not None else DEFAULT_THRESHOLD
+        if not 0 < threshold <= 1:
+            die("multiconverter: --dedup-threshold muss zwischen 0 und 1 liegen")
+            return # never reached outside stubbed test mode
+        try:
+            dedup = DedupIndex(arguments.dedup_index, threshold)
+        except ValueError as e:
+            die(f"multiconverter: {e}")
+            return # never reached outside stubbed test mode
+
+    def run():
+        convert(target, input_filenames, jobs=jobs, render_cache=render_cache, skip_invalid=arguments.skip_invalid,
+                max_memory=max_memory, compression=arguments.compression, compress_threads=compress_threads,
+                limits=limits, error_summary=arguments.error_summary,
+                dedup=dedup, drop_duplicates=arguments.dedup == "drop",
+                max_items=arguments.max_items, max_bytes=arguments.max_bytes)
+
+    if arguments.profile:
+        _run_profiled(run, output_filename)
+    else:
+        run()
+
+
+def _run_profiled(run, output_filename):
+    """ Runs the conversion with profiling, the results are written next to the archive (also on errors) """
+    from multiconverter.profiling import profile
+    base = "multiconverter" if output_filename == '-' else os.path.splitext(output_filename)[0]
+    with profile() as profiler:
+        try:
+            with profiler.span("convert"):
+                run()
+        finally:
+            profiler.write_summary(base + ".profile.json")
+            profiler.write_trace(base + ".trace.json")
+            print(profiler.format_summary(), file=sys.stderr)
+            print(f"Profil: {base}.profile.json, Trace: {base}.trace.json", file=sys.stderr)
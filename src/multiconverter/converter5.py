@@ -1,47 +1,184 @@
-# commandline tool to display help when called without parameters and process all given files otherwise from parameters
-import io, sys, os
-import zipfile
+# conversion of validated LLM documents to QTI archives, the commandline tool is in cli.py
+import io, os, sys
+import tempfile
 import jinja2
+from collections.abc import MutableMapping
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import Optional, Union
 from uuid import uuid4
-from itertools import starmap
 
-from multiconverter.tools import include_min_xsd_file, get_local_tag, escape_content_data
-from multiconverter.xml_validator import XMLValidator, Error
+from lxml import etree
+
+from multiconverter.tools import include_min_xsd_file, get_local_tag, escape_content_data, escape_content_data_many
+from multiconverter.profiling import span
+from multiconverter.zip_writer import MemberWriter, zip_compression
+from multiconverter.xml_validator import ErrorLimits, QuestionsValidationResult, XMLValidator, Error, get_validator
+from multiconverter.cli import die, main  # main: entry point of earlier versions
 
 # Template-Verzeichnis relativ zum Skript finden
 script_dir = os.path.dirname(os.path.abspath(__file__))
 template_dir = os.path.join(script_dir, 'templates')
 xsd_path = os.path.join(script_dir, "xml/llmquestions.xsd")
 
+# Templates werden im Produktivbetrieb nicht bei jedem get_template() auf Änderungen geprüft,
+# für die Arbeit an den Templates MULTICONVERTER_TEMPLATE_RELOAD=1 setzen
+template_reload = os.environ.get("MULTICONVERTER_TEMPLATE_RELOAD", "") not in ("", "0")
+
+
+def _create_bytecode_cache():
+    """
+        Übersetzte Templates werden zwischen Prozessen im Bytecode-Cache gehalten (Standard: Jinja
+        Verzeichnis im Temp-Verzeichnis, MULTICONVERTER_TEMPLATE_CACHE=<Verzeichnis>, leer: kein Cache)
+    """
+    cache_dir = os.environ.get("MULTICONVERTER_TEMPLATE_CACHE")
+    if cache_dir == "":
+        return None
+    try:
+        return jinja2.FileSystemBytecodeCache(cache_dir)
+    except (OSError, RuntimeError):  # kein sicheres Cache-Verzeichnis verfügbar
+        return None
+
+
 jinja_env = jinja2.Environment(
     loader=jinja2.FileSystemLoader(template_dir),
     # autoescape=jinja2.select_autoescape(['html', 'xml']),
     undefined=jinja2.StrictUndefined,
-    autoescape=True
+    autoescape=True,
+    auto_reload=template_reload,
+    bytecode_cache=_create_bytecode_cache(),
 )
 jinja_env.globals['include_min_xsd_file'] = include_min_xsd_file
 
+
+def _is_production_template(name):
+    return name.startswith(("assessmentItem_", "imsmanifest")) or name == "help.txt.jinja"
+
+
+def precompile_templates() -> dict[str, jinja2.Template]:
+    """ Compiles all templates of a conversion (or loads them from the bytecode cache) """
+    return {name: jinja_env.get_template(name) for name in jinja_env.list_templates(filter_func=_is_production_template)}
+
 xmlns = {"m":"https://github.com/Hananja/multiconverter"}
 
-def die(message):
-    """ Print the message and let the process die afterward """
-    print(message)
-    sys.exit(1)
+# rendered instead of the identifier for the render cache, NUL can't occur in question texts
+IDENTIFIER_PLACEHOLDER = "\x00identifier\x00"
 
 @dataclass
 class QuestionFragments:
-    item_text: str
+    item_text: Optional[str]  # None if already streamed into an archive (see stream_zip)
     manifest_text: str
 
+    def with_identifier(self, identifier: str) -> "QuestionFragments":
+        """ Fragments rendered with IDENTIFIER_PLACEHOLDER for the given identifier """
+        return QuestionFragments(item_text=self.item_text.replace(IDENTIFIER_PLACEHOLDER, identifier),
+                                 manifest_text=self.manifest_text.replace(IDENTIFIER_PLACEHOLDER, identifier))
+
+@dataclass
+class _SpilledFragments:
+    offset: int
+    item_length: int  # bytes, -1 for item_text None
+    manifest_length: int
+
+class FragmentStore(MutableMapping):
+    """
+        Rendered fragments by identifier in insertion order. Fragments are kept in memory up to
+        max_memory (bytes, counted as characters of the texts, None: no limit), further fragments are
+        appended to a temporary file. The archive reads them back in insertion order, i.e. sequentially.
+    """
+    def __init__(self, max_memory: Optional[int] = None):
+        self.max_memory = max_memory
+        self.memory_size = 0
+        self._entries : dict[str, Union[QuestionFragments, _SpilledFragments]] = {}
+        self._spill_file = None  # created on the first spilled fragment, deleted when closed
+
+    @staticmethod
+    def _size(fragments: QuestionFragments) -> int:
+        return len(fragments.item_text or "") + len(fragments.manifest_text)
+
+    def __setitem__(self, identifier: str, fragments: QuestionFragments):
+        self._discard(identifier)
+        size = self._size(fragments)
+        if self.max_memory is None or self.memory_size + size <= self.max_memory:
+            self._entries[identifier] = fragments
+            self.memory_size += size
+        else:
+            self._entries[identifier] = self._spill(fragments)
+
+    def _spill(self, fragments: QuestionFragments) -> _SpilledFragments:
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="multiconverter-")
+        item_bytes = fragments.item_text.encode('utf-8') if fragments.item_text is not None else b""
+        manifest_bytes = fragments.manifest_text.encode('utf-8')
+        offset = self._spill_file.seek(0, io.SEEK_END)
+        self._spill_file.write(item_bytes)
+        self._spill_file.write(manifest_bytes)
+        return _SpilledFragments(offset, len(item_bytes) if fragments.item_text is not None else -1,
+                                 len(manifest_bytes))
+
+    def __getitem__(self, identifier: str) -> QuestionFragments:
+        entry = self._entries[identifier]
+        if isinstance(entry, QuestionFragments):
+            return entry
+        self._spill_file.seek(entry.offset)
+        item_bytes = self._spill_file.read(max(entry.item_length, 0))
+        manifest_bytes = self._spill_file.read(entry.manifest_length)
+        return QuestionFragments(item_text=item_bytes.decode('utf-8') if entry.item_length >= 0 else None,
+                                 manifest_text=manifest_bytes.decode('utf-8'))
+
+    def __delitem__(self, identifier: str):
+        self._discard(identifier)
+        del self._entries[identifier]
+
+    def _discard(self, identifier: str):
+        """ Releases the memory of an entry, space in the spill file is only released by close() """
+        entry = self._entries.get(identifier)
+        if isinstance(entry, QuestionFragments):
+            self.memory_size -= self._size(entry)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def manifest_texts(self):
+        """ Manifest fragments in insertion order, spilled item texts are not read """
+        for entry in self._entries.values():
+            if isinstance(entry, QuestionFragments):
+                yield entry.manifest_text
+            else:
+                self._spill_file.seek(entry.offset + max(entry.item_length, 0))
+                yield self._spill_file.read(entry.manifest_length).decode('utf-8')
+
+    @property
+    def spilled(self) -> int:
+        """ Number of fragments in the spill file """
+        return sum(1 for entry in self._entries.values() if isinstance(entry, _SpilledFragments))
+
+    def close(self):
+        self._entries.clear()
+        self.memory_size = 0
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
 class QuestionHandlers:
-    def __init__(self):
-        self.identity_counter : int = 1
-        self.items_map : dict[str, QuestionFragments] = {} # key is id
+    def __init__(self, first_identifier: int = 1, render_cache=None, max_memory: Optional[int] = None,
+                 compression="default", compress_threads: int = 1):
+        self.identity_counter : int = first_identifier
+        self.items_map : FragmentStore = FragmentStore(max_memory) # key is id
+        self.compression = compression # name or level, see zip_writer.COMPRESSION_LEVELS
+        self.compress_threads = compress_threads
+        self._zip_stream : Optional[MemberWriter] = None # set while stream_zip() is active
+        self.templates : dict[str, jinja2.Template] = {} # resolved once per handler, key is name
+        self.render_cache = render_cache # optional RenderCache, see render_cache.py
+        self._placeholder_renderer : Optional[QuestionHandlers] = None
 
     def handle_multiple_choice_question(self, question):
         item_context, manifest_context = self._prepare_context()
-        if 1 == sum(1 for option in question.find('./m:options', xmlns) if option.attrib['correct'] == 'true'):
+        options = question.find('./m:options', xmlns).findall('./m:option', xmlns)
+        if 1 == sum(1 for option in options if option.attrib['correct'] == 'true'):
             item_context['cardinality'] = "single"
             item_context['max_choices'] = "1"
             item_context['title'] = "MultipleChoice"
@@ -53,10 +190,9 @@ class QuestionHandlers:
         question_text = escape_content_data(question.find('./m:text', xmlns).text)
         item_context['title'] += ": " + question_text[:20] + "..." if len(question_text) > 20 else ""
         item_context['question_html'] = question_text
-        item_context['choices'] = starmap(lambda i, option: (
-            "plus" if option.attrib['correct'] == 'true' else "minus",
-            escape_content_data(option.text)
-        ), enumerate(question.find('./m:options', xmlns).findall('./m:option', xmlns)))
+        item_context['choices'] = zip(
+            map(lambda option: "plus" if option.attrib['correct'] == 'true' else "minus", options),
+            escape_content_data_many(map(lambda option: option.text, options)))
         manifest_context['interaction_type'] = 'choiceInteraction'
 
         self._add_item(item_context, manifest_context, "choiceInteraction")
@@ -72,11 +208,12 @@ class QuestionHandlers:
         item_context['responses_map'] = {}
         fill_in = question.find('./m:fill-in-text', xmlns)
         fill_in_text = fill_in.text if fill_in.text is not None else ""
-        for response_counter, fill in enumerate(fill_in):
-            response_identifier = f'RESPONSE{response_counter:02}'
-            item_context['responses_map'][response_identifier] = list(map(lambda x:x.text,
-                                                                          fill.findall('./m:alt', xmlns)))
-            fill_in_text += f'<textEntryInteraction responseIdentifier="{response_identifier}"/>'
+        for fill in fill_in:
+            if isinstance(fill.tag, str):  # not a comment or PI of a tree passed to the API, only their tail counts
+                response_identifier = f'RESPONSE{len(item_context["responses_map"]):02}'
+                item_context['responses_map'][response_identifier] = list(map(lambda x:x.text,
+                                                                              fill.findall('./m:alt', xmlns)))
+                fill_in_text += f'<textEntryInteraction responseIdentifier="{response_identifier}"/>'
             fill_in_text += fill.tail if fill.tail is not None else ""  # following text
         item_context['fill_in_html'] = escape_content_data(fill_in_text)
 
@@ -97,10 +234,23 @@ class QuestionHandlers:
         self._add_item(item_context, manifest_context, "mapInteraction")
 
     def _add_item(self, item_context, manifest_context, question_type_id):
-        self.items_map[item_context['assessment_identifier']] = QuestionFragments(
-            item_text=jinja_env.get_template(f"assessmentItem_{ question_type_id }.xml.jinja").render(**item_context),
-            manifest_text=jinja_env.get_template("imsmanifest_resource.xml.jinja").render(**manifest_context),
-        )
+        identifier = item_context['assessment_identifier']
+        item_template = self._get_template(f"assessmentItem_{ question_type_id }.xml.jinja")
+        with span("render"):
+            if self._zip_stream is not None:
+                # streaming mode: write the item chunk by chunk, keep only the (small) manifest fragment
+                self._zip_stream.write(f'{identifier}.xml', item_template.generate(**item_context))
+                item_text = None
+            else:
+                item_text = item_template.render(**item_context)
+            manifest_text = self._get_template("imsmanifest_resource.xml.jinja").render(**manifest_context)
+        self.items_map[identifier] = QuestionFragments(item_text=item_text, manifest_text=manifest_text)
+
+    def _get_template(self, name):
+        template = self.templates.get(name)
+        if template is None:
+            template = self.templates[name] = jinja_env.get_template(name)
+        return template
 
     def _prepare_context(self):
         item_context, manifest_context = {}, {}
@@ -120,7 +270,50 @@ class QuestionHandlers:
         return list(cls.question_handlers_map.keys())
 
     def handle_question(self, question):
-        self.question_handlers_map[get_local_tag(question)](self, question)
+        if self.render_cache is None:
+            handler = self.question_handlers_map[get_local_tag(question)]
+            with span(handler.__name__):
+                handler(self, question)
+            return
+        self.add_rendered(self.question_fragments(question))
+
+    def question_fragments(self, question) -> QuestionFragments:
+        """ Fragments with IDENTIFIER_PLACEHOLDER from the render cache or rendered (and cached) """
+        if self.render_cache is None:
+            return self.render_fragments(question)
+        with span("render_cache_get"):
+            key = self.render_cache.key(question)
+            fragments = self.render_cache.get(key)
+        if fragments is None:
+            fragments = self.render_fragments(question)
+            self.render_cache.put(key, fragments)
+        return fragments
+
+    def render_fragments(self, question) -> QuestionFragments:
+        """ Renders the question with IDENTIFIER_PLACEHOLDER, without adding it (see add_rendered) """
+        if self._placeholder_renderer is None:
+            self._placeholder_renderer = _PlaceholderRenderer()
+            self._placeholder_renderer.templates = self.templates
+        self._placeholder_renderer.handle_question(question)
+        return self._placeholder_renderer.items_map.pop(IDENTIFIER_PLACEHOLDER)
+
+    def handle_document(self, xml):
+        """ Handles all questions of a validated document """
+        for question in document_questions(xml):
+            self.handle_question(question)
+
+    def add_fragments(self, identifier: str, fragments: QuestionFragments):
+        """ Adds an item rendered elsewhere, e.g. in a worker process """
+        if self._zip_stream is not None and fragments.item_text is not None:
+            self._zip_stream.write(f'{identifier}.xml', (fragments.item_text,))
+            fragments = QuestionFragments(item_text=None, manifest_text=fragments.manifest_text)
+        self.items_map[identifier] = fragments
+
+    def add_rendered(self, fragments: QuestionFragments) -> str:
+        """ Adds fragments from render_fragments() under the next identifier of this archive """
+        identifier = self._new_identifier()
+        self.add_fragments(identifier, fragments.with_identifier(identifier))
+        return identifier
 
     def _new_identifier(self):
         identifier = f"item-{self.identity_counter:05}"
@@ -131,54 +324,219 @@ class QuestionHandlers:
         identifier = self._new_identifier()
         return identifier, f"resource-{identifier}"
 
-    def get_zip(self) -> bytes:
-        zip_buffer = io.BytesIO()
+    @contextmanager
+    def stream_zip(self, target):
+        """
+            Opens a QTI archive on target (file path or writable binary file object, e.g. a pipe or
+            sys.stdout.buffer) and writes every question handled inside the with block as soon as it
+            is rendered. Items handled before are written first, the manifest is written on exit.
+            A file path is written as temporary file next to it and renamed on success, so an error
+            inside the with block leaves no archive without manifest (and keeps an earlier archive).
+        """
+        if not isinstance(target, (str, os.PathLike)):
+            with self._stream_zip(target):
+                yield self
+            return
+        path = os.fspath(target)
+        temp_path = f"{path}.{uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'xb') as temp_file, self._stream_zip(temp_file):
+                yield self
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    @contextmanager
+    def _stream_zip(self, target):
         # from converter4.py
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        compress_type, compresslevel = zip_compression(self.compression)
+        writer = MemberWriter(target, compress_type, compresslevel, self.compress_threads)
+        try:
             for identifier, item in self.items_map.items():
-                with zipf.open(f'{identifier}.xml', 'w') as file:
-                    file.write(item.item_text.encode('utf-8'))
-            with zipf.open('imsmanifest.xml', 'w') as file:
-                file.write(self.generate_manifest().encode('utf-8'))
+                if item.item_text is None:
+                    raise ValueError(f"Item {identifier} wurde bereits in ein anderes Archiv geschrieben")
+                writer.write(f'{identifier}.xml', (item.item_text,))
+            self._zip_stream = writer
+            try:
+                yield self
+            finally:
+                self._zip_stream = None
+            with span("manifest"):
+                writer.write('imsmanifest.xml', self._manifest_template().generate(**self._manifest_context()))
+            writer.flush()
+        finally:
+            writer.close()
+
+    def write_zip(self, target):
+        """ Writes all handled questions as QTI archive to target (file path or binary file object) """
+        with self.stream_zip(target):
+            pass
+
+    def get_zip(self) -> bytes:
+        zip_buffer = io.BytesIO()
+        self.write_zip(zip_buffer)
         return zip_buffer.getvalue()
 
-    def generate_manifest(self):
+    def _manifest_context(self):
         context = {}
         context['manifest_identifier'] = f"llm-multiconverter-{uuid4()}"
-        context['resources'] = map(lambda x:x.manifest_text, self.items_map.values())
-        return jinja_env.get_template("imsmanifest.xml.jinja").render(**context)
+        context['resources'] = self.items_map.manifest_texts()
+        return context
+
+    def _manifest_template(self):
+        return self._get_template("imsmanifest.xml.jinja")
+
+    def generate_manifest(self):
+        with span("manifest"):
+            return self._manifest_template().render(**self._manifest_context())
+
+
+class _PlaceholderRenderer(QuestionHandlers):
+    """ Renders questions with IDENTIFIER_PLACEHOLDER instead of an identifier """
+    def _new_identifier(self):
+        return IDENTIFIER_PLACEHOLDER
+
 
+def document_questions(xml) -> list:
+    """ The questions of a <questions> document or the single question root """
+    return list(xml.iterchildren(etree.Element)) if get_local_tag(xml) == 'questions' else [xml]
 
-def main(argv):
-    if len(argv) < 3:
-        die(jinja_env.get_template("help.txt.jinja").render())
-        return # never reached outside stubbed test mode
 
-    output_filename = argv[1]
-    input_filenames = argv[2:]
-    validator = XMLValidator(xsd_path)
-    validation_results = validator.validate_files(input_filenames)
-    if not all(map(lambda x:x.is_valid, validation_results.values())):
-        handle_error(validation_results)
+def open_archive(target, first_identifier=1, render_cache=None, max_items=None, max_bytes=None, **archive_options):
+    """
+        Context manager taking the questions of an export: QuestionHandlers.stream_zip(target) or, with max_items
+        or max_bytes, a ShardWriter writing several archives named after target (see shards.py)
+    """
+    if max_items is None and max_bytes is None:
+        return QuestionHandlers(first_identifier, render_cache, **archive_options).stream_zip(target)
+    if not isinstance(target, str):
+        raise ValueError("Aufgeteilte Archive brauchen einen Dateinamen")
+    from multiconverter.shards import ShardWriter
+    return ShardWriter(target, max_items, max_bytes, first_identifier, render_cache, **archive_options)
+
+
+def render_help():
+    return jinja_env.get_template("help.txt.jinja").render()
+
+
+def convert(target, input_filenames, jobs=1, render_cache=None, skip_invalid=False, max_memory=None,
+            compression="default", compress_threads=1, limits: Optional[ErrorLimits] = None, error_summary=False,
+            dedup=None, drop_duplicates=False, max_items=None, max_bytes=None):
+    """
+        Validates the files and writes them as one archive to target, dies on invalid files.
+        With skip_invalid invalid questions are reported and left out. With a render cache the questions
+        are validated one by one and cached questions are not validated again. max_memory limits the fragments
+        kept until the manifest is written (see FragmentStore), compression and compress_threads are used for
+        the archive (see zip_writer.py). limits stop the validation after the given number of errors (the
+        conversion fails then), with error_summary the number of errors per class is reported instead of the
+        errors themselves. With a DedupIndex (see dedup.py) duplicate questions are reported, with
+        drop_duplicates also left out, and the index is saved after the conversion. With max_items or max_bytes
+        the questions are written into several archives (see shards.py), target must be a file name then.
+    """
+    archive_options = dict(max_memory=max_memory, compression=compression, compress_threads=compress_threads,
+                           max_items=max_items, max_bytes=max_bytes)
+    if error_summary and limits is None:
+        limits = ErrorLimits()
+    per_question = skip_invalid or render_cache is not None or limits is not None
+    if jobs > 1:
+        from multiconverter.parallel import convert_files_parallel
+        validation_results = convert_files_parallel(target, input_filenames, jobs, render_cache, skip_invalid,
+                                                    limits, dedup, drop_duplicates, **archive_options)
+        if _check_results(validation_results, skip_invalid, limits, error_summary) and dedup is not None:
+            dedup.save()
+        return
+
+    validator = get_validator(xsd_path)
+    if per_question:
+        is_known_valid = cached_question_check(render_cache)
+        validation_results = {filename: validator.validate_file_questions(filename, is_known_valid, limits)
+                              for filename in input_filenames}
     else:
-        handlers = QuestionHandlers()
+        validation_results = validator.validate_files(input_filenames)
+    if not _check_results(validation_results, skip_invalid, limits, error_summary):
+        return
+    with open_archive(target, render_cache=render_cache, **archive_options) as handlers:
         for filename in input_filenames:
-            xml = validation_results[filename].xml_content
-            if get_local_tag(xml) == 'questions':
-                for question in xml:
+            questions = _indexed_questions(validation_results[filename])
+            skipped = frozenset()
+            if dedup is not None:
+                skipped = handle_duplicates(filename, dedup.check_questions(filename, questions, drop_duplicates),
+                                            drop_duplicates)
+            for index, question in questions:
+                if index not in skipped:
                     handlers.handle_question(question)
-            else: # single question as root
-                handlers.handle_question(xml)
-        result = handlers.get_zip()
-        with open(output_filename, 'wb') as file:
-            file.write(result)
+    if dedup is not None:
+        dedup.save()
+
+
+def _indexed_questions(validation_result):
+    """ (index in the document, question) of the valid questions """
+    if isinstance(validation_result, QuestionsValidationResult):
+        return [(index, question) for index, question in enumerate(validation_result.questions)
+                if index not in validation_result.question_errors]
+    return list(enumerate(document_questions(validation_result.xml_content)))
+
+
+def handle_duplicates(filename, duplicates, drop_duplicates) -> frozenset:
+    """ Reports the duplicates (index, Duplicate) of a file on stderr, returns the indices to leave out """
+    for index, duplicate in duplicates:
+        print(f"Frage {index + 1} von {filename} gleicht Frage {duplicate.number} von {duplicate.filename} "
+              f"({duplicate.similarity:.0%}){' und wurde ausgelassen' if drop_duplicates else ''}", file=sys.stderr)
+    return frozenset(index for index, _ in duplicates) if drop_duplicates else frozenset()
+
+
+def cached_question_check(render_cache):
+    """ Questions in the render cache passed the validation before (the schema is part of the key) """
+    if render_cache is None:
+        return None
+    return lambda question: render_cache.contains(render_cache.key(question))
+
+
+def _check_results(validation_results, skip_invalid, limits=None, error_summary=False) -> bool:
+    """
+        Dies on invalid files, with skip_invalid only on files that can't be read at all
+        (or weren't validated because the limits were reached)
+    """
+    if skip_invalid:
+        if any(result.errors for result in validation_results.values()):
+            if error_summary:
+                die(limits.format_summary())
+                return False
+            handle_error({filename: result.to_validation_result() for filename, result in validation_results.items()})
+            return False
+        if error_summary:
+            if limits.total:
+                print(limits.format_summary(), file=sys.stderr)
+        else:
+            report_skipped_questions(validation_results)
+    elif not all(result.is_valid for result in validation_results.values()):
+        if error_summary:
+            die(limits.format_summary())
+            return False
+        handle_error({filename: result.to_validation_result() if isinstance(result, QuestionsValidationResult)
+                      else result for filename, result in validation_results.items()})
+        return False
+    return True
+
 
+def report_skipped_questions(validation_results):
+    """ Reports the invalid questions on stderr, the archive may go to stdout """
+    template = jinja_env.get_template("error_question.txt.jinja")
+    for filename, result in validation_results.items():
+        for index in sorted(result.question_errors):
+            print(template.render(file=filename, number=index + 1,
+                                  errors=[message for _, message in result.question_errors[index]]),
+                  file=sys.stderr)
 
 
 def handle_error(validation_results):
     for filename, document in validation_results.items():
         if document.is_valid:
-            print(f"Gültig: {filename} Root-Tag: {document.xml_content.tag}")
+            # in parallel mode the tree stays in the worker process
+            root_tag = document.xml_content.tag if document.xml_content is not None else "-"
+            print(f"Gültig: {filename} Root-Tag: {root_tag}")
         else:
             print(f"Ungültig: {filename}")
             for error, error_message in document.errors:
@@ -0,0 +1,207 @@
+# Detection of exact and near duplicate questions across files and batches
+#
+# Every question is reduced to its normalized texts: question text, options, alternatives and mappings
+# (NFKC, case folded, words only). Exact duplicates have the same digest of these texts (options, alternatives
+# and mappings in any order), near duplicates a similar set of word 3-grams (shingles). The similarity is
+# estimated from MinHash signatures: the SHAKE-128 output of a shingle provides NUM_HASHES independent 32 bit
+# hashes, the signature is their minimum over all shingles of the question. Candidates are found by locality
+# sensitive hashing: the signature is cut into BANDS bands and only questions sharing a band are compared, so
+# every question costs a constant number of lookups instead of a comparison with every question of the index.
+#
+# The index can be kept in a JSON file across runs. Checking a file replaces the entries of its earlier
+# conversion, so converting a regenerated file again doesn't report its own old questions.
+import base64
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from multiconverter.converter5 import xmlns
+from multiconverter.tools import get_local_tag
+
+NUM_HASHES = 64
+BANDS = 8  # of 8 rows: questions with a similarity from about 0.77 on share a band most likely
+DEFAULT_THRESHOLD = 0.8
+_INDEX_VERSION = 1
+_SIGNATURE = struct.Struct(f"<{NUM_HASHES}I")
+_WORD = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    digest: str  # equal for exact duplicates
+    signature: Tuple[int, ...]  # MinHash of the shingles
+
+    def similarity(self, other: "Fingerprint") -> float:
+        """ Estimated Jaccard similarity of the shingles """
+        return sum(a == b for a, b in zip(self.signature, other.signature)) / NUM_HASHES
+
+
+@dataclass
+class Duplicate:
+    filename: str  # of the question found in the index
+    number: int  # of the question in its file, from 1
+    similarity: float  # 1.0 for exact duplicates
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return _WORD.findall(unicodedata.normalize("NFKC", text or "").casefold())
+
+
+def _fields(question) -> Tuple[List[List[str]], List[List[str]]]:
+    """ Normalized words of the texts of the question: (fields in fixed order, fields in any order) """
+    ordered = [_words(question.findtext('m:text', namespaces=xmlns))]
+    unordered = []
+    tag = get_local_tag(question)
+    if tag == 'multiple-choice-question':
+        unordered = [_words(option.text) for option in question.iterfind('m:options/m:option', xmlns)]
+    elif tag == 'fill-in-question':
+        fill_in = question.find('m:fill-in-text', xmlns)
+        words = _words(fill_in.text)
+        for fill in fill_in:
+            words.append("_")  # the gap
+            words.extend(_words(fill.tail))
+            unordered.extend(_words(alt.text) for alt in fill.iterfind('m:alt', xmlns))
+        ordered.append(words)
+    elif tag == 'map-question':
+        unordered = [_words(mapping.findtext('m:left', namespaces=xmlns)) + ["="]
+                     + _words(mapping.findtext('m:right', namespaces=xmlns))
+                     for mapping in question.iterfind('m:mappings/m:mapping', xmlns)]
+    return ordered, unordered
+
+
+def fingerprint(question) -> Fingerprint:
+    tag = get_local_tag(question)
+    ordered, unordered = _fields(question)
+    texts = [" ".join(words) for words in ordered] + sorted(" ".join(words) for words in unordered)
+    digest = hashlib.sha256("\n".join([tag] + texts).encode("utf-8")).hexdigest()
+
+    shingles = {tag}
+    for words in ordered + unordered:
+        if len(words) < 3:
+            if words:
+                shingles.add(" ".join(words))
+        else:
+            shingles.update(" ".join(words[i:i + 3]) for i in range(len(words) - 2))
+    hashes = [_SIGNATURE.unpack(hashlib.shake_128(shingle.encode("utf-8")).digest(_SIGNATURE.size))
+              for shingle in shingles]
+    return Fingerprint(digest, tuple(map(min, *hashes)) if len(hashes) > 1 else hashes[0])
+
+
+def fingerprints(questions: Iterable[Tuple[int, object]]) -> List[Tuple[int, Fingerprint]]:
+    """ (index, fingerprint) of (index, question) pairs """
+    return [(index, fingerprint(question)) for index, question in questions]
+
+
+def _band_keys(signature: Tuple[int, ...]):
+    rows = NUM_HASHES // BANDS
+    return [signature[band * rows:(band + 1) * rows] for band in range(BANDS)]
+
+
+class DedupIndex:
+    """
+        Index of the questions converted so far, optionally stored in a JSON file (save() writes it).
+        threshold is the estimated similarity from which questions are near duplicates.
+    """
+    def __init__(self, path: Optional[str] = None, threshold: float = DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._entries: List[Optional[Tuple[str, int, Fingerprint]]] = []  # forgotten entries are None
+        self._digests: Dict[str, int] = {}  # digest -> entry
+        self._bands: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(BANDS)]  # band key -> entries
+        self._files: Dict[str, List[int]] = {}  # filename -> its entries
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._files.values())
+
+    def find(self, question_fingerprint: Fingerprint) -> Optional[Duplicate]:
+        """ The exact duplicate or the most similar near duplicate in the index """
+        entry = self._digests.get(question_fingerprint.digest)
+        if entry is not None and self._entries[entry] is not None:
+            filename, number, _ = self._entries[entry]
+            return Duplicate(filename, number, 1.0)
+        best, compared = None, set()
+        for band, key in zip(self._bands, _band_keys(question_fingerprint.signature)):
+            for entry in band.get(key, ()):
+                if entry in compared or self._entries[entry] is None:
+                    continue
+                compared.add(entry)
+                filename, number, other = self._entries[entry]
+                similarity = question_fingerprint.similarity(other)
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = Duplicate(filename, number, similarity)
+        return best
+
+    def add(self, filename: str, number: int, question_fingerprint: Fingerprint):
+        entry = len(self._entries)
+        self._entries.append((filename, number, question_fingerprint))
+        self._files.setdefault(filename, []).append(entry)
+        known = self._digests.get(question_fingerprint.digest)
+        if known is None or self._entries[known] is None:
+            self._digests[question_fingerprint.digest] = entry
+        for band, key in zip(self._bands, _band_keys(question_fingerprint.signature)):
+            band.setdefault(key, []).append(entry)
+
+    def forget_file(self, filename: str):
+        for entry in self._files.pop(filename, ()):
+            self._entries[entry] = None
+
+    def check(self, filename: str, file_fingerprints: Iterable[Tuple[int, Fingerprint]],
+              drop: bool = False) -> List[Tuple[int, Duplicate]]:
+        """
+            Checks the questions (index, fingerprint) of a file in order and adds them to the index, replacing
+            the entries of the file. Returns the duplicates, with drop these are not added to the index.
+        """
+        filename = os.path.abspath(filename)
+        self.forget_file(filename)
+        duplicates = []
+        for index, question_fingerprint in file_fingerprints:
+            duplicate = self.find(question_fingerprint)
+            if duplicate is not None:
+                duplicates.append((index, duplicate))
+                if drop:
+                    continue
+            self.add(filename, index + 1, question_fingerprint)
+        return duplicates
+
+    def check_questions(self, filename: str, questions: Iterable[Tuple[int, object]],
+                        drop: bool = False) -> List[Tuple[int, Duplicate]]:
+        """ check() for (index, question) pairs """
+        return self.check(filename, fingerprints(questions), drop)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != _INDEX_VERSION:
+                raise ValueError(f"Version {data.get('version')}")
+            for filename, number, digest, signature in data["entries"]:
+                self.add(filename, number,
+                         Fingerprint(digest, _SIGNATURE.unpack(base64.b64decode(signature))))
+        except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+            raise ValueError(f"Duplikat-Index {self.path} kann nicht gelesen werden: {e}") from e
+
+    def save(self):
+        """ Writes the index to its file (without path nothing is written) """
+        if self.path is None:
+            return
+        entries = [[filename, number, question_fingerprint.digest,
+                    base64.b64encode(_SIGNATURE.pack(*question_fingerprint.signature)).decode("ascii")]
+                   for filename, number, question_fingerprint in filter(None, self._entries)]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        # write and rename, an interrupted run keeps the previous index
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": _INDEX_VERSION, "entries": entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
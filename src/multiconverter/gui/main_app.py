@@ -4,15 +4,16 @@ Hauptapplikationsklasse für die multiconverter GUI - Wizard-Style Interface
 """
 import flet as ft
 import pyperclip
-import xml.etree.ElementTree as ET
 import os
+from functools import lru_cache
 from pathlib import Path
 from lxml import etree
 
-from ..tools import minimize_xsd_advanced
+from ..tools import minimize_xsd_advanced, get_local_tag
 from ..converter5 import QuestionHandlers, jinja_env
-from ..xml_validator import XMLValidator
+from ..xml_validator import Error, QuestionsValidationResult, XMLValidator, get_validator
 from .question_editor import QuestionEditorView
+from .validation_worker import ValidationWorker
 
 DEBUG = True
 def visible_debug_only(control: ft.Control) -> ft.Control:
@@ -26,6 +27,29 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 xsd_path = os.path.join(script_dir, "../xml/llmquestions.xsd")
 
 
+@lru_cache(maxsize=None)  # höchstens 2^n Kombinationen der Fragetypen
+def pruned_minimized_xsd(selected_question_types: frozenset[str]) -> str:
+    """Minimierte XSD, die nur die ausgewählten Fragetypen enthält"""
+    # Parse XSD mit lxml
+    parser = etree.XMLParser(remove_comments=False)
+    tree = etree.parse(str(xsd_path), parser)
+    root = tree.getroot()
+
+    # Namespace für XSD
+    ns = {"xs": "http://www.w3.org/2001/XMLSchema"}
+
+    # remove all elements except those in selected_question_types
+    for question_type in QuestionHandlers.get_question_types():
+        for xpath in [ f".//xs:element[@ref='{question_type}']", f".//xs:element[@name='{question_type}']" ]:
+            question_element = root.xpath(xpath, namespaces=ns)
+            assert len(question_element) == 1
+            if question_type not in selected_question_types:
+                parent = question_element[0].getparent()
+                parent.remove(question_element[0])
+
+    return minimize_xsd_advanced(etree.tostring(root, pretty_print=True).decode())
+
+
 class MultiConverterApp:
     def __init__(self, page: ft.Page):
         self.next_button_step2 = None
@@ -39,26 +63,61 @@ class MultiConverterApp:
         self.selected_question_types = set(QuestionHandlers.get_question_types())
         self.custom_prompt = ""
         self.xml_output = ""
+        self.prompt_field = None
+        self.output_field = None
+        self.next_button_step1 = None
         self.xml_output_field = None
         self.validation_result_field = None
+        self.validation_progress = None
         self.validated_questions = []
+        self.question_errors = {}  # Index einer fehlerhaften Frage -> Fehler, in Schritt 3 zu korrigieren
         self.processed_questions = []
         self.question_handlers = None
-        self.xml_validator = XMLValidator(xsd_path)
+        self.processed_count_text = None
 
         # UI Komponenten
         self.current_step = 1
         self.save_file_picker = ft.FilePicker(
             on_result=self.save_file_result
         )
+        self.validation_worker = ValidationWorker(
+            self.validate_xml_string, self.on_validation_started, self.on_validation_finished,
+            error_result=self.validation_error_result
+        )
+        self.step_views = {}  # Schritt -> Ansicht, bleibt über Schrittwechsel erhalten (außer Schritt 3)
+        self.step_content = None
+        self.snackbar = None
+        self.quit_dialog = None
         self.setup_ui()
 
+    @property
+    def xml_validator(self) -> XMLValidator:
+        """Gemeinsamer Validator, das Schema wird beim ersten Gebrauch übersetzt"""
+        return get_validator(xsd_path)
+
     def setup_ui(self):
         """Initialisiert die Benutzeroberfläche"""
+        # Overlay-Controls werden einmal angelegt und wiederverwendet, das Overlay wächst nicht
+        self.snackbar = ft.SnackBar(content=ft.Text(""))
+        self.quit_dialog = ft.AlertDialog(
+            title=ft.Text("Beenden"),
+            content=ft.Text("Möchten Sie wirklich beenden?"),
+            actions=[
+                ft.TextButton("Ja", on_click=lambda _: self.close_quit_dialog(True)),
+                ft.TextButton("Nein", on_click=lambda _: self.close_quit_dialog(False)),
+            ],
+            modal=True)
+        self.page.overlay.extend([self.save_file_picker, self.snackbar, self.quit_dialog])
         self.page.add(self.build_wizard())
 
     def build_wizard(self):
-        """Erstellt das Wizard-Interface"""
+        """Erstellt das Wizard-Interface, bei Schrittwechseln wird nur step_content ausgetauscht"""
+        self.step_content = ft.Column([
+            self.get_current_step_content()
+        ],
+        scroll=ft.ScrollMode.AUTO,
+        expand=True
+        )
         return ft.Column([
             ft.Container(
                 content=ft.Text(
@@ -71,12 +130,7 @@ class MultiConverterApp:
                 width=float('inf')
             ),
             ft.Container(
-                content=ft.Column([
-                    self.get_current_step_content()
-                ],
-                scroll=ft.ScrollMode.AUTO,
-                expand=True
-                ),
+                content=self.step_content,
                 expand=True,
                 padding=20
             )
@@ -85,17 +139,33 @@ class MultiConverterApp:
         )
 
     def get_current_step_content(self):
-        """Gibt den Inhalt für den aktuellen Schritt zurück"""
-        if self.current_step == 1:
-            return self.build_step1()
-        elif self.current_step == 2:
-            return self.build_step2()
-        elif self.current_step == 3:
-            return self.build_step3()
-        elif self.current_step == 4:
-            return self.build_step4()
-        else:
+        """Gibt den Inhalt für den aktuellen Schritt zurück, bestehende Ansichten werden nur aktualisiert"""
+        if self.current_step == 3:
+            return self.build_step3()  # hängt von den validierten Fragen des Durchlaufs ab
+        builders = {1: self.build_step1, 2: self.build_step2, 4: self.build_step4}
+        if self.current_step not in builders:
             return ft.Text("Unbekannter Schritt")
+        view = self.step_views.get(self.current_step)
+        if view is None:
+            view = self.step_views[self.current_step] = builders[self.current_step]()
+        else:
+            self.refresh_step(self.current_step)
+        return view
+
+    def refresh_step(self, step: int):
+        """Überträgt den aktuellen Zustand in die erhaltene Ansicht eines Schritts"""
+        if step == 1:
+            self.prompt_field.value = self.custom_prompt
+            self.output_field.value = self.generate_prompt_with_xsd()
+            self.next_button_step1.disabled = not self.selected_question_types
+        elif step == 2:
+            self.xml_output_field.value = self.xml_output
+            if not self.xml_output.strip():
+                self.validation_result_field.value = ""
+            self.validation_progress.visible = False
+            self.next_button_step2.disabled = not self.validated_questions
+        elif step == 4:
+            self.processed_count_text.value = f"Anzahl der gesicherten Fragen: {len(self.processed_questions)}"
 
     def build_step1(self):
         """Schritt 1: Fragetypen auswählen und Prompt eingeben"""
@@ -117,7 +187,7 @@ class MultiConverterApp:
             )
             checkboxes.append(checkbox)
 
-        prompt_field = ft.TextField(
+        self.prompt_field = ft.TextField(
             label="Prompt zu den Details der Fragen",
             multiline=True,
             min_lines=4,
@@ -135,10 +205,16 @@ class MultiConverterApp:
             value=self.generate_prompt_with_xsd()
         )
 
+        self.next_button_step1 = ft.ElevatedButton(
+            "Weiter",
+            on_click=lambda _: self.next_step(),
+            disabled=len(self.selected_question_types) == 0
+        )
+
         col_controls = [
             ft.Text("Schritt 1: Fragetypen auswählen und Prompt eingeben"),
             ft.Row(checkboxes),
-            prompt_field,
+            self.prompt_field,
             visible_debug_only(self.output_field),
             ft.Row([
                 ft.ElevatedButton(
@@ -146,11 +222,7 @@ class MultiConverterApp:
                     on_click=lambda _: self.copy_to_clipboard(self.output_field.value),
                     icon=ft.Icons.COPY
                 ),
-                ft.ElevatedButton(
-                    "Weiter",
-                    on_click=lambda _: self.next_step(),
-                    disabled=len(self.selected_question_types) == 0
-                )
+                self.next_button_step1
             ])]
         return ft.Column(col_controls,
                          scroll=ft.ScrollMode.ALWAYS,
@@ -175,6 +247,8 @@ class MultiConverterApp:
             max_lines=5,
         )
 
+        self.validation_progress = ft.ProgressBar(visible=False)
+
         # Button-Referenz für spätere Updates speichern
         self.next_button_step2 = ft.ElevatedButton(
             "Weiter",
@@ -197,6 +271,7 @@ class MultiConverterApp:
                     icon=ft.Icons.CHECK_CIRCLE
                 ),
             ]),
+            self.validation_progress,
             self.validation_result_field,
             ft.Row([
                 ft.ElevatedButton(
@@ -227,14 +302,17 @@ class MultiConverterApp:
             self.page,
             self.validated_questions,
             self.on_question_processed,
-            self.on_all_questions_processed
+            self.on_all_questions_processed,
+            self.question_errors,
+            self.show_snackbar
         ).build()
 
     def build_step4(self):
         """Schritt 4: Export und weitere Optionen"""
+        self.processed_count_text = ft.Text(f"Anzahl der gesicherten Fragen: {len(self.processed_questions)}")
         return ft.Column([
             ft.Text("Schritt 4: Export"),
-            ft.Text(f"Anzahl der gesicherten Fragen: {len(self.processed_questions)}"),
+            self.processed_count_text,
             ft.Row([
                 ft.ElevatedButton(
                     "XML Dokument speichern",
@@ -263,24 +341,14 @@ class MultiConverterApp:
         ])
 
     def handle_quit(self):
-        def button_handler(do_quit: bool):
-            alert_dialog.open = False
-            self.page.update()
-            if do_quit:
-                self.page.window.close()
-
-        alert_dialog = ft.AlertDialog(
-            title=ft.Text("Beenden"),
-            content=ft.Text("Möchten Sie wirklich beenden?"),
-            actions=[
-                ft.TextButton("Ja", on_click=lambda _: button_handler(True)),
-                ft.TextButton("Nein", on_click=lambda _: button_handler(False)),
-            ],
-            modal=True)
+        self.quit_dialog.open = True
+        self.page.update()
 
-        self.page.add(alert_dialog)  # TODO: remove on close?
-        alert_dialog.open = True
+    def close_quit_dialog(self, do_quit: bool):
+        self.quit_dialog.open = False
         self.page.update()
+        if do_quit:
+            self.page.window.close()
 
     def toggle_question_type(self, question_type: str, selected: bool):
         """Verwaltet die Auswahl der Fragetypen"""
@@ -295,13 +363,24 @@ class MultiConverterApp:
         if self.current_step == 1:
             if self.output_field:
                 self.output_field.value = self.generate_prompt_with_xsd()
+                self.next_button_step1.disabled = not self.selected_question_types
                 self.page.update()
 
     def update_new_xml_output(self):
+        """Merkt sich die Eingabe und validiert sie entprellt im Hintergrund"""
         self.xml_output = self.xml_output_field.value
-        self.validation_result_field.value = ""
-        self.next_button_step2.disabled = True
-        self.page.update()
+        self.validated_questions = []
+        self.question_errors = {}
+        if not self.next_button_step2.disabled:
+            self.next_button_step2.disabled = True
+            self.next_button_step2.update()
+        if self.xml_output.strip():
+            self.validation_worker.submit(self.xml_output)
+        else:
+            self.validation_worker.cancel()
+            self.validation_progress.visible = False
+            self.validation_result_field.value = ""
+            self.page.update()
 
     def generate_prompt_with_xsd(self) -> str:
         """Generiert den Prompt mit XSD und extrahiert nur die relevanten Teile basierend auf den ausgewählten Fragetypen"""
@@ -309,30 +388,13 @@ class MultiConverterApp:
             return ""
 
         try:
-            # Parse XSD mit lxml
-            parser = etree.XMLParser(remove_comments=False)
-            tree = etree.parse(str(xsd_path), parser)
-            root = tree.getroot()
-
-            # Namespace für XSD
-            ns = {"xs": "http://www.w3.org/2001/XMLSchema"}
-
-            # remove all elements except those in selected_question_types
-            for question_type in QuestionHandlers.get_question_types():
-                for xpath in [ f".//xs:element[@ref='{question_type}']", f".//xs:element[@name='{question_type}']" ]:
-                    question_element = root.xpath(xpath, namespaces=ns)
-                    assert len(question_element) == 1
-                    if question_type not in self.selected_question_types:
-                        parent = question_element[0].getparent()
-                        parent.remove(question_element[0])
-
-            xsd_content = etree.tostring(root, pretty_print=True).decode()
+            xsd_content = pruned_minimized_xsd(frozenset(self.selected_question_types))
 
             selected_types = ", ".join(self.selected_question_types)
             prompt = f"Erstelle Fragen der Typen: {selected_types}\n\n"
             if self.custom_prompt:
                 prompt += f"Zusätzlicher Prompt:\n{self.custom_prompt}\n\n"
-            prompt += f"Relevante XSD Schema-Definitionen:\n{minimize_xsd_advanced(xsd_content)}"
+            prompt += f"Relevante XSD Schema-Definitionen:\n{xsd_content}"
 
             return prompt + 2*"\n"
 
@@ -372,7 +434,7 @@ class MultiConverterApp:
             if validation_result.is_valid:
                 result_field.value = "XML ist gültig!"
                 # Extrahiere Fragen aus dem XML
-                self.extract_questions_from_xml()
+                self.extract_questions_from_xml(validation_result.xml_content)
             else:
                 error_messages = []
                 for error_type, error_message in validation_result.errors:
@@ -385,14 +447,12 @@ class MultiConverterApp:
 
         self.page.update()
 
-    def extract_questions_from_xml(self):
-        """Extrahiert Fragen aus dem validierten XML"""
-        try:
-            root = ET.fromstring(self.xml_output)
+    def extract_questions_from_xml(self, root: etree._Element):
+        """Extrahiert Fragen aus dem validierten XML (ohne erneutes Parsen)"""
+        if get_local_tag(root) == 'questions':
             self.validated_questions = list(root)
-        except ET.ParseError as e:
-            self.show_snackbar(f"Fehler beim Extrahieren der Fragen: {str(e)}")
-            self.validated_questions = []
+        else: # einzelne Frage als Wurzelelement
+            self.validated_questions = [root]
 
     def on_question_processed(self, question, action: str):
         """Callback für verarbeitete Fragen"""
@@ -411,12 +471,9 @@ class MultiConverterApp:
         """Speichert XML Dokument"""
         try:
             self.xml_data = jinja_env.get_template("questions.xml.jinja").render(
-                questions=map(lambda x:ET.tostring(x, encoding='utf-8').decode('utf-8'),
+                questions=map(lambda x:etree.tostring(x, encoding='unicode', with_tail=False),
                               self.processed_questions))
             # Dateidialog öffnen
-            if not self.save_file_picker in self.page.overlay:
-                self.page.overlay.append(self.save_file_picker)
-                self.page.update()
             self.save_file_picker.save_file(
                 dialog_title="XML speichern",
                 file_name="questions.xml",
@@ -431,12 +488,8 @@ class MultiConverterApp:
     def save_zip_archive(self):
         """Speichert ZIP Archiv"""
         try:
-            # see save_file_result()
-            self.zip_data = self.question_handlers.get_zip()
+            # Archiv wird direkt in die Datei geschrieben, see save_file_result()
             # Dateidialog öffnen
-            if not self.save_file_picker in self.page.overlay:
-                self.page.overlay.append(self.save_file_picker)
-                self.page.update()
             self.save_file_picker.save_file(
                 dialog_title="itslearning QTI ZIP Archiv speichern",
                 file_name="questions.zip",
@@ -451,14 +504,14 @@ class MultiConverterApp:
         """Verarbeitet das Ergebnis der Dateispeicherung"""
         if e.path:
             try:
-                with open(e.path, 'wb') as f:
-                    if "zip" in e.control.allowed_extensions:
-                        f.write(self.zip_data)
-                    elif "xml" in e.control.allowed_extensions:
+                if "zip" in e.control.allowed_extensions:
+                    self.question_handlers.write_zip(e.path)  # bei Fehlern bleibt kein halbes Archiv zurück
+                elif "xml" in e.control.allowed_extensions:
+                    with open(e.path, 'wb') as f:
                         f.write(self.xml_data.encode("utf-8"))
-                    else:
-                        self.show_snackbar("Unbekannter Dateityp. Nur .xml und .zip sind erlaubt.")
-                        return
+                else:
+                    self.show_snackbar("Unbekannter Dateityp. Nur .xml und .zip sind erlaubt.")
+                    return
                 self.show_snackbar(f"Datei erfolgreich gespeichert: {e.path}")
             except OSError as err:
                 self.show_snackbar(f"Fehler beim Speichern: {str(err)}")
@@ -469,32 +522,30 @@ class MultiConverterApp:
         self.custom_prompt = ""
         self.xml_output = ""
         self.validated_questions = []
+        self.question_errors = {}
         self.update_ui()
 
     def next_step(self):
         """Geht zum nächsten Schritt"""
+        self.validation_worker.cancel()
         self.current_step += 1
         self.update_ui()
 
     def previous_step(self):
         """Geht zum vorherigen Schritt"""
+        self.validation_worker.cancel()
         self.current_step -= 1
         self.update_ui()
 
     def update_ui(self):
-        """Aktualisiert die gesamte UI"""
-        self.page.clean()
-        self.page.add(self.build_wizard())
+        """Zeigt den aktuellen Schritt, nur der Inhalt des Schritts wird ausgetauscht"""
+        self.step_content.controls = [self.get_current_step_content()]
         self.page.update()
 
     def show_snackbar(self, message: str):
-        """Zeigt eine Snackbar-Nachricht"""
-        snackbar = ft.SnackBar(
-            content=ft.Text(message),
-            open=True
-        )
-        self.page.snack_bar = snackbar
-        self.page.overlay.append(snackbar)
+        """Zeigt eine Snackbar-Nachricht (immer dieselbe Snackbar)"""
+        self.snackbar.content.value = message
+        self.snackbar.open = True
         self.page.update()
 
 
@@ -504,38 +555,55 @@ class MultiConverterApp:
         pass
 
     def validate_xml_and_update_button(self, result_field: ft.TextField):
-        """Validiert das eingegebene XML und aktualisiert den Button"""
+        """Validiert das eingegebene XML sofort (ohne Entprellen) im Hintergrund"""
         if not self.xml_output.strip():
+            self.validation_worker.cancel()
             result_field.value = "Bitte geben Sie XML-Code ein"
             self.page.update()
             return
+        self.validation_worker.submit(self.xml_output, delay=0)
 
-        try:
-            validation_result = self.xml_validator.validate_xml_string(self.xml_output)
-            if validation_result.is_valid:
-                result_field.value = "XML ist gültig!"
-                # Extrahiere Fragen aus dem XML
-                self.extract_questions_from_xml()
-                # Button aktivieren
-                if hasattr(self, 'next_button_step2'):
-                    self.next_button_step2.disabled = False
-            else:
-                error_messages = []
-                for error_type, error_message in validation_result.errors:
-                    error_messages.append(error_message)
-                result_field.value = ("Überleg noch einmal. Der XML Parser hat folgenden Fehler ausgegeben:\n"
-                                      + "\n".join(error_messages))
-                self.validated_questions = []
-                # Button deaktivieren
-                if hasattr(self, 'next_button_step2'):
-                    self.next_button_step2.disabled = True
-        except OSError as e:
-            result_field.value = f"Fehler bei der Validierung: {str(e)}"
-            self.validated_questions = []
-            # Button deaktivieren
-            if hasattr(self, 'next_button_step2'):
-                self.next_button_step2.disabled = True
+    def validate_xml_string(self, xml_string: str) -> QuestionsValidationResult:
+        """Läuft im Hintergrund-Thread, validiert die Fragen einzeln"""
+        return self.xml_validator.validate_xml_string_questions(xml_string)
+
+    def validation_error_result(self, error: Exception) -> QuestionsValidationResult:
+        """Ergebnis für einen Fehler der Validierung im Hintergrund-Thread, wird wie ein Dokumentfehler angezeigt"""
+        return QuestionsValidationResult("", [(Error.UNKNOWN_ERROR, f"Fehler bei der Validierung: {str(error)}")])
+
+    def on_validation_started(self):
+        """Läuft im Hintergrund-Thread"""
+        if self.current_step == 2:
+            self.validation_progress.visible = True
+            self.validation_progress.update()
 
+    def on_validation_finished(self, validation_result: QuestionsValidationResult):
+        """Läuft im Hintergrund-Thread, nur für die aktuelle Eingabe"""
+        if self.current_step != 2:
+            return
+        if validation_result.errors:
+            # das Dokument selbst ist fehlerhaft, einzelne Fragen lassen sich nicht retten
+            error_messages = []
+            for error_type, error_message in validation_result.errors:
+                error_messages.append(error_message)
+            self.validation_result_field.value = (
+                "Überleg noch einmal. Der XML Parser hat folgenden Fehler ausgegeben:\n" + "\n".join(error_messages))
+            self.validated_questions = []
+            self.question_errors = {}
+            self.next_button_step2.disabled = True
+        else:
+            self.validated_questions = validation_result.questions
+            self.question_errors = validation_result.question_errors
+            if validation_result.question_errors:
+                lines = [f"{len(validation_result.question_errors)} von {len(validation_result.questions)} Fragen "
+                         f"sind fehlerhaft und können in Schritt 3 korrigiert werden:"]
+                for index, errors in sorted(validation_result.question_errors.items()):
+                    lines.extend(f"Frage {index + 1}: {error_message}" for _, error_message in errors)
+                self.validation_result_field.value = "\n".join(lines)
+            else:
+                self.validation_result_field.value = "XML ist gültig!"
+            self.next_button_step2.disabled = False
+        self.validation_progress.visible = False
         self.page.update()
 
     def set_custom_prompt(self, value : str):
@@ -5,26 +5,30 @@ Editor für einzelne Fragen mit XML Syntax-Highlighting und Validierung
 import os
 
 import flet as ft
-import xml.etree.ElementTree as ET
-from typing import List, Callable, Any
-from ..xml_validator import XMLValidator
+from lxml import etree
+from typing import Dict, List, Callable, Any, Optional
+from ..xml_validator import XMLValidator, get_validator
 
 # Template-Verzeichnis relativ zum Skript finden
 script_dir = os.path.dirname(os.path.abspath(__file__))
 xsd_path = os.path.join(script_dir, "../xml/llmquestions.xsd")
 
-ET.register_namespace("", "https://github.com/Hananja/multiconverter")
-
 class QuestionEditorView:
     def __init__(self, page: ft.Page, questions: List[Any],
-                 on_question_processed: Callable, on_all_processed: Callable):
+                 on_question_processed: Callable, on_all_processed: Callable,
+                 question_errors: Optional[Dict[int, List]] = None,
+                 show_snackbar: Optional[Callable[[str], None]] = None):
         self.editor_field = None
+        self.error_text = None
         self.page = page
         self.questions = questions
+        self.question_errors = question_errors or {}  # Fehler der Einzelvalidierung, Index -> Fehler
         self.on_question_processed = on_question_processed
         self.on_all_processed = on_all_processed
+        self.show_snackbar = show_snackbar or self._show_snackbar  # Meldungen, üblicherweise die der Hauptansicht
+        self._snackbar = None
         self.current_question_index = 0
-        self.xml_validator = XMLValidator(xsd_path)
+        self.xml_validator: XMLValidator = get_validator(xsd_path)  # gemeinsam mit der Hauptansicht
 
     def build(self):
         """Erstellt die Editor-Ansicht"""
@@ -37,11 +41,13 @@ class QuestionEditorView:
             max_lines=20,
             expand=True
         )
+        self.error_text = ft.Text(color=ft.Colors.RED, visible=False)
         self.update_editor_field()
 
         return ft.Column([
             ft.Text("Schritt 3: Fragen bearbeiten:"),
             self.editor_field,
+            self.error_text,
             ft.Row([
                 ft.ElevatedButton(
                     "Sichern",
@@ -61,26 +67,30 @@ class QuestionEditorView:
     def save_question(self, xml_content: str):
         """Sichert die bearbeitete Frage"""
         try:
-            # Validiere das bearbeitete XML
-            validation_result = self.xml_validator.validate_xml_string(xml_content)
+            # Validiere nur die bearbeitete Frage, unveränderte gültige Fragen sind dem Validator bekannt
+            validation_result = self.xml_validator.validate_xml_string_questions(xml_content).to_validation_result()
             if not validation_result.is_valid:
-                snack_bar = ft.SnackBar(content=ft.Text(f"XML Fehler: " + os.linesep.join(
-                    map(lambda x:x[1], validation_result.errors))))
-                self.page.overlay.append(snack_bar)
-                snack_bar.open = True
-                self.page.update()
+                self.question_errors[self.current_question_index] = validation_result.errors
+                self.show_question_errors()
+                self.show_snackbar(f"XML Fehler: " + os.linesep.join(map(lambda x:x[1], validation_result.errors)))
                 return
 
-            # Parse das XML
-            question = ET.fromstring(xml_content)
-            self.on_question_processed(question, "save")
+            # validierten Baum direkt übernehmen, kein erneutes Parsen
+            self.question_errors.pop(self.current_question_index, None)
+            self.on_question_processed(validation_result.xml_content, "save")
             self.next_question()
 
         except OSError as e:
-            snack_bar = ft.SnackBar(content=ft.Text(f"Fehler beim Sichern: {str(e)}"))
-            self.page.overlay.append(snack_bar)
-            snack_bar.open = True
-            self.page.update()
+            self.show_snackbar(f"Fehler beim Sichern: {str(e)}")
+
+    def _show_snackbar(self, message: str):
+        """Eigene Snackbar ohne Hauptansicht, wird nur einmal ins Overlay eingefügt"""
+        if self._snackbar is None:
+            self._snackbar = ft.SnackBar(content=ft.Text(""))
+            self.page.overlay.append(self._snackbar)
+        self._snackbar.content.value = message
+        self._snackbar.open = True
+        self.page.update()
 
     def discard_question(self):
         """Verwirft die aktuelle Frage"""
@@ -99,8 +109,15 @@ class QuestionEditorView:
         """Aktualisiert das Editor-Feld mit dem aktuellen XML-Inhalt"""
         if self.editor_field:
             question = self.questions[self.current_question_index]
-            question_xml = ET.tostring(question, encoding='unicode')
+            question_xml = etree.tostring(question, encoding='unicode', with_tail=False)
             self.editor_field.value = question_xml
             self.editor_field.label = f"Frage {self.current_question_index + 1} von {len(self.questions)}"
+            self.show_question_errors()
             self.page.update()
 
+    def show_question_errors(self):
+        """Zeigt die Fehler der aktuellen Frage unter dem Editor an"""
+        errors = self.question_errors.get(self.current_question_index, [])
+        self.error_text.value = os.linesep.join(error_message for _, error_message in errors)
+        self.error_text.visible = bool(errors)
+
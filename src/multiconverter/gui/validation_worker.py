@@ -0,0 +1,80 @@
+# src/multiconverter/gui/validation_worker.py
+"""
+Hintergrund-Validierung für die GUI - entprellt Eingaben und verwirft veraltete Ergebnisse
+"""
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Optional, Tuple
+
+
+class ValidationWorker:
+    """
+    Validiert XML in einem eigenen Thread, damit die Oberfläche nicht blockiert.
+
+    Jede neue Eingabe ersetzt die noch wartende und macht laufende Validierungen veraltet: deren Ergebnis wird
+    verworfen. Validiert wird erst, wenn für `delay` Sekunden keine neue Eingabe kam.
+
+    Das Ergebnis wird unter der Sperre zugestellt, die auch submit() und cancel() nehmen: nach deren Rückkehr
+    kommt kein veraltetes Ergebnis mehr an. Fehler von on_started() und validate() werden mit `error_result`
+    in ein Ergebnis umgewandelt (Standard: die Exception selbst) und ebenfalls an on_finished() übergeben.
+    """
+    def __init__(self, validate: Callable[[str], Any],
+                 on_started: Callable[[], None], on_finished: Callable[[Any], None],
+                 delay: float = 0.5, error_result: Optional[Callable[[Exception], Any]] = None):
+        self.validate = validate
+        self.on_started = on_started
+        self.on_finished = on_finished
+        self.error_result = error_result or (lambda error: error)
+        self.delay = delay
+        self._condition = threading.Condition()  # mit RLock: on_finished() darf submit() und cancel() aufrufen
+        self._generation = 0
+        self._pending: Optional[Tuple[int, str, float]] = None  # (Generation, XML, fällig um)
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, xml_string: str, delay: Optional[float] = None):
+        """Validiert xml_string nach der Wartezeit, ältere Anfragen werden verworfen"""
+        with self._condition:
+            self._generation += 1
+            due = time.monotonic() + (self.delay if delay is None else delay)
+            self._pending = (self._generation, xml_string, due)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ValidationWorker", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def cancel(self):
+        """Verwirft wartende und laufende Validierungen"""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    if self._pending is None:
+                        self._condition.wait()
+                        continue
+                    generation, xml_string, due = self._pending
+                    remaining = due - time.monotonic()
+                    if remaining > 0:  # entprellen: auf weitere Eingaben warten
+                        self._condition.wait(remaining)
+                        continue
+                    self._pending = None
+                try:
+                    self.on_started()
+                    result = self.validate(xml_string)
+                except Exception as e:
+                    result = self.error_result(e)
+                with self._condition:  # prüfen und zustellen in einem Schritt
+                    if generation != self._generation:
+                        continue
+                    try:
+                        self.on_finished(result)
+                    except Exception:  # z.B. Seite bereits geschlossen, die nächste Eingabe wird wieder validiert
+                        traceback.print_exc(file=sys.stderr)
+        finally:
+            with self._condition:
+                self._thread = None  # submit() startet einen neuen Thread
@@ -0,0 +1,109 @@
+# Parallel conversion of many input files with a process pool
+#
+# Every file is read, parsed and validated once in a worker, which also renders its valid questions with
+# IDENTIFIER_PLACEHOLDER (lxml trees can't leave the process, fragments can). The parent adds the fragments in
+# input order with add_rendered(), so the identifiers are exactly those of a serial run, whatever worker
+# finished first. The fragments of all files are kept until every file is validated.
+# Validated question by question, the invalid questions are not rendered and left out.
+# Error limits apply per file in the workers, the files after the one that reaches the total cap are cancelled.
+# For the duplicate detection the workers compute the fingerprints, the index is checked in input order
+# before the archive is written, dropped duplicates are left out like invalid questions.
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from multiconverter.converter5 import (QuestionFragments, QuestionHandlers, _indexed_questions, cached_question_check,
+                                       handle_duplicates, open_archive, precompile_templates, xsd_path)
+from multiconverter.dedup import Fingerprint, fingerprints
+from multiconverter.profiling import span
+from multiconverter.xml_validator import Error, ErrorLimits, ValidationResult, get_validator, not_validated
+
+
+@dataclass
+class FileSummary:
+    result: ValidationResult  # or QuestionsValidationResult, without trees, they can't leave the worker
+    fragments: List[Tuple[int, QuestionFragments]] = field(default_factory=list)  # of the valid questions
+    error_counts: Counter = field(default_factory=Counter)  # per error class, with limits only
+    fingerprints: List[Tuple[int, Fingerprint]] = field(default_factory=list)  # of the valid questions, for dedup
+
+
+def _init_worker():
+    get_validator(xsd_path)  # one compiled schema per worker process
+    precompile_templates()
+
+
+def _validate_worker(filename: str, per_question: bool, render_cache, limits: Optional[ErrorLimits],
+                     dedup: bool) -> FileSummary:
+    """ Validates the file and renders its valid questions with IDENTIFIER_PLACEHOLDER """
+    validator = get_validator(xsd_path)
+    file_limits = None
+    if per_question:
+        # fresh limits per file, the tasks of one chunk share the unpickled object
+        file_limits = None if limits is None else ErrorLimits(limits.max_per_file, limits.max_total)
+        result = validator.validate_file_questions(filename, cached_question_check(render_cache), file_limits)
+        questions = [] if result.errors else _indexed_questions(result)
+        result.questions = []
+    else:
+        result = validator.validate_file(filename)
+        questions = _indexed_questions(result) if result.is_valid else []
+    file_fingerprints = fingerprints(questions) if dedup else []
+    renderer = QuestionHandlers(render_cache=render_cache)
+    with span("render_file", file=filename, questions=len(questions)):
+        fragments = [(index, renderer.question_fragments(question)) for index, question in questions]
+    result.xml_content = None
+    return FileSummary(result, fragments, file_limits.counts if file_limits is not None else Counter(),
+                       file_fingerprints)
+
+
+def convert_files_parallel(target, input_filenames: List[str], jobs: int, render_cache=None, skip_invalid=False,
+                           limits: Optional[ErrorLimits] = None, dedup=None, drop_duplicates=False,
+                           **archive_options) -> Dict[str, ValidationResult]:
+    """
+        Validates and converts the files with jobs worker processes and writes one archive to target
+        (file path or binary file object). Nothing is written if any file is invalid, with skip_invalid
+        only if a file can't be read at all. limits count the errors of all files and stop the validation
+        (see ErrorLimits). dedup and drop_duplicates as for convert(), the index is not saved here.
+        archive_options are passed to open_archive().
+    """
+    jobs = min(jobs, len(input_filenames)) or 1
+    chunksize = max(1, len(input_filenames) // (4 * jobs))
+    per_question = skip_invalid or render_cache is not None or limits is not None
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+        with span("parallel_validate", files=len(input_filenames)):
+            summaries = []
+            for summary in executor.map(_validate_worker, input_filenames, repeat(per_question),
+                                        repeat(render_cache), repeat(limits), repeat(dedup is not None),
+                                        chunksize=chunksize):
+                summaries.append(summary)
+                if limits is not None:
+                    for error_class, number in summary.error_counts.items():
+                        limits.count(error_class, number)
+                    if any(error is Error.LIMIT_REACHED for error, _ in summary.result.errors):
+                        limits.stopped = True
+                    if limits.exhausted and len(summaries) < len(input_filenames):
+                        limits.stopped = True
+                        executor.shutdown(cancel_futures=True)
+                        summaries.extend(FileSummary(not_validated(filename))
+                                         for filename in input_filenames[len(summaries):])
+                        break
+    validation_results = {filename: summary.result for filename, summary in zip(input_filenames, summaries)}
+    if skip_invalid:
+        if any(summary.result.errors for summary in summaries):
+            return validation_results
+    elif not all(summary.result.is_valid for summary in summaries):
+        return validation_results
+    skipped = [frozenset()] * len(summaries)  # the invalid questions were not rendered
+    if dedup is not None:
+        for i, (filename, summary) in enumerate(zip(input_filenames, summaries)):
+            skipped[i] = handle_duplicates(filename, dedup.check(filename, summary.fingerprints, drop_duplicates),
+                                           drop_duplicates)
+
+    with span("parallel_write", files=len(input_filenames)), open_archive(target, **archive_options) as handlers:
+        for summary, dropped in zip(summaries, skipped):
+            for index, fragments in summary.fragments:
+                if index not in dropped:
+                    handlers.add_rendered(fragments)
+            summary.fragments = []  # written
+    return validation_results
@@ -0,0 +1,114 @@
+# Per-stage profiling of conversions: multiconverter --profile ... or the API hook
+#
+#   with profiling.profile() as profiler:
+#       convert(...)
+#   profiler.write_summary("profile.json")   # wall time, CPU time and allocations per stage
+#   profiler.write_trace("trace.json")       # Chrome trace events (chrome://tracing, Perfetto)
+#
+# The stages are marked with span(name) in the code. Without an active profiler span() returns a shared
+# no-op context, so the instrumentation costs next to nothing. Times of a stage include the stages nested in
+# it (e.g. render includes compress when the items are streamed). CPU time is the time of the thread, allocations
+# are the net change of the allocated memory blocks (sys.getallocatedblocks) during the stage.
+# With --jobs only the main process is profiled, the worker processes show up as their phases.
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+from multiconverter import __version__
+
+_NO_SPAN = nullcontext()
+_active: Optional["Profiler"] = None
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start", "cpu_start", "blocks_start")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.blocks_start = sys.getallocatedblocks()
+        self.cpu_start = time.thread_time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        cpu = time.thread_time_ns() - self.cpu_start
+        self.profiler._record(self.name, self.args, self.start, end - self.start, cpu,
+                              sys.getallocatedblocks() - self.blocks_start)
+        return False
+
+
+class Profiler:
+    def __init__(self):
+        self.events = []  # (name, args, start_ns, wall_ns, cpu_ns, allocated_blocks, thread id)
+        self._origin = time.perf_counter_ns()
+
+    def span(self, name: str, **args) -> _Span:
+        return _Span(self, name, args)
+
+    def _record(self, name, args, start, wall, cpu, blocks):
+        self.events.append((name, args, start, wall, cpu, blocks, threading.get_ident()))  # atomic with the GIL
+
+    def summary(self) -> dict:
+        stages = {}
+        for name, _, _, wall, cpu, blocks, _ in self.events:
+            stage = stages.setdefault(name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "allocated_blocks": 0})
+            stage["count"] += 1
+            stage["wall_s"] += wall / 1e9
+            stage["cpu_s"] += cpu / 1e9
+            stage["allocated_blocks"] += blocks
+        return {"version": __version__, "stages": stages}
+
+    def chrome_trace(self) -> dict:
+        events = []
+        for name, args, start, wall, cpu, blocks, thread in self.events:
+            events.append({
+                "name": name, "cat": "multiconverter", "ph": "X", "pid": 1, "tid": thread,
+                "ts": (start - self._origin) / 1e3, "dur": wall / 1e3,  # µs
+                "args": {**args, "cpu_ms": cpu / 1e6, "allocated_blocks": blocks},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_summary(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def write_trace(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def format_summary(self) -> str:
+        """ Table of the stages, slowest first """
+        stages = sorted(self.summary()["stages"].items(), key=lambda item: item[1]["wall_s"], reverse=True)
+        lines = [f"{'Schritt':<32} {'Anzahl':>8} {'Wall s':>10} {'CPU s':>10} {'Blöcke':>10}"]
+        for name, stage in stages:
+            lines.append(f"{name:<32} {stage['count']:>8} {stage['wall_s']:>10.4f} {stage['cpu_s']:>10.4f} "
+                         f"{stage['allocated_blocks']:>10}")
+        return "\n".join(lines)
+
+
+def span(name: str, **args):
+    """ Marks a stage for the active profiler, a no-op without one """
+    profiler = _active
+    if profiler is None:
+        return _NO_SPAN
+    return profiler.span(name, **args)
+
+
+@contextmanager
+def profile():
+    """ Profiles everything inside the with block (process wide) """
+    global _active
+    previous, profiler = _active, Profiler()
+    _active = profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
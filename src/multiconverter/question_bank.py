@@ -0,0 +1,229 @@
+# Local question bank: validated questions and their rendered fragments in a SQLite database
+#
+#   multiconverter bank add [--bank FILE] [--tag TAG]... <input_file1>.xml [<input_file2>.xml ...]
+#   multiconverter bank export [--bank FILE] [--type TYPE] [--source FILE] [--tag TAG]... [--random N [--seed S]]
+#                              [--compression C] [--max-items N] [--max-bytes SIZE] <output_file>.zip
+#   multiconverter bank list [--bank FILE]
+#
+# Questions are added once: validated one by one, rendered with placeholder identifiers and stored together with
+# their XML. They are indexed by type, source file, tags and content hash (C14N); a question added again only gets
+# the new tags. Exports select a subset and write the stored fragments into an archive without reading any XML.
+# Fragments rendered with other templates (see render_cache.templates_digest) are rendered again from the stored XML.
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from lxml import etree
+
+from multiconverter.cli import die, parse_size
+from multiconverter.converter5 import (QuestionFragments, QuestionHandlers, open_archive, report_skipped_questions,
+                                       xmlns, xsd_path)
+from multiconverter.render_cache import templates_digest
+from multiconverter.tools import get_local_tag
+from multiconverter.xml_validator import QuestionsValidationResult, get_validator
+from multiconverter.zip_writer import COMPRESSION_CHOICES
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY,
+        content_hash TEXT NOT NULL UNIQUE,
+        type TEXT NOT NULL,
+        source TEXT NOT NULL,
+        number INTEGER NOT NULL,  -- in the source file, from 1
+        text TEXT,  -- of the question, for lists
+        xml TEXT NOT NULL,
+        item_text TEXT NOT NULL,  -- fragments with IDENTIFIER_PLACEHOLDER
+        manifest_text TEXT NOT NULL,
+        templates TEXT NOT NULL  -- templates_digest() of the fragments
+    );
+    CREATE INDEX IF NOT EXISTS questions_type ON questions (type);
+    CREATE INDEX IF NOT EXISTS questions_source ON questions (source);
+    CREATE TABLE IF NOT EXISTS tags (
+        tag TEXT NOT NULL,
+        question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+        PRIMARY KEY (tag, question_id)
+    ) WITHOUT ROWID;
+"""
+
+
+def default_bank_path() -> str:
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "multiconverter", "questions.sqlite")
+
+
+def content_hash(question) -> str:
+    return hashlib.sha256(etree.tostring(question, method="c14n", with_tail=False)).hexdigest()
+
+
+class QuestionBank:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_bank_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, _SCHEMA_VERSION):
+            self._connection.close()
+            raise ValueError(f"Fragenbank {self.path} hat die unbekannte Version {version}")
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        self._renderer = QuestionHandlers()  # renders with placeholder identifiers only
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_file(self, filename: str, tags: Iterable[str] = ()) -> Tuple[QuestionsValidationResult, int]:
+        """
+            Validates the questions of the file and adds the valid ones with the tags.
+            Returns the validation result and the number of new questions (nothing is added on document errors).
+        """
+        result = get_validator(xsd_path).validate_file_questions(filename)
+        if result.errors:
+            return result, 0
+        source, digest, tags, added = os.path.abspath(filename), templates_digest(), list(tags), 0
+        with self._connection:  # one transaction per file
+            for index, question in enumerate(result.questions):
+                if index in result.question_errors:
+                    continue
+                question_hash = content_hash(question)
+                row = self._connection.execute("SELECT id FROM questions WHERE content_hash = ?",
+                                               (question_hash,)).fetchone()
+                if row is None:
+                    fragments = self._renderer.render_fragments(question)
+                    question_id = self._connection.execute(
+                        "INSERT INTO questions (content_hash, type, source, number, text, xml, item_text,"
+                        " manifest_text, templates) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (question_hash, get_local_tag(question), source, index + 1,
+                         question.findtext('m:text', namespaces=xmlns),
+                         etree.tostring(question, encoding="unicode", with_tail=False),
+                         fragments.item_text, fragments.manifest_text, digest)).lastrowid
+                    added += 1
+                else:
+                    question_id = row[0]
+                self._connection.executemany("INSERT OR IGNORE INTO tags (tag, question_id) VALUES (?, ?)",
+                                             [(tag, question_id) for tag in tags])
+        return result, added
+
+    def select(self, question_type: Optional[str] = None, source: Optional[str] = None, tags: Iterable[str] = (),
+               count: Optional[int] = None, seed=None) -> List[int]:
+        """
+            Ids of the questions of the type, from the source file and with all tags, in the order they were
+            added. With count a random sample of at most count questions (reproducible with seed).
+        """
+        conditions, parameters = [], []
+        if question_type is not None:
+            conditions.append("type = ?")
+            parameters.append(question_type)
+        if source is not None:
+            conditions.append("source = ?")
+            parameters.append(os.path.abspath(source))
+        for tag in tags:
+            conditions.append("id IN (SELECT question_id FROM tags WHERE tag = ?)")
+            parameters.append(tag)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        ids = [row[0] for row in self._connection.execute(f"SELECT id FROM questions{where} ORDER BY id", parameters)]
+        if count is not None and count < len(ids):
+            ids = random.Random(seed).sample(ids, count)
+        return ids
+
+    def fragments(self, question_id: int) -> QuestionFragments:
+        """ Stored fragments of the question, rendered again if the templates changed since """
+        item_text, manifest_text, digest, xml = self._connection.execute(
+            "SELECT item_text, manifest_text, templates, xml FROM questions WHERE id = ?", (question_id,)).fetchone()
+        if digest == templates_digest():
+            return QuestionFragments(item_text=item_text, manifest_text=manifest_text)
+        fragments = self._renderer.render_fragments(etree.fromstring(xml))
+        with self._connection:
+            self._connection.execute(
+                "UPDATE questions SET item_text = ?, manifest_text = ?, templates = ? WHERE id = ?",
+                (fragments.item_text, fragments.manifest_text, templates_digest(), question_id))
+        return fragments
+
+    def export(self, target, question_ids: Iterable[int], **archive_options) -> int:
+        """
+            Writes the questions as QTI archive to target (file path or binary file object), archive_options
+            are passed to open_archive() (e.g. max_items for several archives). Returns the number of questions.
+        """
+        count = 0
+        with open_archive(target, **archive_options) as handlers:
+            for question_id in question_ids:
+                handlers.add_rendered(self.fragments(question_id))
+                count += 1
+        return count
+
+    def statistics(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """ Number of questions per type and per tag """
+        types = dict(self._connection.execute("SELECT type, count(*) FROM questions GROUP BY type ORDER BY type"))
+        tags = dict(self._connection.execute("SELECT tag, count(*) FROM tags GROUP BY tag ORDER BY tag"))
+        return types, tags
+
+
+def main(argv):
+    """ argv without the program name, starting with "bank" """
+    parser = argparse.ArgumentParser(prog="multiconverter bank", description="Lokale Fragenbank")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Fragen der Dateien aufnehmen")
+    add.add_argument("files", nargs="+")
+    add.add_argument("--tag", action="append", default=[])
+    export = commands.add_parser("export", help="Auswahl der Fragen als Archiv schreiben")
+    export.add_argument("output_file")
+    export.add_argument("--type", choices=QuestionHandlers.get_question_types())
+    export.add_argument("--source")
+    export.add_argument("--tag", action="append", default=[])
+    export.add_argument("--random", type=int, metavar="N")
+    export.add_argument("--seed", type=int)
+    export.add_argument("--compression", default="default", choices=COMPRESSION_CHOICES)
+    export.add_argument("--max-items", type=int)
+    export.add_argument("--max-bytes", type=parse_size)
+    commands.add_parser("list", help="Anzahl der Fragen nach Typ und Tag")
+    for command in commands.choices.values():
+        command.add_argument("--bank", help="Datenbank (Standard: ~/.local/share/multiconverter/questions.sqlite)")
+    arguments = parser.parse_args(argv[1:])
+
+    try:
+        bank = QuestionBank(arguments.bank)
+    except (ValueError, sqlite3.Error) as e:
+        die(f"multiconverter bank: {e}")
+        return # never reached outside stubbed test mode
+    with bank:
+        if arguments.command == "add":
+            for filename in arguments.files:
+                result, added = bank.add_file(filename, arguments.tag)
+                for _, message in result.errors:
+                    print(f"Übersprungen: {filename}: {message}", file=sys.stderr)
+                report_skipped_questions({filename: result})
+                print(f"{filename}: {added} neue Fragen")
+        elif arguments.command == "export":
+            if arguments.output_file == '-' and (arguments.max_items is not None or arguments.max_bytes is not None):
+                die("multiconverter bank: --max-items und --max-bytes schreiben mehrere Archive, - ist nicht möglich")
+                return # never reached outside stubbed test mode
+            if arguments.max_items is not None and arguments.max_items < 1:
+                die("multiconverter bank: --max-items muss mindestens 1 sein")
+                return # never reached outside stubbed test mode
+            if arguments.random is not None and arguments.random < 0:
+                die("multiconverter bank: --random darf nicht negativ sein")
+                return # never reached outside stubbed test mode
+            question_ids = bank.select(arguments.type, arguments.source, arguments.tag, arguments.random,
+                                       arguments.seed)
+            target = sys.stdout.buffer if arguments.output_file == '-' else arguments.output_file
+            count = bank.export(target, question_ids, compression=arguments.compression,
+                                max_items=arguments.max_items, max_bytes=arguments.max_bytes)
+            print(f"{arguments.output_file}: {count} Fragen", file=sys.stderr)
+        else:
+            types, tags = bank.statistics()
+            for question_type, count in types.items():
+                print(f"{question_type:<32} {count:>8}")
+            for tag, count in tags.items():
+                print(f"Tag {tag:<28} {count:>8}")
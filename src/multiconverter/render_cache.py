@@ -0,0 +1,135 @@
+# Content-addressed on-disk cache of rendered questions
+#
+# The key is a hash of the canonicalized (C14N) question element, the item templates, the schema and the package
+# version. An entry also proves that the question passed the validation, so it is not validated again.
+# The fragments are stored with a placeholder instead of the identifier, so a cached question gets the identifier
+# of the archive it is added to. Least recently used entries are removed when the cache exceeds max_bytes.
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from lxml import etree
+
+from multiconverter import __version__
+from multiconverter.converter5 import QuestionFragments, template_dir, xsd_path
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_ENTRY_SUFFIX = ".json"
+
+_templates_digest: Optional[str] = None
+
+
+def default_cache_directory() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "multiconverter", "fragments")
+
+
+def templates_digest() -> str:
+    """ Hash of all item and manifest templates and the schema, changes of these invalidate the cache """
+    global _templates_digest
+    if _templates_digest is None:
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(template_dir)):
+            if name.startswith(("assessmentItem_", "imsmanifest")):
+                with open(os.path.join(template_dir, name), "rb") as f:
+                    digest.update(name.encode("utf-8") + b"\0" + f.read() + b"\0")
+        with open(xsd_path, "rb") as f:
+            digest.update(f.read())
+        _templates_digest = digest.hexdigest()
+    return _templates_digest
+
+
+class RenderCache:
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_directory()
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None  # bytes on disk, determined on the first write
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __getstate__(self):  # for worker processes
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["max_bytes"])
+
+    @staticmethod
+    def key(question) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{__version__}\0{templates_digest()}\0".encode("utf-8"))
+        digest.update(etree.tostring(question, method="c14n", with_tail=False))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[QuestionFragments]:
+        """ Fragments with placeholder identifier or None """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # recently used
+        except (OSError, ValueError):
+            return None
+        return QuestionFragments(item_text=entry["item_text"], manifest_text=entry["manifest_text"])
+
+    def put(self, key: str, fragments: QuestionFragments):
+        data = json.dumps({"item_text": fragments.item_text, "manifest_text": fragments.manifest_text},
+                          ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_size()
+        try:
+            # write and rename, so other processes never read half written entries
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            return  # the cache is optional
+        with self._lock:
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """ (stat, path) of all entries """
+        result = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(_ENTRY_SUFFIX):
+                    try:
+                        result.append((entry.stat(), entry.path))
+                    except OSError:  # removed by another process
+                        pass
+        return result
+
+    def _disk_size(self) -> int:
+        return sum(stat.st_size for stat, _ in self._entries())
+
+    def _evict(self):
+        """ Removes the least recently used entries down to 80 % of max_bytes """
+        entries = sorted(self._entries(), key=lambda x: x[0].st_mtime)
+        size = sum(stat.st_size for stat, _ in entries)
+        for stat, path in entries:
+            if size <= self.max_bytes * 0.8:
+                break
+            try:
+                os.remove(path)
+                size -= stat.st_size
+            except OSError:
+                pass
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            for _, path in self._entries():
+                os.remove(path)
+            self._size = 0
@@ -0,0 +1,125 @@
+# Long-running conversion service: multiconverter serve [--host HOST] [--port PORT] [--socket PATH]
+#
+# The schema is compiled and the templates are loaded once at startup into the api.Converter of the server.
+# Every request is handled in its own thread with its own QuestionHandlers, so the identifiers of concurrent
+# conversions are independent.
+#
+#   POST /validate  LLM XML in the body -> JSON {"valid": ..., "root": ..., "errors": [{"type": ..., "message": ...}]}
+#   POST /convert   LLM XML in the body -> QTI ZIP (application/zip), JSON as for /validate if invalid (422)
+#   GET  /health    -> JSON {"status": "ok", "version": ...}
+import argparse
+import json
+import os
+import socketserver
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from multiconverter import __version__
+from multiconverter.cli import die
+from multiconverter.api import Converter
+from multiconverter.xml_validator import ValidationResult
+
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+
+def validation_response(result: ValidationResult) -> dict:
+    return {
+        "valid": result.is_valid,
+        "root": result.xml_content.tag if result.xml_content is not None else None,
+        "errors": [{"type": error.name, "message": message} for error, message in result.errors],
+    }
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    server_version = f"multiconverter/{__version__}"
+    protocol_version = "HTTP/1.0"  # the archive is streamed without Content-Length, the connection ends it
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(HTTPStatus.OK, {"status": "ok", "version": __version__})
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unbekannter Pfad: {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/validate", "/convert"):
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unbekannter Pfad: {self.path}"})
+            return
+        body = self._read_body()
+        if body is None:
+            return
+        # the raw bytes are decoded like a file: BOM, XML declaration or sniffed encoding (e.g. cp1252 exports)
+        result = self.server.converter.validate(body)
+        if self.path == "/validate":
+            self._send_json(HTTPStatus.OK, validation_response(result))
+        elif not result.is_valid:
+            self._send_json(HTTPStatus.UNPROCESSABLE_ENTITY, validation_response(result))
+        else:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/zip")
+            self.send_header("Content-Disposition", 'attachment; filename="questions.zip"')
+            self.end_headers()
+            self.server.converter.write_archive(result, self.wfile)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_REQUEST_SIZE:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": f"Content-Length muss zwischen 1 und {MAX_REQUEST_SIZE} liegen"})
+            return None
+        return self.rfile.read(length)
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # unix sockets have no client address
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def create_server(host="127.0.0.1", port=8080, socket_path=None):
+    """ Compiles the schema, loads the templates and binds the server (not started yet) """
+    converter = Converter()
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, ConversionRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ConversionRequestHandler)
+    server.converter = converter
+    return server
+
+
+def main(argv):
+    """ argv without the program name, starting with "serve" """
+    parser = argparse.ArgumentParser(prog="multiconverter serve", description="Konvertierungsdienst")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse (Standard: nur localhost)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--socket", dest="socket_path", help="Unix-Socket statt TCP")
+    arguments = parser.parse_args(argv[1:])
+
+    try:
+        server = create_server(arguments.host, arguments.port, arguments.socket_path)
+    except OSError as e:
+        die(f"multiconverter serve: {e}")
+        return # never reached outside stubbed test mode
+    where = arguments.socket_path or f"http://{arguments.host}:{server.server_port}"
+    print(f"multiconverter {__version__} bereit: {where}", flush=True)
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    if arguments.socket_path is not None:
+        os.unlink(arguments.socket_path)
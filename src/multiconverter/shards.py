@@ -0,0 +1,132 @@
+# Output of large exports as several self-contained QTI archives (shards), e.g. for import limits of itslearning
+#
+# The questions are distributed in order over archives of at most max_items questions and max_bytes bytes. The size
+# is estimated from the uncompressed members plus the zip headers, so the compressed archives stay below max_bytes.
+# The identifiers are numbered across the shards, so they are unique in all archives. Every shard gets its own
+# manifest and is written in a thread pool as soon as it is full, while the next one is filled.
+# The shards are written under temporary names and renamed when all of them are complete. Then shards of an earlier
+# export beyond the new count are removed, so the archives next to the output file are always one complete export.
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from uuid import uuid4
+
+from multiconverter.converter5 import QuestionFragments, QuestionHandlers
+from multiconverter.profiling import span
+
+MEMBER_OVERHEAD = 200  # bytes per member: local header, central directory entry and name
+ARCHIVE_OVERHEAD = 4096  # manifest without resources and end of central directory
+
+
+def shard_filename(output_filename: str, number: int) -> str:
+    """ out.zip -> out-001.zip """
+    base, extension = os.path.splitext(output_filename)
+    return f"{base}-{number:03}{extension or '.zip'}"
+
+
+def _fragments_size(fragments: QuestionFragments) -> int:
+    return len(fragments.item_text.encode('utf-8')) + len(fragments.manifest_text.encode('utf-8')) + MEMBER_OVERHEAD
+
+
+def _write_shard(path: str, items, archive_options: dict):
+    handlers = QuestionHandlers(**archive_options)
+    for identifier, fragments in items:
+        handlers.add_fragments(identifier, fragments)
+    with span("shard", file=path, items=len(items)), open(path, 'xb') as f:
+        handlers.write_zip(f)
+
+
+class ShardWriter:
+    """
+        Writes the questions into shard_filename(output_filename, 1, 2, ...). Takes the questions like
+        QuestionHandlers (handle_question, add_rendered, add_fragments), use it as context manager (see
+        QuestionHandlers.stream_zip), paths lists the archives written. archive_options are passed to the
+        QuestionHandlers of the shards, render_cache is used for handle_question. oversized lists the
+        identifiers of questions larger than max_bytes on their own, their shards exceed it.
+    """
+    def __init__(self, output_filename: str, max_items: Optional[int] = None, max_bytes: Optional[int] = None,
+                 first_identifier: int = 1, render_cache=None, threads: Optional[int] = None, **archive_options):
+        if max_items is not None and max_items < 1:
+            raise ValueError("max_items muss mindestens 1 sein")
+        self.output_filename = output_filename
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.archive_options = archive_options
+        self.paths: List[str] = []
+        self.oversized: List[str] = []
+        self._temp_paths: List[str] = []  # written, renamed to paths on success
+        self._token = uuid4().hex
+        self._renderer = QuestionHandlers(first_identifier, render_cache)  # placeholders and identifiers
+        self._items = []  # (identifier, fragments) of the shard being filled
+        self._size = ARCHIVE_OVERHEAD
+        self._threads = threads or min(4, os.cpu_count() or 1)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = []  # futures of the shards being written
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(self._threads, thread_name_prefix="shard")
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        completed = False
+        try:
+            if exc_type is None:
+                if self._items or not self.paths:  # at least one archive, also without questions
+                    self._write_shard()
+                for future in self._pending:
+                    future.result()
+                completed = True
+        finally:
+            self._executor.shutdown(cancel_futures=not completed)
+            self._executor = None
+            if completed:
+                self._replace_shards()
+            else:  # the shards of an earlier export stay as they are
+                for temp_path in self._temp_paths:
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+        return False
+
+    def _replace_shards(self):
+        for temp_path, path in zip(self._temp_paths, self.paths):
+            os.replace(temp_path, path)
+        # an earlier export into more shards would be imported along with this one
+        number = len(self.paths) + 1
+        while os.path.exists(shard_filename(self.output_filename, number)):
+            os.unlink(shard_filename(self.output_filename, number))
+            number += 1
+
+    def handle_question(self, question):
+        self.add_rendered(self._renderer.question_fragments(question))
+
+    def add_rendered(self, fragments: QuestionFragments) -> str:
+        """ Adds fragments with IDENTIFIER_PLACEHOLDER under the next identifier """
+        identifier = self._renderer._new_identifier()
+        self.add_fragments(identifier, fragments.with_identifier(identifier))
+        return identifier
+
+    def add_fragments(self, identifier: str, fragments: QuestionFragments):
+        """ Adds fragments rendered for the identifier, starts a new shard if they don't fit """
+        size = _fragments_size(fragments)
+        if self.max_bytes is not None and ARCHIVE_OVERHEAD + size > self.max_bytes:
+            self.oversized.append(identifier)
+            print(f"{identifier} ist mit etwa {size} Bytes allein größer als die Grenze von {self.max_bytes} Bytes, "
+                  f"sein Archiv überschreitet sie", file=sys.stderr)
+        if self._items and ((self.max_items is not None and len(self._items) >= self.max_items)
+                            or (self.max_bytes is not None and self._size + size > self.max_bytes)):
+            self._write_shard()
+        self._items.append((identifier, fragments))
+        self._size += size
+
+    def _write_shard(self):
+        path = shard_filename(self.output_filename, len(self.paths) + 1)
+        temp_path = f"{path}.{self._token}.tmp"
+        self.paths.append(path)
+        self._temp_paths.append(temp_path)
+        self._pending.append(self._executor.submit(_write_shard, temp_path, self._items, self.archive_options))
+        self._items, self._size = [], ARCHIVE_OVERHEAD
+        # at most two shards per thread wait in memory
+        while len(self._pending) > 2 * self._threads:
+            self._pending.pop(0).result()
+        self._pending = [future for future in self._pending if not future.done() or future.exception()]
@@ -109,30 +109,48 @@ if __name__ == "__main__":
 def get_local_tag(element):
     return etree.QName(element.tag).localname
 
+# "<" starts a tag if followed by a letter, digit or one of !?/ ([^\W_] is exactly str.isalnum())
+_LONE_LT = re.compile(r'<(?![^\W_]|[!?/])')
+
+
 def escape_content_data(text):
     """
         Replaces < and > if they are standing alone and are not part of a tag.
     """
     if text is None:
         return text
+    if '<' not in text and '>' not in text:
+        return text
+
+    # a lone "<" is always escaped, afterward every remaining "<" starts a tag
+    text = _LONE_LT.sub('&lt;', text)
+    if '>' not in text:
+        return text
+    if '<' not in text:
+        return text.replace('>', '&gt;')
+    # a ">" ends a tag if a tag was started since the previous ">", otherwise it is escaped
+    segments = text.split('>')
+    last = segments.pop()
+    segments = [segment + '>' if '<' in segment else segment + '&gt;' for segment in segments]
+    segments.append(last)
+    return ''.join(segments)
 
-    result = []
-    in_tag = False
-    for i, char in enumerate(text):
-        if char == '<':
-            # Check if it's likely starting a tag (followed by valid tag chars)
-            if i + 1 < len(text) and (text[i + 1].isalnum() or text[i + 1] in '!?/'):
-                in_tag = True
-                result.append(char)
-            else:
-                result.append('&lt;')
-        elif char == '>':
-            if in_tag:
-                in_tag = False
-                result.append(char)
-            else:
-                result.append('&gt;')
-        else:
-            result.append(char)
-
-    return ''.join(result)
+
+# NUL can't occur in XML text, the ">" resets the tag state between the joined texts
+_BATCH_SEPARATOR = '\x00>'
+_ESCAPED_BATCH_SEPARATOR = re.compile('\x00(?:>|&gt;)')
+
+
+def escape_content_data_many(texts):
+    """
+        Escapes many texts in one call like escape_content_data(), None values are kept.
+        All texts containing < or > are escaped together as one joined text.
+    """
+    result = list(texts)
+    indices = [i for i, text in enumerate(result) if text is not None and ('<' in text or '>' in text)]
+    if len(indices) < 2 or any('\x00' in result[i] for i in indices):
+        return [escape_content_data(text) for text in result]
+    joined = _BATCH_SEPARATOR.join(result[i] for i in indices) + _BATCH_SEPARATOR
+    for i, escaped in zip(indices, _ESCAPED_BATCH_SEPARATOR.split(escape_content_data(joined))):
+        result[i] = escaped
+    return result
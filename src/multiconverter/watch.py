@@ -0,0 +1,123 @@
+# Watch mode: multiconverter watch [--interval SECONDS] [--compression C] <output_file>.zip <directory>
+#
+# Monitors the *.xml files of a directory (by polling, no extra dependencies) and rebuilds the archive on
+# every change. Only added or changed files are validated and rendered again; the questions of the unchanged
+# files are kept as fragments with placeholder identifiers, so the archive is rewritten from them without
+# rendering. The files are added in the order of their names, the identifiers are assigned on every rebuild.
+# Invalid questions are reported and left out, unreadable files are reported and skipped.
+import argparse
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from multiconverter.cli import die
+from multiconverter.converter5 import QuestionFragments, QuestionHandlers, jinja_env, xsd_path
+from multiconverter.xml_validator import get_validator
+from multiconverter.zip_writer import COMPRESSION_CHOICES
+
+Stamp = Tuple[int, int]  # (mtime_ns, size)
+
+
+@dataclass
+class WatchedFile:
+    stamp: Stamp
+    fragments: List[QuestionFragments] = field(default_factory=list)  # valid questions, placeholder identifiers
+    errors: List = field(default_factory=list)  # the file can't be read or has no <questions> root
+    question_errors: Dict[int, List] = field(default_factory=dict)
+
+
+class Watcher:
+    def __init__(self, output_filename: str, directory: str, **archive_options):
+        self.output_filename = output_filename
+        self.directory = directory
+        self.archive_options = archive_options  # for QuestionHandlers, e.g. compression
+        self.files: Dict[str, WatchedFile] = {}  # key is the path
+        self._renderer = QuestionHandlers()  # renders with placeholder identifiers only
+
+    def scan(self) -> Dict[str, Stamp]:
+        stamps = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith('.xml') and entry.is_file():
+                    try:
+                        stat = entry.stat()
+                    except OSError:  # removed in the meantime
+                        continue
+                    stamps[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def update(self) -> List[str]:
+        """ Processes added and changed files, forgets removed ones. Returns the changed paths. """
+        stamps = self.scan()
+        changed = [path for path in self.files if path not in stamps]
+        for path in changed:
+            del self.files[path]
+        for path, stamp in sorted(stamps.items()):
+            watched = self.files.get(path)
+            if watched is None or watched.stamp != stamp:
+                self.files[path] = self._process(path, stamp)
+                changed.append(path)
+        return changed
+
+    def _process(self, path: str, stamp: Stamp) -> WatchedFile:
+        result = get_validator(xsd_path).validate_file_questions(path)
+        if result.errors:
+            return WatchedFile(stamp, errors=result.errors)
+        fragments = [self._renderer.render_fragments(question) for question in result.valid_questions]
+        return WatchedFile(stamp, fragments, question_errors=result.question_errors)
+
+    def write_archive(self) -> int:
+        """ Rewrites the archive from the fragments, returns the number of questions """
+        handlers = QuestionHandlers(**self.archive_options)
+        for path in sorted(self.files):
+            for fragments in self.files[path].fragments:
+                handlers.add_rendered(fragments)
+        handlers.write_zip(self.output_filename)  # replaces the archive, readers never see half written archives
+        return len(handlers.items_map)
+
+    def report(self, paths: List[str]):
+        """ Prints the errors of the given files """
+        question_template = jinja_env.get_template("error_question.txt.jinja")
+        for path in paths:
+            watched = self.files.get(path)
+            if watched is None:
+                print(f"Entfernt: {path}")
+                continue
+            for _, message in watched.errors:
+                print(f"Übersprungen: {path}: {message}")
+            for index in sorted(watched.question_errors):
+                print(question_template.render(file=path, number=index + 1,
+                                               errors=[message for _, message in watched.question_errors[index]]))
+
+    def run(self, interval: float):
+        while True:
+            start = time.perf_counter()
+            changed = self.update()
+            if changed:
+                self.report(changed)
+                count = self.write_archive()
+                print(f"{self.output_filename}: {count} Fragen aus {len(self.files)} Dateien "
+                      f"({len(changed)} geändert, {time.perf_counter() - start:.2f} s)", flush=True)
+            time.sleep(interval)
+
+
+def main(argv):
+    """ argv without the program name, starting with "watch" """
+    parser = argparse.ArgumentParser(prog="multiconverter watch",
+                                     description="Archiv bei jeder Änderung der XML-Dateien neu erstellen")
+    parser.add_argument("output_file")
+    parser.add_argument("directory")
+    parser.add_argument("--interval", type=float, default=0.5, help="Sekunden zwischen zwei Prüfungen")
+    parser.add_argument("--compression", default="default", choices=COMPRESSION_CHOICES)
+    arguments = parser.parse_args(argv[1:])
+
+    if not os.path.isdir(arguments.directory):
+        die(f"multiconverter watch: Verzeichnis nicht gefunden: {arguments.directory}")
+        return # never reached outside stubbed test mode
+    watcher = Watcher(arguments.output_file, arguments.directory, compression=arguments.compression)
+    print(f"multiconverter: beobachte {arguments.directory} (Strg+C beendet)", flush=True)
+    try:
+        watcher.run(arguments.interval)
+    except KeyboardInterrupt:
+        pass
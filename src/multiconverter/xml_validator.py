@@ -1,12 +1,19 @@
 # https://www.perplexity.ai/search/erstelle-ein-python-skript-das-PjbssWsRRIef5.vs8CI7uA
 #
-import xml.etree.ElementTree as ET
 from enum import Enum
 
 from lxml import etree
+import copy
+import hashlib
+import itertools
+import mmap
 import os
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+import threading
+from collections import Counter
+from typing import Callable, List, Dict, Optional
+from dataclasses import dataclass, field
+
+from multiconverter.profiling import span
 
 class Error(Enum):
     FILE_NOT_FOUND = 1
@@ -15,6 +22,7 @@ class Error(Enum):
     EXTENSION_ERROR = 4
     XML_ERROR = 5
     PERMISSION_DENIED = 6
+    LIMIT_REACHED = 7  # not validated, see ErrorLimits
     UNKNOWN_ERROR = 100
 
 @dataclass
@@ -22,71 +30,307 @@ class ValidationResult:
     filename: str
     is_valid: bool
     errors: List[str]
-    xml_content: Optional[ET.Element] = None
+    xml_content: Optional[etree._Element] = None  # validated lxml tree, parsed exactly once
+
+@dataclass
+class QuestionsValidationResult:
+    """ Result of the validation question by question, the valid questions can be converted on their own """
+    filename: str
+    errors: List = field(default_factory=list)  # errors of the document itself (syntax, root element)
+    questions: List[etree._Element] = field(default_factory=list)  # all questions in document order
+    question_errors: Dict[int, List] = field(default_factory=dict)  # index of an invalid question -> its errors
+    xml_content: Optional[etree._Element] = None
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.errors and not self.question_errors
+
+    @property
+    def valid_questions(self) -> List[etree._Element]:
+        return [question for index, question in enumerate(self.questions) if index not in self.question_errors]
+
+    def to_validation_result(self) -> ValidationResult:
+        errors = [error for error in self.errors if error[0] is not Error.LIMIT_REACHED]
+        for index in sorted(self.question_errors):
+            errors.extend(self.question_errors[index])
+        errors.extend(error for error in self.errors if error[0] is Error.LIMIT_REACHED)  # after the errors found
+        return ValidationResult(self.filename, self.is_valid, errors, self.xml_content if self.is_valid else None)
+
+LIMIT_MESSAGE = "Nicht weiter geprüft: Fehlergrenze erreicht"
+
+def not_validated(filename: str) -> QuestionsValidationResult:
+    """ Result of a file skipped because the error limits are reached """
+    return QuestionsValidationResult(filename, [(Error.LIMIT_REACHED, LIMIT_MESSAGE)])
+
+class ErrorLimits:
+    """
+        Caps the errors collected in one run: at most max_per_file errors per file and max_total over all files,
+        fail_fast stops at the first error. Once a cap is reached the rest of the file (or of all files) is not
+        validated, schema errors beyond the cap are counted but not formatted.
+        counts holds the number of errors per class: the libxml2 type of schema errors, else the Error name.
+    """
+    def __init__(self, max_per_file: Optional[int] = None, max_total: Optional[int] = None, fail_fast: bool = False):
+        if fail_fast:
+            max_per_file = max_total = 1
+        self.max_per_file = max_per_file
+        self.max_total = max_total
+        self.counts = Counter()
+        self.total = 0
+        self.stopped = False  # files or questions were left out
+        self._file_start = 0
+
+    def start_file(self):
+        self._file_start = self.total
+
+    def available(self) -> Optional[int]:
+        """ Number of errors that may still be collected in the current file, None without cap """
+        caps = []
+        if self.max_per_file is not None:
+            caps.append(self.max_per_file - (self.total - self._file_start))
+        if self.max_total is not None:
+            caps.append(self.max_total - self.total)
+        return max(min(caps), 0) if caps else None
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_total is not None and self.total >= self.max_total
+
+    def count(self, error_class: str, number: int = 1):
+        self.counts[error_class] += number
+        self.total += number
+
+    def count_errors(self, errors):
+        for error, _ in errors:
+            if error is not Error.LIMIT_REACHED:
+                self.count(error.name)
+
+    def format_summary(self) -> str:
+        """ Table of the error classes, most frequent first """
+        lines = [f"Fehler nach Art ({self.total} insgesamt):"]
+        for error_class, number in self.counts.most_common():
+            lines.append(f"  {error_class:<40} {number:>8}")
+        if self.stopped:
+            lines.append(LIMIT_MESSAGE)
+        return "\n".join(lines)
+
+def _document_parser(encoding: Optional[str] = None) -> etree.XMLParser:
+    """
+        Parser for LLM documents. Comments and processing instructions are dropped (as ElementTree did),
+        so iterating over an element only yields the question elements. encoding overrides BOM and declaration.
+    """
+    return etree.XMLParser(remove_comments=True, remove_pis=True, encoding=encoding)
+
+MMAP_THRESHOLD = 1024 * 1024  # larger files are memory-mapped instead of read
+_ENCODING_ERRORS = (81, 32)  # libxml2: XML_ERR_INVALID_ENCODING, XML_ERR_UNSUPPORTED_ENCODING
+_CP1252_UNDEFINED = (b"\x81", b"\x8d", b"\x8f", b"\x90", b"\x9d")
+
+def sniff_fallback_encoding(data) -> str:
+    """
+        Encoding of a document that is not in its declared encoding (or UTF-8): Windows exports are cp1252
+        (typographic quotes and the euro sign in 0x80-0x9F), ISO-8859-1 if it has bytes undefined in cp1252
+    """
+    if any(data.find(byte) >= 0 for byte in _CP1252_UNDEFINED):
+        return 'iso-8859-1'
+    return 'cp1252'
 
 class XMLValidator:
+    MAX_REMEMBERED_QUESTIONS = 10000
+
     def __init__(self, xsd_path: str):
         self.xsd_path = xsd_path
         self.schema = None
+        self.target_namespace = None
+        # the schema keeps the error log of the last validation, so shared validators validate one by one
+        self._lock = threading.Lock()
+        self._valid_questions = set()  # C14N digests of questions that passed validate_question
         self._load_schema()
 
     def _load_schema(self):
         try:
             if not os.path.exists(self.xsd_path):
                 raise FileNotFoundError(f"XSD-Schema-Datei nicht gefunden: {self.xsd_path}")
-            with open(self.xsd_path, 'r', encoding='utf-8') as schema_file:
+            with span("load_schema"), open(self.xsd_path, 'r', encoding='utf-8') as schema_file:
                 schema_doc = etree.parse(schema_file)
                 self.schema = etree.XMLSchema(schema_doc)
+                self.target_namespace = schema_doc.getroot().get("targetNamespace")
         except etree.XMLSyntaxError as e:
             raise ValueError(f"Fehler beim Parsen der XSD-Schema-Datei: {e}")
         except Exception as e:
             raise RuntimeError(f"Unerwarteter Fehler beim Laden des Schemas: {e}")
 
-    def validate_file(self, xml_file_path: str) -> ValidationResult:
-        errors = []
-        xml_content = None
+    def _validate_document(self, xml_doc, errors, limits: Optional[ErrorLimits] = None) -> bool:
+        """ Validates against the schema and appends the schema errors, with limits only as many as available """
+        with span("validate"), self._lock:
+            is_valid = self.schema.validate(xml_doc)
+            if not is_valid:
+                error_log = self.schema.error_log
+                available = None if limits is None else limits.available()
+                for error in itertools.islice(error_log, available):
+                    errors.append((Error.XSD_ERROR, f"Zeile {error.line}: {error.message}"))
+                if limits is not None:
+                    for error in error_log:
+                        limits.count(error.type_name)
+        return is_valid
+
+    @staticmethod
+    def parse_file(xml_file_path: str) -> etree._ElementTree:
+        """
+            Parses the file without validation, raises UnicodeError if no known encoding fits.
+            The file is read once as bytes (memory-mapped from MMAP_THRESHOLD on), lxml decodes it by BOM
+            and XML declaration (default UTF-8). Only if that fails, it is parsed once more with the
+            sniffed fallback encoding.
+        """
+        with open(xml_file_path, 'rb') as xml_file:
+            size = os.fstat(xml_file.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                with span("read", file=xml_file_path, mmap=True):
+                    data = mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ)
+                with data:
+                    return XMLValidator._parse_bytes(data, xml_file_path)
+            with span("read", file=xml_file_path):
+                data = xml_file.read()
+            return XMLValidator._parse_bytes(data, xml_file_path)
+
+    @staticmethod
+    def _parse_bytes(data, xml_file_path: str, encoding: Optional[str] = None) -> etree._ElementTree:
+        if encoding is None:
+            try:
+                with span("parse"):
+                    return etree.fromstring(data, _document_parser(), base_url=xml_file_path).getroottree()
+            except etree.XMLSyntaxError as e:
+                if e.code not in _ENCODING_ERRORS:
+                    raise
+            encoding = sniff_fallback_encoding(data)
+        try:
+            with span("parse", encoding=encoding):
+                return etree.fromstring(data, _document_parser(encoding), base_url=xml_file_path).getroottree()
+        except etree.XMLSyntaxError as e:
+            if e.code in _ENCODING_ERRORS:
+                raise UnicodeError(f"Keine passende Kodierung für {xml_file_path}") from e
+            raise
+
+    def _read_file(self, xml_file_path: str, errors) -> Optional[etree._ElementTree]:
+        """ Parses the file for validation, appends the reason and returns None if that is impossible """
         try:
             if not os.path.exists(xml_file_path):
                 errors.append((Error.FILE_NOT_FOUND,f"Datei nicht gefunden: {xml_file_path}"))
-                return ValidationResult(xml_file_path, False, errors)
+                return None
             if not xml_file_path.lower().endswith('.xml'):
                 errors.append((Error.EXTENSION_ERROR, f"Datei hat keine .xml-Erweiterung: {xml_file_path}"))
-                return ValidationResult(xml_file_path, False, errors)
+                return None
             try:
-                with open(xml_file_path, 'r', encoding='utf-8') as xml_file:
-                    xml_doc = etree.parse(xml_file)
-            except UnicodeDecodeError:
-                for encoding in ['latin-1', 'cp1252', 'iso-8859-1']:
-                    try:
-                        with open(xml_file_path, 'r', encoding=encoding) as xml_file:
-                            xml_doc = etree.parse(xml_file)
-                        break
-                    except (UnicodeDecodeError, etree.XMLSyntaxError):
-                        continue
-                else:
-                    errors.append((Error.ENCODING_ERROR, "Encoding-Fehler: Datei konnte nicht gelesen werden"))
-                    return ValidationResult(xml_file_path, False, errors)
+                xml_doc = self.parse_file(xml_file_path)
+            except UnicodeError:
+                errors.append((Error.ENCODING_ERROR, "Encoding-Fehler: Datei konnte nicht gelesen werden"))
+                return None
 
             if self.schema is None:
                 errors.append((Error.UNKNOWN_ERROR, "Kein XSD-Schema geladen"))
-                return ValidationResult(xml_file_path, False, errors)
-
-            is_valid = self.schema.validate(xml_doc)
-            if not is_valid:
-                for error in self.schema.error_log:
-                    errors.append((Error.XSD_ERROR, f"Zeile {error.line}: {error.message}"))
-            else:
-                xml_content = ET.fromstring(etree.tostring(xml_doc, encoding='unicode'))
-            return ValidationResult(xml_file_path, is_valid, errors, xml_content)
+                return None
+            return xml_doc
         except etree.XMLSyntaxError as e:
             errors.append((Error.XML_ERROR, f"XML-Syntax-Fehler: {e}"))
-            return ValidationResult(xml_file_path, False, errors)
         except PermissionError:
             errors.append((Error.PERMISSION_DENIED, f"Keine Berechtigung zum Lesen der Datei: {xml_file_path}"))
+        except Exception as e:
+            errors.append((Error.UNKNOWN_ERROR, f"Unerwarteter Fehler: {e}"))
+        return None
+
+    def validate_file(self, xml_file_path: str) -> ValidationResult:
+        errors = []
+        xml_doc = self._read_file(xml_file_path, errors)
+        if xml_doc is None:
             return ValidationResult(xml_file_path, False, errors)
+        try:
+            is_valid = self._validate_document(xml_doc, errors)
         except Exception as e:
             errors.append((Error.UNKNOWN_ERROR, f"Unerwarteter Fehler: {e}"))
             return ValidationResult(xml_file_path, False, errors)
+        return ValidationResult(xml_file_path, is_valid, errors, xml_doc.getroot() if is_valid else None)
+
+    def validate_file_questions(self, xml_file_path: str, is_known_valid: Optional[Callable] = None,
+                                limits: Optional[ErrorLimits] = None) -> QuestionsValidationResult:
+        """ Validates the questions of the file one by one, see validate_questions """
+        if limits is not None:
+            if limits.exhausted:
+                limits.stopped = True
+                return not_validated(xml_file_path)
+            limits.start_file()
+        errors = []
+        xml_doc = self._read_file(xml_file_path, errors)
+        if xml_doc is None:
+            if limits is not None:
+                limits.count_errors(errors)
+            return QuestionsValidationResult(xml_file_path, errors)
+        return self.validate_questions(xml_doc.getroot(), xml_file_path, is_known_valid, limits)
+
+    def validate_question(self, question: etree._Element, errors, is_known_valid: Optional[Callable] = None,
+                          limits: Optional[ErrorLimits] = None) -> bool:
+        """
+            Validates one question against its element declaration and appends the errors.
+            Valid questions are remembered, so unchanged questions are not validated again.
+            is_known_valid(question) may report questions known from elsewhere (e.g. the render cache).
+        """
+        if etree.QName(question).localname == 'questions':
+            errors.append((Error.XSD_ERROR, f"Zeile {question.sourceline}: 'questions' darf nicht verschachtelt werden"))
+            if limits is not None:
+                limits.count_errors(errors[-1:])
+            return False
+        digest = hashlib.sha256(etree.tostring(question, method="c14n", with_tail=False)).digest()
+        if digest in self._valid_questions or (is_known_valid is not None and is_known_valid(question)):
+            return True
+        # as its own document the question is validated against its global element declaration,
+        # the copy keeps the line numbers of the original document
+        if not self._validate_document(etree.ElementTree(copy.deepcopy(question)), errors, limits):
+            return False
+        with self._lock:
+            if len(self._valid_questions) >= self.MAX_REMEMBERED_QUESTIONS:
+                self._valid_questions.clear()
+            self._valid_questions.add(digest)
+        return True
+
+    def validate_questions(self, root: etree._Element, filename: str = "xml_string",
+                           is_known_valid: Optional[Callable] = None,
+                           limits: Optional[ErrorLimits] = None) -> QuestionsValidationResult:
+        """
+            Validates every child of <questions> (or a single question root) on its own.
+            The result holds the valid questions and the errors of every invalid question.
+            When limits are reached, the remaining questions are not validated and the document gets
+            a LIMIT_REACHED error.
+        """
+        result = QuestionsValidationResult(filename, xml_content=root)
+        shell = None
+        if etree.QName(root).localname == 'questions':
+            if etree.QName(root).namespace != self.target_namespace:
+                result.errors.append((Error.XSD_ERROR, f"Zeile {root.sourceline}: Unbekanntes Wurzelelement {root.tag}"))
+            elif any(text and text.strip() for text in [root.text] + [child.tail for child in root]):
+                result.errors.append((Error.XSD_ERROR, f"Zeile {root.sourceline}: Text zwischen den Fragen"))
+            elif root.attrib:  # without attributes an empty <questions> in the namespace is valid
+                shell = self._root_shell(root)
+            result.questions = list(root.iterchildren(etree.Element))  # without comments of a caller's tree
+        else:
+            result.questions = [root]
+        if limits is not None:
+            limits.count_errors(result.errors)
+        if shell is not None:
+            # the root itself (attributes) is validated once as <questions> without questions, which is valid
+            self._validate_document(shell, result.errors, limits)
+        for index, question in enumerate(result.questions):
+            if limits is not None and limits.available() == 0:
+                limits.stopped = True
+                result.errors.append((Error.LIMIT_REACHED, LIMIT_MESSAGE))
+                break
+            errors = []
+            if not self.validate_question(question, errors, is_known_valid, limits):
+                result.question_errors[index] = errors
+        return result
+
+    @staticmethod
+    def _root_shell(root: etree._Element) -> etree._ElementTree:
+        """ Copy of the <questions> root with its attributes and namespaces, without the questions """
+        shell = etree.Element(root.tag, attrib=dict(root.attrib), nsmap=root.nsmap)
+        shell.sourceline = root.sourceline
+        return etree.ElementTree(shell)
 
     def validate_files(self, file_list: List[str]) -> Dict[str, ValidationResult]:
         results = {}
@@ -95,10 +339,10 @@ class XMLValidator:
             results[file_path] = result
         return results
 
-    def get_valid_documents(self, results: Dict[str, ValidationResult]) -> Dict[str, ET.Element]:
+    def get_valid_documents(self, results: Dict[str, ValidationResult]) -> Dict[str, etree._Element]:
         return {fn: res.xml_content for fn, res in results.items() if res.is_valid and res.xml_content is not None}
 
-    def get_invalid_documents(self, results: Dict[str, ValidationResult]) -> Dict[str, ET.Element]:
+    def get_invalid_documents(self, results: Dict[str, ValidationResult]) -> Dict[str, etree._Element]:
         return {fn: res.xml_content for fn, res in results.items() if not res.is_valid}
 
     def validate_xml_string(self, xml_string: str) -> ValidationResult:
@@ -113,7 +357,8 @@ class XMLValidator:
 
         # Parse XML string with lxml
             try:
-                xml_doc = etree.fromstring(xml_string.encode('utf-8'))
+                with span("parse"):
+                    xml_doc = etree.fromstring(xml_string.encode('utf-8'), _document_parser('utf-8'))
             except etree.XMLSyntaxError as e:
                 errors.append((Error.XML_ERROR, f"XML-Syntax-Fehler: {e}"))
                 return ValidationResult("xml_string", False, errors)
@@ -123,13 +368,9 @@ class XMLValidator:
                 return ValidationResult("xml_string", False, errors)
 
         # Validate against schema
-            is_valid = self.schema.validate(xml_doc)
-            if not is_valid:
-                for error in self.schema.error_log:
-                    errors.append((Error.XSD_ERROR, f"Zeile {error.line}: {error.message}"))
-            else:
-                # Convert to ElementTree format
-                xml_content = ET.fromstring(etree.tostring(xml_doc, encoding='unicode'))
+            is_valid = self._validate_document(xml_doc, errors)
+            if is_valid:
+                xml_content = xml_doc
             
             return ValidationResult("xml_string", is_valid, errors, xml_content)
         
@@ -137,6 +378,102 @@ class XMLValidator:
             errors.append((Error.UNKNOWN_ERROR, f"Unerwarteter Fehler: {e}"))
             return ValidationResult("xml_string", False, errors)
 
+    def validate_xml_string_questions(self, xml_string: str) -> QuestionsValidationResult:
+        """Validiert die Fragen eines XML-Strings einzeln"""
+        if not xml_string.strip():
+            return QuestionsValidationResult("xml_string", [(Error.XML_ERROR, "XML-String ist leer")])
+        try:
+            with span("parse"):
+                xml_doc = etree.fromstring(xml_string.encode('utf-8'), _document_parser('utf-8'))
+        except etree.XMLSyntaxError as e:
+            return QuestionsValidationResult("xml_string", [(Error.XML_ERROR, f"XML-Syntax-Fehler: {e}")])
+        if self.schema is None:
+            return QuestionsValidationResult("xml_string", [(Error.UNKNOWN_ERROR, "Kein XSD-Schema geladen")])
+        return self.validate_questions(xml_doc)
+
+    def _read_bytes(self, data, filename: str, errors, encoding: Optional[str] = None) -> Optional[etree._Element]:
+        """ Parses a document in memory for validation, appends the reason and returns None if that is impossible """
+        if not data.strip():
+            errors.append((Error.XML_ERROR, "XML-Dokument ist leer"))
+            return None
+        try:
+            root = self._parse_bytes(data, filename, encoding).getroot()
+        except UnicodeError:
+            errors.append((Error.ENCODING_ERROR, "Encoding-Fehler: Dokument konnte nicht gelesen werden"))
+            return None
+        except etree.XMLSyntaxError as e:
+            errors.append((Error.XML_ERROR, f"XML-Syntax-Fehler: {e}"))
+            return None
+        if self.schema is None:
+            errors.append((Error.UNKNOWN_ERROR, "Kein XSD-Schema geladen"))
+            return None
+        return root
+
+    def validate_bytes(self, data: bytes, filename: str = "xml_bytes",
+                       encoding: Optional[str] = None) -> ValidationResult:
+        """
+            Validates a document in memory, decoded like a file (BOM, XML declaration or sniffed encoding).
+            encoding overrides all of them, e.g. 'utf-8' for an encoded str whose declaration no longer applies.
+        """
+        errors = []
+        root = self._read_bytes(data, filename, errors, encoding)
+        if root is None:
+            return ValidationResult(filename, False, errors)
+        return self.validate_tree(root, filename)
+
+    def validate_bytes_questions(self, data: bytes, filename: str = "xml_bytes",
+                                 encoding: Optional[str] = None) -> QuestionsValidationResult:
+        """ Validates the questions of a document in memory one by one, see validate_questions and validate_bytes """
+        errors = []
+        root = self._read_bytes(data, filename, errors, encoding)
+        if root is None:
+            return QuestionsValidationResult(filename, errors)
+        return self.validate_questions(root, filename)
+
+    def validate_tree(self, root, filename: str = "xml_tree") -> ValidationResult:
+        """ Validates a parsed document (element or element tree), the tree is not changed """
+        if isinstance(root, etree._ElementTree):
+            root = root.getroot()
+        errors = []
+        is_valid = self._validate_document(root, errors)
+        return ValidationResult(filename, is_valid, errors, root if is_valid else None)
+
+
+class SchemaRegistry:
+    """
+        Compiles every XSD once per process on first use and hands out the shared validators.
+        Validators stay loaded until clear(), preload() compiles them ahead of the first request.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._validators: Dict[str, XMLValidator] = {}  # key is the real path of the XSD
+
+    def get_validator(self, xsd_path: str) -> XMLValidator:
+        key = os.path.realpath(xsd_path)
+        validator = self._validators.get(key)
+        if validator is None:
+            with self._lock:
+                validator = self._validators.get(key)
+                if validator is None:  # not compiled by another thread in the meantime
+                    validator = self._validators[key] = XMLValidator(xsd_path)
+        return validator
+
+    def preload(self, *xsd_paths: str):
+        for xsd_path in xsd_paths:
+            self.get_validator(xsd_path)
+
+    def clear(self):
+        with self._lock:
+            self._validators.clear()
+
+
+schema_registry = SchemaRegistry()
+
+
+def get_validator(xsd_path: str) -> XMLValidator:
+    """ Shared validator of the process wide schema registry """
+    return schema_registry.get_validator(xsd_path)
+
 
 # Beispielaufruf:
 def main():
@@ -0,0 +1,191 @@
+# Writing the members of QTI archives, optionally compressed in a thread pool
+#
+# zlib releases the GIL while compressing, so the many small item files of a large export are deflated
+# concurrently. The precompressed members are written in the order of the write() calls: the archive is the
+# same for any number of threads. zipfile has no public API for precompressed data, so with threads the archive
+# is written by _ZipArchive (local headers with known CRC and sizes, central directory, zip64 records) instead
+# of a ZipFile. It writes sequentially and works on unseekable targets (pipes, stdout) as well.
+import struct
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+from multiconverter.profiling import span
+
+COMPRESSION_LEVELS = {
+    "store": (zipfile.ZIP_STORED, None),  # no compression, e.g. for local previews
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+    "default": (zipfile.ZIP_DEFLATED, None),  # zlib default level (6)
+    "best": (zipfile.ZIP_DEFLATED, 9),
+}
+COMPRESSION_CHOICES = [*COMPRESSION_LEVELS, *(str(level) for level in range(10))]  # for --compression
+
+# records of the ZIP file format (PKWARE APPNOTE.TXT 4.3)
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4H2LH")
+_ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_VERSION, _ZIP64_VERSION = 20, 45
+_UNIX = 3  # creating system, as zipfile on POSIX
+_DOS_DATE_1980 = 1 << 5 | 1  # 1980-01-01 00:00, as ZipInfo(name)
+_EXTERNAL_ATTR = 0o600 << 16  # as ZipFile.open(name, 'w')
+_LIMIT = 0xFFFFFFFF  # larger values need zip64 fields
+
+
+def zip_compression(compression: Union[str, int]) -> Tuple[int, Optional[int]]:
+    """ (compress_type, compresslevel) for zipfile from a name of COMPRESSION_LEVELS or a level 0-9 """
+    if isinstance(compression, int) or compression.isdigit():
+        level = int(compression)
+        if not 0 <= level <= 9:
+            raise ValueError(f"Kompressionsstufe muss zwischen 0 und 9 liegen: {level}")
+        return zipfile.ZIP_DEFLATED, level
+    try:
+        return COMPRESSION_LEVELS[compression]
+    except KeyError:
+        raise ValueError(f"Unbekannte Kompression: {compression}") from None
+
+
+def _compress(data: bytes, compress_type: int, level: Optional[int]) -> Tuple[int, bytes]:
+    """ CRC and compressed data as zipfile would write them """
+    crc = zlib.crc32(data)
+    if compress_type == zipfile.ZIP_STORED:
+        return crc, data
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, -15)
+    return crc, compressor.compress(data) + compressor.flush()
+
+
+def _compress_batch(datas, compress_type: int, level: Optional[int]):
+    with span("compress", members=len(datas)):
+        return [_compress(data, compress_type, level) for data in datas]
+
+
+class _ZipArchive:
+    """ Writes a zip archive of precompressed members sequentially to a binary file object """
+    def __init__(self, fp, compress_type: int):
+        self.fp = fp
+        self.compress_type = compress_type
+        self._offset = 0  # counted, fp may be unseekable
+        self._central_directory: List[bytes] = []
+        self._names = set()
+
+    def _write(self, data: bytes):
+        self.fp.write(data)
+        self._offset += len(data)
+
+    def add(self, name: str, size: int, crc: int, compressed: bytes):
+        if name in self._names:
+            raise ValueError(f"Doppelter Name im Archiv: {name}")
+        self._names.add(name)
+        encoded_name = name.encode("ascii") if name.isascii() else name.encode("utf-8")
+        flags = 0 if name.isascii() else 0x800  # UTF-8 name
+        offset = self._offset
+        sizes_zip64 = size >= _LIMIT or len(compressed) >= _LIMIT
+        local_extra = struct.pack("<2H2Q", 1, 16, size, len(compressed)) if sizes_zip64 else b""
+        version = _ZIP64_VERSION if sizes_zip64 else _VERSION
+        self._write(_LOCAL_HEADER.pack(
+            b"PK\x03\x04", version, 0, flags, self.compress_type, 0, _DOS_DATE_1980, crc,
+            _LIMIT if sizes_zip64 else len(compressed), _LIMIT if sizes_zip64 else size,
+            len(encoded_name), len(local_extra)) + encoded_name + local_extra)
+        self._write(compressed)
+
+        # in the central directory only the fields that don't fit are zip64 fields, in this order
+        zip64_fields = [value for value in (size, len(compressed), offset) if value >= _LIMIT]
+        central_extra = struct.pack(f"<2H{len(zip64_fields)}Q", 1, 8 * len(zip64_fields), *zip64_fields) \
+            if zip64_fields else b""
+        version = _ZIP64_VERSION if zip64_fields else _VERSION
+        self._central_directory.append(_CENTRAL_HEADER.pack(
+            b"PK\x01\x02", version, _UNIX, version, 0, flags, self.compress_type, 0, _DOS_DATE_1980, crc,
+            min(len(compressed), _LIMIT), min(size, _LIMIT), len(encoded_name), len(central_extra), 0, 0, 0,
+            _EXTERNAL_ATTR, min(offset, _LIMIT)) + encoded_name + central_extra)
+
+    def close(self):
+        """ Writes the central directory """
+        start = self._offset
+        for record in self._central_directory:
+            self._write(record)
+        size, count = self._offset - start, len(self._central_directory)
+        if count > 0xFFFF or start >= _LIMIT or size >= _LIMIT:
+            zip64_end = self._offset
+            self._write(_ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+                b"PK\x06\x06", _ZIP64_END_OF_CENTRAL_DIRECTORY.size - 12, _ZIP64_VERSION, _ZIP64_VERSION, 0, 0,
+                count, count, size, start))
+            self._write(_ZIP64_LOCATOR.pack(b"PK\x06\x07", 0, zip64_end, 1))
+        self._write(_END_OF_CENTRAL_DIRECTORY.pack(
+            b"PK\x05\x06", 0, 0, min(count, 0xFFFF), min(count, 0xFFFF), min(size, _LIMIT), min(start, _LIMIT), 0))
+        self.fp.flush()
+
+
+class MemberWriter:
+    """
+        Writes members (text chunks, UTF-8) as zip archive to a writable binary file object. With threads > 1
+        the members are collected in batches of about BATCH_SIZE bytes (items are small, one task per item
+        costs more than it saves), the batches are compressed in a thread pool and written in order as soon as
+        they are ready. At most 4 batches per thread are pending. close() completes the archive.
+    """
+    BATCH_SIZE = 256 * 1024
+
+    def __init__(self, fp, compress_type: int = zipfile.ZIP_DEFLATED, compresslevel: Optional[int] = None,
+                 threads: int = 1):
+        self.compress_type = compress_type
+        self.compresslevel = compresslevel
+        self.threads = threads
+        if threads > 1:
+            self._archive = _ZipArchive(fp, compress_type)
+            self._zipf = None
+            self._executor = ThreadPoolExecutor(threads, thread_name_prefix="compress")
+        else:
+            self._archive = None
+            self._zipf = zipfile.ZipFile(fp, 'w', compress_type, compresslevel=compresslevel)
+            self._executor = None
+        self._batch = []  # (name, data) not submitted yet
+        self._batch_size = 0
+        self._pending = deque()  # (names, sizes, future) in write order
+
+    def write(self, name: str, chunks):
+        if self._executor is None:
+            with span("compress"), self._zipf.open(name, 'w') as file:
+                for chunk in chunks:
+                    file.write(chunk.encode('utf-8'))
+            return
+        data = "".join(chunks).encode('utf-8')
+        self._batch.append((name, data))
+        self._batch_size += len(data)
+        if self._batch_size >= self.BATCH_SIZE:
+            self._submit()
+        while self._pending and (self._pending[0][2].done() or len(self._pending) > 4 * self.threads):
+            self._write_next()
+
+    def _submit(self):
+        names = [name for name, _ in self._batch]
+        datas = [data for _, data in self._batch]
+        future = self._executor.submit(_compress_batch, datas, self.compress_type, self.compresslevel)
+        self._pending.append((names, [len(data) for data in datas], future))
+        self._batch, self._batch_size = [], 0
+
+    def _write_next(self):
+        names, sizes, future = self._pending.popleft()
+        for name, size, (crc, compressed) in zip(names, sizes, future.result()):
+            self._archive.add(name, size, crc, compressed)
+
+    def flush(self):
+        """ Writes all pending members """
+        if self._batch:
+            self._submit()
+        while self._pending:
+            self._write_next()
+
+    def close(self):
+        """
+            Stops the thread pool and writes the central directory, members still pending are dropped
+            (call flush() first)
+        """
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._batch.clear()
+            self._pending.clear()
+            self._archive.close()
+        else:
+            self._zipf.close()
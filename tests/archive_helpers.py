@@ -0,0 +1,10 @@
+import io
+import re
+import zipfile
+
+
+def read_members(archive):
+    """ Liefert die Inhalte eines Archivs (bytes oder Pfad), Manifest-Identifier neutralisiert """
+    with zipfile.ZipFile(io.BytesIO(archive) if isinstance(archive, bytes) else archive) as zipf:
+        return {name: re.sub(r"llm-multiconverter-[0-9a-f-]+", "ID", zipf.read(name).decode('utf-8'))
+                for name in zipf.namelist()}
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+from multiconverter import aio
+from multiconverter.api import Converter
+from multiconverter.converter5 import QuestionHandlers
+
+from archive_helpers import read_members
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def slow_handle_question(self, question, original=QuestionHandlers.handle_question):
+    time.sleep(0.1)
+    original(self, question)
+
+
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(test_dir, "demo.xml"), encoding="utf-8") as f:
+            self.demo = f.read()
+        with open(os.path.join(test_dir, "demo_err.xml"), encoding="utf-8") as f:
+            self.demo_err = f.read()
+        self.converter = aio.AsyncConverter(max_workers=2)
+
+    def tearDown(self):
+        self.converter.close()
+
+    def test_validate(self):
+        self.assertTrue(asyncio.run(aio.validate(self.demo)).is_valid)
+        self.assertFalse(asyncio.run(self.converter.validate(self.demo_err)).is_valid)
+
+    def test_convert(self):
+        async def convert_all():
+            return await asyncio.gather(*(self.converter.convert(self.demo) for _ in range(6)))
+        archives = asyncio.run(convert_all())
+        expected = read_members(Converter().convert(self.demo).archive)
+        for archive in archives:
+            self.assertEqual(expected, read_members(archive))
+        with self.assertRaises(aio.ValidationError) as context:
+            asyncio.run(self.converter.convert(self.demo_err))
+        self.assertFalse(context.exception.result.is_valid)
+
+    def test_iter_archive(self):
+        async def collect(xml, chunk_size):
+            return [chunk async for chunk in self.converter.iter_archive(xml, chunk_size=chunk_size)]
+        chunks = asyncio.run(collect(self.demo, 512))
+        self.assertGreater(len(chunks), 1)
+        self.assertIn("imsmanifest.xml", read_members(b"".join(chunks)))
+        with self.assertRaises(aio.ValidationError):
+            asyncio.run(collect(self.demo_err, 512))
+
+    def test_timeout_stops_the_conversion(self):
+        async def convert_with_ticks():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+            ticker = asyncio.create_task(tick())
+            try:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await self.converter.convert(self.demo, timeout=0.15)
+            finally:
+                ticker.cancel()
+            return ticks
+
+        with patch.object(QuestionHandlers, 'handle_question', autospec=True,
+                          side_effect=slow_handle_question) as handle_question:
+            self.assertGreater(asyncio.run(convert_with_ticks()), 5)  # the event loop was not blocked
+            time.sleep(0.3)
+            self.assertLess(handle_question.call_count, 4)  # stopped before the last question
+
+    def test_cancelled_iteration(self):
+        async def first_chunk():
+            async for chunk in self.converter.iter_archive(self.demo, chunk_size=1):
+                return chunk
+
+        with patch.object(QuestionHandlers, 'handle_question', autospec=True,
+                          side_effect=slow_handle_question) as handle_question:
+            self.assertTrue(asyncio.run(first_chunk()))
+            time.sleep(0.3)
+            self.assertLess(handle_question.call_count, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
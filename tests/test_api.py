@@ -0,0 +1,127 @@
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from lxml import etree
+
+from multiconverter.api import ConversionCancelled, Converter
+from multiconverter.xml_validator import Error, QuestionsValidationResult
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+LATIN1_XML = """<?xml version="1.0" encoding="iso-8859-1"?>
+<questions xmlns="https://github.com/Hananja/multiconverter">
+  <fill-in-question><fill-in-text>Größe: <fill><alt>groß</alt></fill></fill-in-text></fill-in-question>
+</questions>
+""".encode("iso-8859-1")
+
+COMMENTED_QUESTIONS = """<questions xmlns="https://github.com/Hananja/multiconverter"><!-- c -->
+  <multiple-choice-question><text>Was?</text><options><!-- c --><option correct="true">a</option>
+    <option correct="false">b</option></options></multiple-choice-question>
+  <fill-in-question><fill-in-text>A <!-- c -->B <fill><!-- c --><alt>1</alt></fill> C<!-- c --> D</fill-in-text>
+  </fill-in-question><?pi ?>
+</questions>
+"""
+
+BROKEN_SECOND_QUESTION = """<questions xmlns="https://github.com/Hananja/multiconverter">
+  <fill-in-question><fill-in-text>1 + 1 = <fill><alt>2</alt></fill></fill-in-text></fill-in-question>
+  <fill-in-question><fill-in-txt>kaputt</fill-in-txt></fill-in-question>
+  <fill-in-question><fill-in-text>3 + 3 = <fill><alt>6</alt></fill></fill-in-text></fill-in-question>
+</questions>
+"""
+
+
+def member_names(archive: bytes):
+    with zipfile.ZipFile(io.BytesIO(archive)) as zipf:
+        return sorted(zipf.namelist())
+
+
+class TestConverter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.converter = Converter()
+        with open(os.path.join(test_dir, "demo.xml"), "rb") as f:
+            cls.demo = f.read()
+
+    def test_sources(self):
+        expected = ["imsmanifest.xml"] + [f"item-0000{i}.xml" for i in range(1, 5)]
+        for source in (self.demo, bytearray(self.demo), self.demo.decode("utf-8").split("?>", 1)[1],
+                       etree.fromstring(self.demo), etree.ElementTree(etree.fromstring(self.demo))):
+            conversion = self.converter.convert(source)
+            self.assertTrue(conversion.converted, type(source))
+            self.assertEqual(expected, member_names(conversion.archive))
+            self.assertEqual(expected[1:], [f"{identifier}.xml" for identifier in conversion.identifiers])
+        conversion = self.converter.convert(LATIN1_XML, filename="latin1.xml")
+        self.assertTrue(conversion.converted)
+        self.assertEqual("latin1.xml", conversion.validation.filename)
+        with zipfile.ZipFile(io.BytesIO(conversion.archive)) as zipf:
+            self.assertIn("groß", zipf.read("item-00001.xml").decode("utf-8"))
+        with self.assertRaises(TypeError):
+            self.converter.validate(42)
+        for converter in (self.converter, Converter(skip_invalid=True)):  # a str is decoded already
+            conversion = converter.convert(LATIN1_XML.decode("iso-8859-1"))
+            self.assertTrue(conversion.converted)
+            with zipfile.ZipFile(io.BytesIO(conversion.archive)) as zipf:
+                self.assertIn("groß", zipf.read("item-00001.xml").decode("utf-8"))
+
+    def test_invalid_documents(self):
+        with patch.object(sys, 'exit') as exit_mock, patch('sys.stderr', new=io.StringIO()) as stderr:
+            for source, error in ((b"  ", Error.XML_ERROR), (b"<questions", Error.XML_ERROR),
+                                  (BROKEN_SECOND_QUESTION, Error.XSD_ERROR)):
+                target = io.BytesIO()
+                conversion = self.converter.convert_to(source, target)
+                self.assertFalse(conversion.converted)
+                self.assertIsNone(conversion.archive)
+                self.assertEqual(error, conversion.validation.errors[0][0])
+                self.assertEqual(b"", target.getvalue())  # nothing written
+        exit_mock.assert_not_called()
+        self.assertEqual("", stderr.getvalue())
+
+    def test_skip_invalid(self):
+        conversion = Converter(skip_invalid=True).convert(BROKEN_SECOND_QUESTION)
+        self.assertIsInstance(conversion.validation, QuestionsValidationResult)
+        self.assertTrue(conversion.converted)
+        self.assertEqual([1], conversion.skipped)
+        self.assertEqual(["item-00001", "item-00002"], conversion.identifiers)
+
+    def test_commented_tree(self):
+        # trees of the caller aren't parsed without comments and processing instructions like the documents
+        for converter in (self.converter, Converter(skip_invalid=True)):
+            conversion = converter.convert(etree.fromstring(COMMENTED_QUESTIONS))
+            self.assertTrue(conversion.converted, conversion.validation.errors)
+            self.assertEqual(["item-00001", "item-00002"], conversion.identifiers)
+            with zipfile.ZipFile(io.BytesIO(conversion.archive)) as zipf:
+                self.assertIn("MultipleChoice", zipf.read("item-00001.xml").decode("utf-8"))
+                fill_in = zipf.read("item-00002.xml").decode("utf-8")
+            self.assertIn("<p>A B &lt;textEntryInteraction", fill_in)
+            self.assertIn("RESPONSE00&#34;/&gt; C D</p>", fill_in)
+
+    def test_unique_identifiers(self):
+        converter = Converter(unique_identifiers=True)
+        with ThreadPoolExecutor(8) as executor:
+            conversions = list(executor.map(converter.convert, [self.demo] * 32))
+        identifiers = [identifier for conversion in conversions for identifier in conversion.identifiers]
+        self.assertEqual(32 * 4, len(set(identifiers)))
+        for conversion in conversions:
+            self.assertEqual([f"{identifier}.xml" for identifier in conversion.identifiers],
+                             member_names(conversion.archive)[1:])
+
+    def test_cancel(self):
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(ConversionCancelled):
+            self.converter.convert(self.demo, cancel=cancel)
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ConversionCancelled):
+                self.converter.convert_to(self.demo, os.path.join(directory, "out.zip"), cancel=cancel)
+            self.assertEqual([], os.listdir(directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
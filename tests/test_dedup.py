@@ -0,0 +1,107 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from lxml import etree
+
+from multiconverter.converter5 import main
+from multiconverter.dedup import DedupIndex, fingerprint
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+NS = 'xmlns="https://github.com/Hananja/multiconverter"'
+
+
+def multiple_choice(text, *options):
+    return (f'<multiple-choice-question {NS}><text>{text}</text><options>'
+            + "".join(f'<option correct="{str(index == 0).lower()}">{option}</option>'
+                      for index, option in enumerate(options))
+            + '</options></multiple-choice-question>')
+
+
+ORIGINAL = multiple_choice("Welche Aussage über Wahrscheinlichkeiten ist korrekt?",
+                           "P(E) = 0 für das unmögliche Ereignis", "P(E) = 1 für das unmögliche Ereignis",
+                           "P(E) kann größer als 1 sein")
+REFORMATTED = multiple_choice("welche Aussage über  Wahrscheinlichkeiten ist KORREKT",
+                              "P(E) = 0 für das unmögliche Ereignis", "P(E) kann größer als 1 sein",
+                              "P(E) = 1 für das unmögliche Ereignis")
+REWORDED = multiple_choice("Welche Aussage über Wahrscheinlichkeiten ist richtig?",
+                           "P(E) = 0 für das unmögliche Ereignis", "P(E) = 1 für das unmögliche Ereignis",
+                           "P(E) kann größer als 1 sein")
+OTHER = multiple_choice("Welche Protokolle gehören zum TCP/IP-Modell?", "HTTP", "USB")
+
+
+def fingerprints(*questions):
+    return [(index, fingerprint(etree.fromstring(question))) for index, question in enumerate(questions)]
+
+
+class TestDedup(unittest.TestCase):
+    def test_fingerprint(self):
+        (_, original), (_, reformatted), (_, reworded), (_, other) = fingerprints(ORIGINAL, REFORMATTED, REWORDED, OTHER)
+        self.assertEqual(original.digest, reformatted.digest)
+        self.assertNotEqual(original.digest, reworded.digest)
+        self.assertGreaterEqual(original.similarity(reworded), 0.8)
+        self.assertLess(original.similarity(other), 0.5)
+
+    def test_index(self):
+        index = DedupIndex()
+        duplicates = index.check("a.xml", fingerprints(ORIGINAL, OTHER, REFORMATTED))
+        self.assertEqual([2], [question for question, _ in duplicates])
+        self.assertEqual((os.path.abspath("a.xml"), 1, 1.0), (duplicates[0][1].filename, duplicates[0][1].number,
+                                                               duplicates[0][1].similarity))
+        duplicates = index.check("b.xml", fingerprints(REWORDED), drop=True)
+        self.assertEqual(1, len(duplicates))
+        self.assertEqual(3, len(index))  # dropped questions are not added
+        # checking a file again replaces its questions
+        self.assertEqual([], index.check("a.xml", fingerprints(ORIGINAL, OTHER)))
+        self.assertEqual(2, len(index))
+
+    def test_persistent_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.json")
+            index = DedupIndex(path)
+            index.check("a.xml", fingerprints(ORIGINAL, OTHER))
+            index.save()
+            loaded = DedupIndex(path)
+            self.assertEqual(2, len(loaded))
+            self.assertEqual(1, len(loaded.check("b.xml", fingerprints(REWORDED))))
+
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{}")
+            with self.assertRaises(ValueError):
+                DedupIndex(path)
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as directory:
+            regenerated = os.path.join(directory, "regenerated.xml")
+            with open(regenerated, "w", encoding="utf-8") as f:
+                f.write(f'<questions {NS}>{OTHER}{REWORDED}</questions>')
+            first = os.path.join(directory, "first.xml")
+            with open(first, "w", encoding="utf-8") as f:
+                f.write(f'<questions {NS}>{ORIGINAL}</questions>')
+            index_path = os.path.join(directory, "index.json")
+            for jobs in ("1", "2"):
+                output = io.BytesIO()
+                with patch('sys.stdout', new=io.TextIOWrapper(output)), \
+                        patch('sys.stderr', new=io.StringIO()) as stderr:
+                    main(["multiconverter", "--dedup", "drop", "--jobs", jobs, "-",
+                          first, os.path.join(test_dir, "demo.xml"), regenerated])
+                    sys.stdout.flush()
+                    with zipfile.ZipFile(io.BytesIO(output.getvalue())) as archive:
+                        names = sorted(archive.namelist())
+                self.assertIn("Frage 2 von " + regenerated, stderr.getvalue())
+                self.assertEqual(["imsmanifest.xml"] + [f"item-0000{i}.xml" for i in range(1, 7)], names)
+
+            main(["multiconverter", "--dedup-index", index_path, os.path.join(directory, "first.zip"), first])
+            with patch('sys.stderr', new=io.StringIO()) as stderr:
+                main(["multiconverter", "--dedup-index", index_path, os.path.join(directory, "second.zip"),
+                      regenerated])
+            self.assertIn("first.xml", stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
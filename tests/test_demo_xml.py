@@ -31,6 +31,10 @@ class TestConverter(unittest.TestCase):
 
             output = mock_stdout.getvalue()
         print(output)  # TODO: check output
+        for option in ("-h", "--help"):
+            with patch('sys.stdout', new=StringIO()) as mock_stdout:
+                main([sys.argv[0], option])
+            self.assertEqual(output, mock_stdout.getvalue())
 
     @patch('sys.exit')
     def test_basic_conversion(self, mock_exit):
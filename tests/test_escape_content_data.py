@@ -0,0 +1,76 @@
+import random
+import sys
+import unittest
+
+from multiconverter.tools import escape_content_data, escape_content_data_many
+
+
+def reference_escape_content_data(text):
+    """ Character loop of multiconverter 0.5.4, the regex implementation must match it byte for byte """
+    if text is None:
+        return text
+    result = []
+    in_tag = False
+    for i, char in enumerate(text):
+        if char == '<':
+            if i + 1 < len(text) and (text[i + 1].isalnum() or text[i + 1] in '!?/'):
+                in_tag = True
+                result.append(char)
+            else:
+                result.append('&lt;')
+        elif char == '>':
+            if in_tag:
+                in_tag = False
+                result.append(char)
+            else:
+                result.append('&gt;')
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+ALPHABET = "<<<>>>ab1/!?_ äß²&;\n\t"
+
+CORPUS = [
+    None, "", "<", ">", "<>", "><", "<<", ">>", "<a", "a>", "<a>", "</a>", "<!-- x -->", "<?pi?>", "<_a>", "<1>",
+    "a < b > c", "if (a<b && c>d) {}", "<b>fett</b> und 1 < 2", "<a <b> >", "<<b>>", "<a></a>>", "<ä>", "<²>",
+    "x <= y >= z", "<p>Text</p> <br/> -> <-", "</", "<!", "<?", "List<Map<String, Integer>> m;",
+]
+
+
+class TestEscapeContentData(unittest.TestCase):
+    def assertSameAsReference(self, text):
+        self.assertEqual(reference_escape_content_data(text), escape_content_data(text), repr(text)[:80])
+
+    def test_corpus(self):
+        for text in CORPUS:
+            self.assertSameAsReference(text)
+
+    def test_random(self):
+        rnd = random.Random(4711)
+        for _ in range(5000):
+            self.assertSameAsReference("".join(rnd.choices(ALPHABET, k=rnd.randint(0, 40))))
+
+    def test_all_code_points_after_lt(self):
+        # the tag start check must agree with str.isalnum() for every character
+        self.assertSameAsReference("".join(f"<{chr(c)}>" for c in range(sys.maxunicode + 1)))
+
+    def test_pathological(self):
+        megabyte = 1 << 20
+        for text in ("<" * megabyte, ">" * megabyte, "<>" * (megabyte // 2), "<a" * (megabyte // 2),
+                     "<a>" * (megabyte // 3), "< >" * (megabyte // 3), "<a" * (megabyte // 4) + ">" * (megabyte // 2)):
+            self.assertSameAsReference(text)
+
+    def test_many(self):
+        self.assertEqual([reference_escape_content_data(text) for text in CORPUS], escape_content_data_many(CORPUS))
+        self.assertEqual([], escape_content_data_many([]))
+        rnd = random.Random(815)
+        for alphabet in (ALPHABET, ALPHABET + "\x00"):
+            for _ in range(500):
+                texts = ["".join(rnd.choices(alphabet, k=rnd.randint(0, 12))) for _ in range(rnd.randint(0, 8))]
+                self.assertEqual([reference_escape_content_data(text) for text in texts],
+                                 escape_content_data_many(texts))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from multiconverter import profiling
+from multiconverter.converter5 import convert, main
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestProfiling(unittest.TestCase):
+    def test_stages(self):
+        with profiling.profile() as profiler:
+            convert(io.BytesIO(), [os.path.join(test_dir, name) for name in ("demo.xml", "demo_mq_root.xml")],
+                    compress_threads=2)
+        stages = profiler.summary()["stages"]
+        for stage in ("read", "parse", "validate", "handle_multiple_choice_question", "handle_fill_in_question",
+                      "handle_map_question", "render", "compress", "manifest"):
+            self.assertIn(stage, stages)
+        self.assertEqual(2, stages["handle_multiple_choice_question"]["count"])
+        self.assertGreater(stages["render"]["wall_s"], 0)
+
+        trace = profiler.chrome_trace()
+        self.assertEqual(len(profiler.events), len(trace["traceEvents"]))
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in trace["traceEvents"]))
+        self.assertIs(profiling._NO_SPAN, profiling.span("render"))  # inactive outside of profile()
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "out.zip")
+            with patch('sys.stderr', new=io.StringIO()) as stderr:
+                main(["multiconverter", "--profile", output, os.path.join(test_dir, "demo.xml")])
+            self.assertIn("convert", stderr.getvalue())
+            with open(os.path.join(directory, "out.profile.json"), encoding="utf-8") as f:
+                self.assertEqual(1, json.load(f)["stages"]["convert"]["count"])
+            with open(os.path.join(directory, "out.trace.json"), encoding="utf-8") as f:
+                self.assertIn("traceEvents", json.load(f))
+
+
+if __name__ == '__main__':
+    unittest.main()
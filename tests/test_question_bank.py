@@ -0,0 +1,80 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from multiconverter import question_bank
+from multiconverter.converter5 import convert, main
+from multiconverter.question_bank import QuestionBank
+
+from archive_helpers import read_members
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestQuestionBank(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "bank", "questions.sqlite")
+        self.bank = QuestionBank(self.path)
+        self.demo = os.path.join(test_dir, "demo.xml")
+        self.map = os.path.join(test_dir, "demo_mq_root.xml")
+
+    def tearDown(self):
+        self.bank.close()
+        self.directory.cleanup()
+
+    def test_add_and_select(self):
+        self.assertEqual(4, self.bank.add_file(self.demo, ["unit1"])[1])
+        self.assertEqual(1, self.bank.add_file(self.map, ["unit3"])[1])
+        self.assertEqual(0, self.bank.add_file(self.demo, ["unit3"])[1])  # known questions only get the tag
+
+        self.assertEqual(5, len(self.bank.select()))
+        self.assertEqual(2, len(self.bank.select("multiple-choice-question")))
+        self.assertEqual(1, len(self.bank.select("map-question", tags=["unit3"])))
+        self.assertEqual(5, len(self.bank.select(tags=["unit3"])))
+        self.assertEqual(4, len(self.bank.select(source=self.demo)))
+        sample = self.bank.select(tags=["unit3"], count=3, seed=1)
+        self.assertEqual(3, len(sample))
+        self.assertEqual(sample, self.bank.select(tags=["unit3"], count=3, seed=1))
+        self.assertEqual(({"fill-in-question": 2, "map-question": 1, "multiple-choice-question": 2},
+                          {"unit1": 4, "unit3": 5}), self.bank.statistics())
+
+    def test_export_equals_conversion(self):
+        self.bank.add_file(self.demo)
+        self.bank.add_file(self.map)
+        exported, converted = io.BytesIO(), io.BytesIO()
+        with patch.object(question_bank.etree, 'fromstring') as fromstring:
+            self.assertEqual(5, self.bank.export(exported, self.bank.select()))
+            fromstring.assert_not_called()  # no XML is read
+        convert(converted, [self.demo, self.map])
+        self.assertEqual(read_members(converted.getvalue()), read_members(exported.getvalue()))
+
+    def test_rendered_again_after_template_changes(self):
+        self.bank.add_file(self.map)
+        question_id = self.bank.select()[0]
+        stored = self.bank.fragments(question_id)
+        with patch.object(question_bank, 'templates_digest', return_value="changed"):
+            self.assertEqual(stored, self.bank.fragments(question_id))
+            with patch.object(self.bank._renderer, 'render_fragments') as render:
+                self.bank.fragments(question_id)
+                render.assert_not_called()  # stored with the new digest
+
+    def test_cli(self):
+        output = os.path.join(self.directory.name, "unit3.zip")
+        with patch('sys.stdout', new=io.StringIO()), patch('sys.stderr', new=io.StringIO()):
+            main(["multiconverter", "bank", "add", "--bank", self.path, "--tag", "unit3", self.demo, self.map])
+            main(["multiconverter", "bank", "export", "--bank", self.path, "--type", "multiple-choice-question",
+                  "--tag", "unit3", "--random", "1", output])
+        with open(output, "rb") as f:
+            self.assertEqual(["imsmanifest.xml", "item-00001.xml"], sorted(read_members(f.read())))
+        for option, value in (("--max-items", "0"), ("--random", "-1")):
+            with patch('sys.exit') as exit_mock, patch('sys.stdout', new=io.StringIO()) as stdout:
+                main(["multiconverter", "bank", "export", "--bank", self.path, option, value, output])
+            exit_mock.assert_called_with(1)
+            self.assertIn(option, stdout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
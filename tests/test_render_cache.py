@@ -0,0 +1,76 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from multiconverter.converter5 import QuestionHandlers, convert, xsd_path
+from multiconverter.render_cache import RenderCache
+from multiconverter.xml_validator import XMLValidator, get_validator
+
+from archive_helpers import read_members
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.questions = list(get_validator(xsd_path).validate_file(os.path.join(test_dir, "demo.xml")).xml_content)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def convert(self, questions, render_cache):
+        handlers = QuestionHandlers(render_cache=render_cache)
+        for question in questions:
+            handlers.handle_question(question)
+        return handlers
+
+    def test_same_archive(self):
+        uncached = read_members(self.convert(self.questions, None).get_zip())
+        render_cache = RenderCache(self.directory.name)
+        self.assertEqual(uncached, read_members(self.convert(self.questions, render_cache).get_zip()))
+        with patch.object(QuestionHandlers, 'handle_multiple_choice_question') as render:
+            self.assertEqual(uncached, read_members(self.convert(self.questions, render_cache).get_zip()))
+            render.assert_not_called()
+
+    def test_identifiers_per_archive(self):
+        render_cache = RenderCache(self.directory.name)
+        self.convert(self.questions, render_cache)
+        handlers = self.convert(reversed(self.questions), render_cache)
+        item_text = handlers.items_map["item-00001"].item_text
+        self.assertIn('identifier="item-00001"', item_text)
+        self.assertIn("Das Ergebnis von 2 + 2 ist", item_text)  # last question of demo.xml
+        self.assertIn('identifier="resource-item-00004"', handlers.generate_manifest())
+
+    def test_changed_question(self):
+        render_cache = RenderCache(self.directory.name)
+        self.convert(self.questions, render_cache)
+        self.questions[0].find('{*}text').text = "Geänderte Frage"
+        handlers = self.convert(self.questions, render_cache)
+        self.assertIn("Geänderte Frage", handlers.items_map["item-00001"].item_text)
+        self.assertEqual(len(self.questions) + 1, len(os.listdir(self.directory.name)))
+
+    def test_eviction(self):
+        render_cache = RenderCache(self.directory.name, max_bytes=4000)
+        self.convert(self.questions, render_cache)
+        size = sum(os.path.getsize(os.path.join(self.directory.name, name)) for name in os.listdir(self.directory.name))
+        self.assertLessEqual(size, 4000)
+        self.assertGreater(size, 0)
+
+    def test_cached_questions_are_not_validated_again(self):
+        render_cache = RenderCache(self.directory.name)
+        demo = os.path.join(test_dir, "demo.xml")
+        first = io.BytesIO()
+        convert(first, [demo], render_cache=render_cache)
+        get_validator(xsd_path)._valid_questions.clear()  # as in a new process
+        second = io.BytesIO()
+        with patch.object(XMLValidator, '_validate_document') as validate:
+            convert(second, [demo], render_cache=render_cache)
+            validate.assert_not_called()
+        self.assertEqual(read_members(first.getvalue()), read_members(second.getvalue()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import http.client
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from multiconverter.server import create_server
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path):
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.server = create_server(port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        with open(os.path.join(test_dir, "demo.xml"), "rb") as f:
+            self.demo = f.read()
+        with open(os.path.join(test_dir, "demo_err.xml"), "rb") as f:
+            self.demo_err = f.read()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, method, path, body=None, connection=None):
+        connection = connection or http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+        connection.request(method, path, body=body)
+        response = connection.getresponse()
+        data = response.read()
+        connection.close()
+        return response.status, response.getheader("Content-Type"), data
+
+    def test_validate(self):
+        status, content_type, data = self.request("POST", "/validate", self.demo)
+        self.assertEqual(200, status)
+        self.assertEqual({"valid": True, "root": "{https://github.com/Hananja/multiconverter}questions", "errors": []},
+                         json.loads(data))
+        status, _, data = self.request("POST", "/validate", self.demo_err)
+        self.assertFalse(json.loads(data)["valid"])
+        self.assertEqual("XSD_ERROR", json.loads(data)["errors"][0]["type"])
+
+    def test_encodings(self):
+        # the body is decoded like a file, not as UTF-8 only
+        for encoding, declaration, word in (("iso-8859-1", '<?xml version="1.0" encoding="iso-8859-1"?>', "Größe"),
+                                            ("cp1252", "", "„Größe“ in €"), ("utf-8", "", "„Größe“ in €")):
+            xml = (f'{declaration}<fill-in-question xmlns="https://github.com/Hananja/multiconverter">'
+                   f'<fill-in-text>{word}: <fill><alt>1</alt></fill></fill-in-text></fill-in-question>')
+            status, _, data = self.request("POST", "/convert", xml.encode(encoding))
+            self.assertEqual(200, status, data)
+            with zipfile.ZipFile(io.BytesIO(data)) as zipf:
+                self.assertIn(word, zipf.read("item-00001.xml").decode("utf-8"))
+
+    def test_convert_concurrently(self):
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(lambda _: self.request("POST", "/convert", self.demo), range(16)))
+        for status, content_type, data in responses:
+            self.assertEqual(200, status)
+            self.assertEqual("application/zip", content_type)
+            with zipfile.ZipFile(io.BytesIO(data)) as zipf:
+                # every request numbers its items on its own
+                self.assertEqual(['item-00001.xml', 'item-00002.xml', 'item-00003.xml', 'item-00004.xml',
+                                  'imsmanifest.xml'], zipf.namelist())
+
+    def test_errors(self):
+        self.assertEqual(422, self.request("POST", "/convert", self.demo_err)[0])
+        self.assertEqual(400, self.request("POST", "/convert", b"")[0])
+        self.assertEqual(404, self.request("POST", "/unknown", self.demo)[0])
+        self.assertEqual(200, self.request("GET", "/health")[0])
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix-Sockets nicht verfügbar")
+class TestUnixSocketServer(unittest.TestCase):
+    def test_convert(self):
+        with tempfile.TemporaryDirectory() as directory:
+            socket_path = os.path.join(directory, "multiconverter.sock")
+            server = create_server(socket_path=socket_path)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                with open(os.path.join(test_dir, "demo_mq_root.xml"), "rb") as f:
+                    connection = UnixHTTPConnection(socket_path)
+                    connection.request("POST", "/convert", body=f.read())
+                    response = connection.getresponse()
+                    with zipfile.ZipFile(io.BytesIO(response.read())) as zipf:
+                        self.assertEqual(['item-00001.xml', 'imsmanifest.xml'], zipf.namelist())
+                    connection.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
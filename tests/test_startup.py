@@ -0,0 +1,56 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ("jinja2", "lxml", "lxml.etree", "multiconverter.converter5", "multiconverter.xml_validator")
+
+
+def import_times(*args):
+    """ Runs python -X importtime with the arguments, returns {module: cumulative µs} """
+    process = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match:
+            times[match.group(3)] = int(match.group(1))
+    return process, times
+
+
+class TestStartup(unittest.TestCase):
+    def assertCheap(self, *args):
+        process, times = import_times(*args)
+        loaded = [module for module in HEAVY_MODULES if module in times]
+        total = sum(time for module, time in times.items() if module.startswith("multiconverter"))
+        print(f"{' '.join(args)}: {len(times)} Module, multiconverter {total} µs")
+        self.assertEqual([], loaded, f"{' '.join(args)} lädt unnötige Module")
+        return process
+
+    def test_import(self):
+        self.assertCheap("-c", "import multiconverter")
+
+    def test_version(self):
+        process = self.assertCheap("-m", "multiconverter", "--version")
+        self.assertEqual(0, process.returncode)
+        import multiconverter
+        self.assertEqual(f"multiconverter {multiconverter.__version__}", process.stdout.strip())
+        # the package metadata takes the version from __version__ (see pyproject.toml)
+        with open(os.path.join(os.path.dirname(__file__), "..", "pyproject.toml"), encoding="utf-8") as f:
+            pyproject = f.read()
+        self.assertIn('version = {attr = "multiconverter.__version__"}', pyproject)
+        self.assertNotRegex(pyproject, r'(?m)^version = "')
+
+    def test_argument_error(self):
+        process = self.assertCheap("-m", "multiconverter", "--jobs", "x", "out.zip", "in.xml")
+        self.assertEqual(1, process.returncode)
+
+    def test_lazy_attributes(self):
+        import multiconverter
+        self.assertEqual("QuestionHandlers", multiconverter.QuestionHandlers.__name__)
+        with self.assertRaises(AttributeError):
+            multiconverter.does_not_exist
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import io
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from multiconverter.converter5 import xsd_path
+from multiconverter.gui.validation_worker import ValidationWorker
+from multiconverter.xml_validator import get_validator
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestValidationWorker(unittest.TestCase):
+    def setUp(self):
+        self.validated = []
+        self.results = []
+        self.finished = threading.Event()
+        with open(os.path.join(test_dir, "demo.xml"), encoding="utf-8") as f:
+            self.demo = f.read()
+
+    def validate(self, xml_string):
+        self.validated.append(xml_string)
+        return get_validator(xsd_path).validate_xml_string(xml_string)
+
+    def on_finished(self, result):
+        self.results.append(result)
+        self.finished.set()
+
+    def worker(self, delay):
+        return ValidationWorker(self.validate, lambda: None, self.on_finished, delay=delay)
+
+    def test_debounce(self):
+        worker = self.worker(0.2)
+        for i in range(10):
+            worker.submit(f"<questions>{i}")
+        worker.submit(self.demo)
+        self.assertTrue(self.finished.wait(5))
+        self.assertEqual([self.demo], self.validated)
+        self.assertEqual(1, len(self.results))
+        self.assertTrue(self.results[0].is_valid)
+
+    def test_cancel(self):
+        worker = self.worker(0.1)
+        worker.submit("<questions/>")
+        worker.cancel()
+        self.assertFalse(self.finished.wait(0.5))
+        self.assertEqual([], self.validated)
+
+    def test_stale_result_discarded(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def validate(xml_string):
+            started.set()
+            release.wait(5)
+            return self.validate(xml_string)
+
+        worker = ValidationWorker(validate, lambda: None, self.on_finished, delay=0)
+        worker.submit("<questions>")
+        self.assertTrue(started.wait(5))
+        worker.submit(self.demo)  # while the first one is running
+        release.set()
+        self.assertTrue(self.finished.wait(5))
+        self.assertEqual(["<questions>", self.demo], self.validated)
+        self.assertEqual(1, len(self.results))
+        self.assertTrue(self.results[0].is_valid)
+
+    def test_errors_are_reported(self):
+        def validate(xml_string):
+            if xml_string == "kaputt":
+                raise RuntimeError("Validator kaputt")
+            return self.validate(xml_string)
+
+        def on_finished(result):
+            self.on_finished(result)
+            if len(self.results) == 2:
+                raise RuntimeError("Seite geschlossen")
+
+        worker = ValidationWorker(validate, lambda: None, on_finished, delay=0, error_result=lambda e: str(e))
+        worker.submit("kaputt")
+        self.assertTrue(self.finished.wait(5))
+        self.assertEqual(["Validator kaputt"], self.results)
+        self.finished.clear()
+        with patch('sys.stderr', new=io.StringIO()) as stderr:
+            worker.submit(self.demo)  # on_finished raises, the worker goes on
+            self.assertTrue(self.finished.wait(5))
+            self.finished.clear()
+            worker.submit(self.demo)
+            self.assertTrue(self.finished.wait(5))
+        self.assertIn("Seite geschlossen", stderr.getvalue())
+        self.assertEqual(3, len(self.results))
+
+    def test_no_result_after_cancel(self):
+        release = threading.Event()
+
+        def validate(xml_string):
+            release.set()
+            return self.validate(xml_string)
+
+        for _ in range(20):
+            worker = ValidationWorker(validate, lambda: None, self.on_finished, delay=0)
+            release.clear()
+            worker.submit(self.demo)
+            release.wait(5)
+            worker.cancel()
+            delivered = len(self.results)
+            time.sleep(0.01)
+            self.assertEqual(delivered, len(self.results))  # nothing arrives after cancel() returned
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from multiconverter.converter5 import QuestionHandlers, convert
+from multiconverter.watch import Watcher
+
+from archive_helpers import read_members
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, "src")
+        os.mkdir(self.source)
+        for name in ("a_demo.xml", "b_mq.xml"):
+            shutil.copy(os.path.join(test_dir, "demo.xml" if name == "a_demo.xml" else "demo_mq_root.xml"),
+                        os.path.join(self.source, name))
+        self.output = os.path.join(self.directory.name, "out.zip")
+        self.watcher = Watcher(self.output, self.source)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def expected(self):
+        files = [os.path.join(self.source, name) for name in sorted(os.listdir(self.source))]
+        expected = os.path.join(self.directory.name, "expected.zip")
+        convert(expected, files)
+        return read_members(expected)
+
+    def test_incremental_rebuild(self):
+        self.assertEqual(2, len(self.watcher.update()))
+        self.assertEqual(5, self.watcher.write_archive())
+        self.assertEqual(self.expected(), read_members(self.output))
+        self.assertEqual([], self.watcher.update())
+
+        changed = os.path.join(self.source, "a_demo.xml")
+        with open(changed, encoding="utf-8") as f:
+            text = f.read().replace("Welche Aussage", "Welche geänderte Aussage")
+        with open(changed, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.utime(changed, ns=(0, 1))  # new stamp also on coarse file systems
+        with patch.object(QuestionHandlers, 'render_fragments', wraps=self.watcher._renderer.render_fragments) as render:
+            self.assertEqual([changed], self.watcher.update())
+            self.assertEqual(4, render.call_count)  # only the questions of the changed file
+        self.watcher.write_archive()
+        self.assertEqual(self.expected(), read_members(self.output))
+        self.assertIn("Welche geänderte Aussage", read_members(self.output)["item-00001.xml"])
+
+        os.remove(changed)
+        self.assertEqual([changed], self.watcher.update())
+        self.assertEqual(1, self.watcher.write_archive())
+
+    def test_invalid_questions_are_reported(self):
+        shutil.copy(os.path.join(test_dir, "demo_err.xml"), os.path.join(self.source, "c_err.xml"))
+        changed = self.watcher.update()
+        with patch('sys.stdout', new=io.StringIO()) as stdout:
+            self.watcher.report(changed)
+        self.assertIn("Question 1 of", stdout.getvalue())
+        self.assertEqual(5, self.watcher.write_archive())
+
+
+if __name__ == '__main__':
+    unittest.main()
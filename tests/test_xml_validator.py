@@ -0,0 +1,212 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from lxml import etree
+
+from multiconverter.converter5 import QuestionHandlers, xsd_path
+from multiconverter import xml_validator
+from multiconverter.xml_validator import Error, ErrorLimits, XMLValidator, SchemaRegistry, get_validator
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+COMMENTED_XML = """<?xml version="1.0" encoding="utf-8"?>
+<questions xmlns="https://github.com/Hananja/multiconverter">
+  <!-- Kommentar des LLM -->
+  <fill-in-question>
+    <fill-in-text>2 + 2 = <!-- Lücke --><fill><alt>4</alt></fill> und nicht 5</fill-in-text>
+  </fill-in-question>
+  <?pi ignoriert?>
+</questions>
+"""
+
+BROKEN_SECOND_QUESTION = """<questions xmlns="https://github.com/Hananja/multiconverter">
+  <fill-in-question><fill-in-text>1 + 1 = <fill><alt>2</alt></fill></fill-in-text></fill-in-question>
+  <fill-in-question><fill-in-txt>kaputt</fill-in-txt></fill-in-question>
+  <fill-in-question><fill-in-text>3 + 3 = <fill><alt>6</alt></fill></fill-in-text></fill-in-question>
+</questions>
+"""
+
+
+class TestXMLValidator(unittest.TestCase):
+    def setUp(self):
+        self.validator = XMLValidator(xsd_path)
+
+    def test_returns_lxml_tree(self):
+        result = self.validator.validate_file(os.path.join(test_dir, "demo.xml"))
+        self.assertTrue(result.is_valid)
+        self.assertIsInstance(result.xml_content, etree._Element)
+        self.assertEqual(4, len(result.xml_content))
+
+    def test_comments_are_dropped(self):
+        result = self.validator.validate_xml_string(COMMENTED_XML)
+        self.assertTrue(result.is_valid, result.errors)
+        self.assertEqual(1, len(result.xml_content))
+        handlers = QuestionHandlers()
+        for question in result.xml_content:
+            handlers.handle_question(question)
+        item_text = next(iter(handlers.items_map.values())).item_text
+        self.assertIn('2 + 2 = &lt;textEntryInteraction', item_text)
+        self.assertIn('und nicht 5', item_text)
+        self.assertNotIn('Lücke', item_text)
+
+    def test_questions_one_by_one(self):
+        result = self.validator.validate_xml_string_questions(BROKEN_SECOND_QUESTION)
+        self.assertFalse(result.is_valid)
+        self.assertEqual([], result.errors)
+        self.assertEqual([1], list(result.question_errors))
+        self.assertTrue(result.question_errors[1][0][1].startswith("Zeile 3:"), result.question_errors)
+        self.assertEqual(2, len(result.valid_questions))
+        self.assertEqual(self.validator.validate_xml_string(BROKEN_SECOND_QUESTION).is_valid, result.is_valid)
+
+        demo = self.validator.validate_file_questions(os.path.join(test_dir, "demo.xml"))
+        self.assertTrue(demo.is_valid)
+        self.assertEqual(4, len(demo.valid_questions))
+
+    def test_edited_question_only(self):
+        self.validator.validate_xml_string_questions(BROKEN_SECOND_QUESTION)
+        with patch.object(self.validator, '_validate_document', wraps=self.validator._validate_document) as validate:
+            # unveränderte Fragen sind bekannt und werden nicht erneut validiert
+            result = self.validator.validate_xml_string_questions(BROKEN_SECOND_QUESTION.replace(
+                "<fill-in-txt>kaputt</fill-in-txt>", "<fill-in-text>2 + 2 = <fill><alt>4</alt></fill></fill-in-text>"))
+            self.assertEqual(1, validate.call_count)
+            self.assertTrue(result.is_valid)
+
+    def test_document_errors(self):
+        result = self.validator.validate_xml_string_questions('<questions xmlns="urn:falsch"/>')
+        self.assertFalse(result.is_valid)
+        self.assertEqual(1, len(result.errors))
+        result = self.validator.validate_xml_string_questions('<questions')
+        self.assertEqual([], result.questions)
+        self.assertFalse(result.is_valid)
+
+    def test_root_errors(self):
+        # every root the full validation rejects is rejected question by question too
+        question = '<fill-in-question><fill-in-text>1 + 1 = <fill><alt>2</alt></fill></fill-in-text></fill-in-question>'
+        namespace = 'xmlns="https://github.com/Hananja/multiconverter"'
+        for root in (f'<questions {namespace} bogus="1">', f'<questions {namespace} xmlns:x="urn:x" x:a="1">',
+                     f'<questions {namespace} xml:lang="de">', '<questions xmlns="urn:falsch">',
+                     f'<questions {namespace}>Text'):
+            document = f'{root}{question}</questions>'
+            self.assertFalse(self.validator.validate_xml_string(document).is_valid, document)
+            result = self.validator.validate_xml_string_questions(document)
+            self.assertFalse(result.is_valid, document)
+            self.assertTrue(result.errors, document)
+        valid = f'<questions {namespace} xmlns:x="urn:x">{question}</questions>'
+        self.assertTrue(self.validator.validate_xml_string(valid).is_valid)
+        self.assertTrue(self.validator.validate_xml_string_questions(valid).is_valid)
+
+
+class TestErrorLimits(unittest.TestCase):
+    GARBAGE = ('<questions xmlns="https://github.com/Hananja/multiconverter">'
+               + '<fill-in-question><fill-in-txt>kaputt</fill-in-txt></fill-in-question>' * 50 + '</questions>')
+
+    def setUp(self):
+        self.validator = XMLValidator(xsd_path)
+        self.directory = tempfile.TemporaryDirectory()
+        self.garbage_file = os.path.join(self.directory.name, "garbage.xml")
+        with open(self.garbage_file, "w", encoding="utf-8") as f:
+            f.write(self.GARBAGE)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cap_per_file(self):
+        limits = ErrorLimits(max_per_file=3)
+        with patch.object(self.validator, '_validate_document', wraps=self.validator._validate_document) as validate:
+            result = self.validator.validate_questions(etree.fromstring(self.GARBAGE), limits=limits)
+            self.assertEqual(3, validate.call_count)
+        self.assertEqual([0, 1, 2], list(result.question_errors))
+        self.assertEqual([Error.LIMIT_REACHED], [error for error, _ in result.errors])
+        self.assertEqual(3, limits.total)
+        self.assertEqual(3, sum(limits.counts.values()))
+        self.assertTrue(limits.stopped)
+
+        demo = self.validator.validate_file_questions(os.path.join(test_dir, "demo.xml"), limits=limits)
+        self.assertTrue(demo.is_valid)  # the cap is per file
+
+    def test_fail_fast(self):
+        limits = ErrorLimits(fail_fast=True)
+        result = self.validator.validate_file_questions(self.garbage_file, limits=limits)
+        self.assertEqual([0], list(result.question_errors))
+        demo = self.validator.validate_file_questions(os.path.join(test_dir, "demo.xml"), limits=limits)
+        self.assertEqual([], demo.questions)  # not even read
+        self.assertEqual([Error.LIMIT_REACHED], [error for error, _ in demo.errors])
+
+    def test_counts_without_caps(self):
+        limits = ErrorLimits()
+        result = self.validator.validate_file_questions(self.garbage_file, limits=limits)
+        self.assertEqual(50, len(result.question_errors))
+        self.assertEqual(sum(len(errors) for errors in result.question_errors.values()), limits.total)
+        self.assertIn(f"{limits.total} insgesamt", limits.format_summary())
+        self.assertFalse(limits.stopped)
+
+
+class TestParseFile(unittest.TestCase):
+    TEXT = '<a>Grüße “zitiert” 5 €</a>'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def parse(self, data: bytes):
+        path = os.path.join(self.directory.name, "test.xml")
+        with open(path, "wb") as f:
+            f.write(data)
+        with patch.object(etree, 'fromstring', wraps=etree.fromstring) as fromstring:
+            root = XMLValidator.parse_file(path).getroot()
+        return root.text, fromstring.call_count
+
+    def test_encodings(self):
+        declaration = '<?xml version="1.0" encoding="utf-8"?>'
+        self.assertEqual(("Grüße “zitiert” 5 €", 1), self.parse((declaration + self.TEXT).encode("utf-8")))
+        self.assertEqual(("Grüße “zitiert” 5 €", 1), self.parse(b"\xef\xbb\xbf" + self.TEXT.encode("utf-8")))
+        self.assertEqual(("Grüße “zitiert” 5 €", 1), self.parse(self.TEXT.encode("utf-16")))
+        self.assertEqual(("Grüße “zitiert” 5 €", 1),
+                         self.parse(('<?xml version="1.0" encoding="windows-1252"?>' + self.TEXT).encode("cp1252")))
+        # Windows export with wrong declaration: one more parse with the sniffed encoding
+        self.assertEqual(("Grüße “zitiert” 5 €", 2), self.parse((declaration + self.TEXT).encode("cp1252")))
+        self.assertEqual(("Grüße\x81", 2), self.parse("<a>Grüße\x81</a>".encode("latin-1")))
+
+    def test_memory_mapped(self):
+        with patch.object(xml_validator, 'MMAP_THRESHOLD', 0):
+            self.assertEqual(("Grüße “zitiert” 5 €", 2), self.parse(self.TEXT.encode("cp1252")))
+            result = get_validator(xsd_path).validate_file(os.path.join(test_dir, "demo.xml"))
+        self.assertTrue(result.is_valid)
+
+    def test_syntax_error(self):
+        with self.assertRaises(etree.XMLSyntaxError):
+            self.parse("<a>Grüße</b>".encode("cp1252"))
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    def test_shared_validator(self):
+        registry = SchemaRegistry()
+        other_spelling = os.path.join(os.path.dirname(xsd_path), "..", "xml", os.path.basename(xsd_path))
+        with ThreadPoolExecutor(8) as executor:
+            validators = list(executor.map(registry.get_validator, [xsd_path, other_spelling] * 8))
+        self.assertTrue(all(validator is validators[0] for validator in validators))
+        registry.clear()
+        self.assertIsNot(validators[0], registry.get_validator(xsd_path))
+
+    def test_concurrent_validation(self):
+        validator = get_validator(xsd_path)
+        self.assertIs(validator, get_validator(xsd_path))
+        files = [os.path.join(test_dir, name) for name in ("demo.xml", "demo_err.xml")] * 50
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(validator.validate_file, files))
+        for result in results:
+            if result.filename.endswith("demo.xml"):
+                self.assertTrue(result.is_valid)
+                self.assertEqual([], result.errors)
+            else:
+                self.assertFalse(result.is_valid)
+                self.assertEqual(1, len(result.errors))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,255 @@
+import io
+import os
+import re
+import sys
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from multiconverter.converter5 import QuestionHandlers, XMLValidator, xsd_path, main
+from multiconverter.zip_writer import COMPRESSION_CHOICES, MemberWriter, zip_compression
+
+from archive_helpers import read_members
+
+test_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestZipExport(unittest.TestCase):
+    def setUp(self):
+        result = XMLValidator(xsd_path).validate_file(os.path.join(test_dir, "demo.xml"))
+        self.assertTrue(result.is_valid)
+        self.questions = list(result.xml_content)
+
+    def test_stream_equals_buffered(self):
+        buffered = QuestionHandlers()
+        for question in self.questions:
+            buffered.handle_question(question)
+
+        streamed = QuestionHandlers()
+        stream = io.BytesIO()
+        with streamed.stream_zip(stream):
+            for question in self.questions:
+                streamed.handle_question(question)
+
+        self.assertEqual(read_members(buffered.get_zip()), read_members(stream.getvalue()))
+        self.assertTrue(all(item.item_text is None for item in streamed.items_map.values()))
+        with self.assertRaises(ValueError):
+            streamed.get_zip()
+
+    def test_failed_conversion_leaves_no_archive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.zip")
+            handlers = QuestionHandlers()
+            with self.assertRaises(RuntimeError):
+                with handlers.stream_zip(path):
+                    handlers.handle_question(self.questions[0])
+                    raise RuntimeError("Abbruch")
+            self.assertEqual([], os.listdir(directory))
+
+            QuestionHandlers().write_zip(path)
+            with self.assertRaises(RuntimeError):
+                with QuestionHandlers().stream_zip(path):
+                    raise RuntimeError("Abbruch")
+            self.assertEqual(["out.zip"], os.listdir(directory))  # the earlier archive is kept
+            with open(path, "rb") as f:
+                self.assertIn("imsmanifest.xml", read_members(f.read()))
+
+    def test_spilled_fragments(self):
+        in_memory = QuestionHandlers()
+        spilled = QuestionHandlers(max_memory=3000)
+        for handlers in (in_memory, spilled):
+            for question in self.questions * 3:
+                handlers.handle_question(question)
+        self.assertLessEqual(spilled.items_map.memory_size, 3000)
+        self.assertGreater(spilled.items_map.spilled, 0)
+        self.assertEqual(in_memory.items_map["item-00012"], spilled.items_map["item-00012"])
+        self.assertEqual(read_members(in_memory.get_zip()), read_members(spilled.get_zip()))
+        spilled.items_map.close()
+        self.assertEqual(0, len(spilled.items_map))
+
+    def test_threaded_compression(self):
+        for compression in ("store", "fast", "default", 9):
+            archives = []
+            for threads in (1, 4):
+                handlers = QuestionHandlers(compression=compression, compress_threads=threads)
+                for question in self.questions * 10:
+                    handlers.handle_question(question)
+                archives.append(handlers.get_zip())
+            self.assertEqual(read_members(archives[0]), read_members(archives[1]))
+            with zipfile.ZipFile(io.BytesIO(archives[0])) as serial, zipfile.ZipFile(io.BytesIO(archives[1])) as threaded:
+                self.assertEqual([(info.filename, info.compress_type, info.compress_size, info.CRC)
+                                  for info in serial.infolist() if info.filename != 'imsmanifest.xml'],
+                                 [(info.filename, info.compress_type, info.compress_size, info.CRC)
+                                  for info in threaded.infolist() if info.filename != 'imsmanifest.xml'])
+                self.assertIsNone(threaded.testzip())
+
+    def test_compression_choices(self):
+        for compression in COMPRESSION_CHOICES:  # the choices of --compression are all known
+            zip_compression(compression)
+        with patch('sys.exit') as exit_mock, patch('sys.stdout', new=io.StringIO()) as stdout:
+            main(["multiconverter", "--compression", "10", "out.zip", os.path.join(test_dir, "demo.xml")])
+        exit_mock.assert_called_with(1)
+        self.assertIn("--compression muss eins von store, fast, default, best, 0", stdout.getvalue())
+        self.assertFalse(os.path.exists("out.zip"))
+
+    def test_threaded_archive_format(self):
+        # the threaded writer writes the zip records itself, zipfile must read them like its own archives
+        for count, name in ((3, "item-ä"), (0x10000 + 10, "item")):  # more than 65535 members need zip64
+            target = io.BytesIO()
+            writer = MemberWriter(target, zipfile.ZIP_DEFLATED, 1, threads=2)
+            for i in range(count):
+                writer.write(f"{name}-{i}.xml", (f"<item>{i}</item>",))
+            writer.flush()
+            writer.close()
+            with zipfile.ZipFile(target) as archive:
+                self.assertEqual(count, len(archive.infolist()))
+                self.assertIsNone(archive.testzip())
+                self.assertEqual(b"<item>2</item>", archive.read(f"{name}-2.xml"))
+
+        stdout = io.TextIOWrapper(io.BytesIO())
+        stdout.buffer.seekable = lambda: False  # like a pipe
+        with patch('sys.stdout', new=stdout):
+            main(["multiconverter", "--compress-threads", "4", "-", os.path.join(test_dir, "demo.xml")])
+            stdout.flush()
+            members = read_members(stdout.buffer.getvalue())
+        self.assertEqual(len(self.questions) + 1, len(members))
+
+    def test_stdout_output(self):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        with patch('sys.stdout', new=stdout):
+            main(["multiconverter", "-", os.path.join(test_dir, "demo.xml")])
+            stdout.flush()
+            members = read_members(stdout.buffer.getvalue())
+        self.assertEqual(len(self.questions) + 1, len(members))
+        self.assertIn('imsmanifest.xml', members)
+
+    def test_output_named_like_subcommand(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                main(["multiconverter", "./serve", os.path.join(test_dir, "demo.xml")])
+            finally:
+                os.chdir(cwd)
+            with open(os.path.join(directory, "serve"), "rb") as f:
+                self.assertIn('imsmanifest.xml', read_members(f.read()))
+
+    def test_parallel_equals_serial(self):
+        files = [os.path.join(test_dir, name) for name in
+                 ("demo.xml", "demo_mq_root.xml", "demo_mcq_root.xml", "demo_fiq_root.xml", "demo.xml")]
+        serial, parallel = io.BytesIO(), io.BytesIO()
+        with patch('sys.stdout', new=io.TextIOWrapper(serial)):
+            main(["multiconverter", "-", *files])
+            sys.stdout.flush()
+            serial_members = read_members(serial.getvalue())
+        with patch('sys.stdout', new=io.TextIOWrapper(parallel)):
+            main(["multiconverter", "--jobs", "3", "-", *files])
+            sys.stdout.flush()
+            parallel_members = read_members(parallel.getvalue())
+        self.assertEqual(serial_members, parallel_members)
+        self.assertIn('item-00011.xml', parallel_members)
+
+    def test_parallel_worker_reads_once(self):
+        # the worker validates and renders from one parse, the parent only assigns the identifiers
+        from multiconverter.parallel import _validate_worker
+        with patch.object(XMLValidator, 'parse_file', wraps=XMLValidator.parse_file) as parse_file:
+            summary = _validate_worker(os.path.join(test_dir, "demo.xml"), True, None, None, False)
+        parse_file.assert_called_once()
+        self.assertEqual([0, 1, 2, 3], [index for index, _ in summary.fragments])
+        handlers = QuestionHandlers()
+        self.assertEqual("item-00001", handlers.add_rendered(summary.fragments[0][1]))
+
+    def test_skip_invalid_questions(self):
+        with open(os.path.join(test_dir, "demo.xml"), encoding="utf-8") as f:
+            broken = f.read().replace("<text>", "<txt>", 1).replace("</text>", "</txt>", 1)
+        with tempfile.TemporaryDirectory() as directory:
+            broken_file = os.path.join(directory, "broken.xml")
+            with open(broken_file, "w", encoding="utf-8") as f:
+                f.write(broken)
+            files = [broken_file, os.path.join(test_dir, "demo_mq_root.xml")]
+            for jobs in ("1", "2"):
+                output = io.BytesIO()
+                with patch('sys.stdout', new=io.TextIOWrapper(output)), \
+                        patch('sys.stderr', new=io.StringIO()) as stderr:
+                    main(["multiconverter", "--skip-invalid", "--jobs", jobs, "-", *files])
+                    sys.stdout.flush()
+                    members = read_members(output.getvalue())
+                self.assertIn("Question 1 of", stderr.getvalue())
+                self.assertEqual(["imsmanifest.xml"] + [f"item-0000{i}.xml" for i in range(1, 5)], sorted(members))
+
+    def test_error_limits(self):
+        garbage = ('<questions xmlns="https://github.com/Hananja/multiconverter">'
+                   + '<fill-in-question><fill-in-txt>kaputt</fill-in-txt></fill-in-question>' * 20 + '</questions>')
+        with tempfile.TemporaryDirectory() as directory:
+            garbage_file = os.path.join(directory, "garbage.xml")
+            with open(garbage_file, "w", encoding="utf-8") as f:
+                f.write(garbage)
+            files = [garbage_file, os.path.join(test_dir, "demo.xml")]
+            for jobs in ("1", "2"):
+                with patch('sys.stdout', new=io.StringIO()) as stdout, patch('sys.exit') as exit_mock:
+                    main(["multiconverter", "--fail-fast", "--jobs", jobs, os.path.join(directory, "out.zip"), *files])
+                exit_mock.assert_called_with(1)
+                self.assertIn("fill-in-txt", stdout.getvalue())
+                self.assertFalse(os.path.exists(os.path.join(directory, "out.zip")))
+
+                with patch('sys.stdout', new=io.StringIO()) as stdout, patch('sys.exit') as exit_mock:
+                    main(["multiconverter", "--error-summary", "--max-file-errors", "5", "--jobs", jobs,
+                          os.path.join(directory, "out.zip"), *files])
+                exit_mock.assert_called_with(1)
+                self.assertIn("Fehler nach Art (5 insgesamt)", stdout.getvalue())
+                self.assertIn("Fehlergrenze erreicht", stdout.getvalue())
+
+    def test_sharded_output(self):
+        files = [os.path.join(test_dir, "demo.xml"), os.path.join(test_dir, "demo_mq_root.xml")]
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "out.zip")
+            main(["multiconverter", output, *files])
+            with open(output, "rb") as f:
+                items = {name: text for name, text in read_members(f.read()).items() if name != "imsmanifest.xml"}
+            for jobs in ("1", "2"):
+                main(["multiconverter", "--max-items", "2", "--jobs", jobs, output, *files])
+                shard_items = {}
+                for number, expected in ((1, ["item-00001", "item-00002"]), (2, ["item-00003", "item-00004"]),
+                                         (3, ["item-00005"])):
+                    with open(os.path.join(directory, f"out-00{number}.zip"), "rb") as f:
+                        members = read_members(f.read())
+                    # self-contained: the manifest references just the items of the shard
+                    references = set(re.findall(r'href="(item-\d+)\.xml"', members["imsmanifest.xml"]))
+                    self.assertEqual(expected, sorted(references))
+                    shard_items.update((name, text) for name, text in members.items() if name != "imsmanifest.xml")
+                self.assertEqual(items, shard_items)
+                self.assertFalse(os.path.exists(os.path.join(directory, "out-004.zip")))
+                for number in (1, 2, 3):
+                    os.remove(os.path.join(directory, f"out-00{number}.zip"))
+
+            main(["multiconverter", "--max-bytes", "8K", "--compression", "store", output, *files])
+            shards = sorted(name for name in os.listdir(directory) if name.startswith("out-"))
+            self.assertGreater(len(shards), 1)
+            for name in shards:
+                self.assertLessEqual(os.path.getsize(os.path.join(directory, name)), 8 * 1024)
+
+    def test_sharded_output_replaces_earlier_export(self):
+        from multiconverter.shards import ShardWriter
+        files = [os.path.join(test_dir, "demo.xml"), os.path.join(test_dir, "demo_mq_root.xml")]
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "out.zip")
+            main(["multiconverter", "--max-items", "1", output, *files])
+            self.assertEqual([f"out-00{number}.zip" for number in range(1, 6)], sorted(os.listdir(directory)))
+            # a failed export leaves the earlier one complete
+            with self.assertRaises(RuntimeError), ShardWriter(output, max_items=1) as writer:
+                for question in self.questions:
+                    writer.handle_question(question)
+                raise RuntimeError()
+            self.assertEqual([f"out-00{number}.zip" for number in range(1, 6)], sorted(os.listdir(directory)))
+            main(["multiconverter", "--max-items", "2", output, *files])
+            self.assertEqual(["out-001.zip", "out-002.zip", "out-003.zip"], sorted(os.listdir(directory)))
+
+            with patch('sys.stderr', new=io.StringIO()) as stderr:
+                main(["multiconverter", "--max-bytes", "1", output, *files])
+            self.assertEqual(5, len(os.listdir(directory)))
+            self.assertEqual(5, stderr.getvalue().count("allein größer als die Grenze von 1 Bytes"))
+
+
+if __name__ == '__main__':
+    unittest.main()